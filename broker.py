@@ -0,0 +1,112 @@
+"""
+Local IPC broker for the multi-process mode (see supervisor.py).
+
+A multiprocessing manager serves named queues (work and replies) and named
+tables (shared dicts: camera list, ring names, camera health, worker
+stats) to every process on the machine. Only small messages go through
+it; frames travel through shared-memory rings (frame_ring.py).
+
+LocalBroker has the same queue()/table() interface inside one process,
+for tests and for running tiers as threads:
+
+    broker = connect("local")
+"""
+import os
+import queue
+import threading
+from multiprocessing.managers import BaseManager, DictProxy
+
+BROKER_ADDRESS = os.getenv("BROKER_ADDRESS", "127.0.0.1:50055")
+BROKER_AUTHKEY = os.getenv("BROKER_AUTHKEY", "litterlens").encode()
+
+# --- SERVER SIDE (lives in the broker process) ---
+_queues = {}
+_tables = {}
+_lock = threading.Lock()
+
+
+def _named(store, name, factory):
+    with _lock:
+        if name not in store:
+            store[name] = factory()
+        return store[name]
+
+
+def _get_queue(name):
+    return _named(_queues, name, queue.Queue)
+
+
+def _get_table(name):
+    return _named(_tables, name, dict)
+
+
+class BrokerManager(BaseManager):
+    pass
+
+
+BrokerManager.register("queue", callable=_get_queue)
+BrokerManager.register("table", callable=_get_table, proxytype=DictProxy)
+
+
+def parse_address(address):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def serve(address=BROKER_ADDRESS):
+    """Starts the broker in a child process. Returns the manager; shutdown() stops it."""
+    manager = BrokerManager(parse_address(address), authkey=BROKER_AUTHKEY)
+    manager.start()
+    print(f"📮 Broker listening on {address}")
+    return manager
+
+
+# --- CLIENTS ---
+class RemoteBroker:
+    """Connection to a running broker. The proxies it returns can be used from any thread."""
+
+    def __init__(self, address=BROKER_ADDRESS):
+        self.address = address
+        self.manager = BrokerManager(parse_address(address), authkey=BROKER_AUTHKEY)
+        self.manager.connect()
+
+    def queue(self, name):
+        return self.manager.queue(name)
+
+    def table(self, name):
+        return self.manager.table(name)
+
+
+class LocalBroker:
+    """In-process stand-in for the broker, same interface."""
+
+    def __init__(self):
+        self.queues = {}
+        self.tables = {}
+        self.lock = threading.Lock()
+
+    def queue(self, name):
+        with self.lock:
+            return self.queues.setdefault(name, queue.Queue())
+
+    def table(self, name):
+        with self.lock:
+            return self.tables.setdefault(name, {})
+
+
+_local_broker = None
+
+
+def connect(address=None):
+    """
+    Broker at `address` (default: $BROKER_ADDRESS as it is now); "local"
+    gives this process's LocalBroker.
+    """
+    global _local_broker
+    # Read at call time: a spawned tier process sets BROKER_ADDRESS after this module was imported
+    address = address or os.getenv("BROKER_ADDRESS", BROKER_ADDRESS)
+    if address == "local":
+        if _local_broker is None:
+            _local_broker = LocalBroker()
+        return _local_broker
+    return RemoteBroker(address)
@@ -0,0 +1,425 @@
+"""
+Bulk ingestion of field photos: whole folders, zip archives, or many uploads at once.
+
+Images are listed lazily from the source and decoded (plus their EXIF GPS
+position) in a process pool. Only a few decoded images per worker may wait
+for the model, so memory stays flat however large the folder is. Decoded
+images go through the shared inference engine in batches, and each batch
+is written in one transaction: its detection rows (+ rollups) together
+with one ingested_files row per image. Running a job again skips the
+files it already recorded, so an interrupted job resumes where it stopped
+without writing any detection twice.
+
+    python bulk_ingest.py photos/ --job survey-north --lat 12.97 --lng 77.59
+    python bulk_ingest.py field_day2.zip
+"""
+import argparse
+import datetime
+import io
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from detection_store import build_rows, detections_from_result, point_wkt, write_batch
+from models import IngestJob, IngestedFile
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+DECODE_WORKERS = int(os.getenv("INGEST_DECODE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+BATCH_SIZE = int(os.getenv("INGEST_BATCH", "16"))
+# Photos are shrunk to this long side before inference (YOLO downscales them anyway)
+MAX_SIDE = int(os.getenv("INGEST_MAX_SIDE", "1280"))
+# Decoded images allowed to wait for the model, per decode worker
+PREFETCH = 4
+PROGRESS_SECONDS = 5.0
+# Files uploaded to /detect/bulk are kept here (one folder per job) so the job can be resumed
+INGEST_DIR = os.getenv("INGEST_DIR", "ingest_uploads")
+# Job names become folder names under INGEST_DIR
+JOB_NAME = re.compile(r"[A-Za-z0-9_-]+")
+UPLOAD_CHUNK = 1024 * 1024
+
+
+# --- UPLOADED JOBS ---
+def job_directory(name, root=None):
+    """INGEST_DIR/<name>. Raises ValueError unless `name` is a plain job name."""
+    if not name or not JOB_NAME.fullmatch(name):
+        raise ValueError("Job names may only contain letters, digits, '-' and '_'")
+    root = os.path.realpath(root or INGEST_DIR)
+    directory = os.path.realpath(os.path.join(root, name))
+    if os.path.dirname(directory) != root:
+        raise ValueError("Invalid job name")
+    return directory
+
+
+def upload_path(directory, filename):
+    """Where an uploaded file goes inside a job directory, or None for names like '..'."""
+    filename = os.path.basename((filename or "").replace("\\", "/"))
+    if filename in ("", ".", ".."):
+        return None
+    path = os.path.realpath(os.path.join(directory, filename))
+    return path if os.path.dirname(path) == directory else None
+
+
+def store_upload(source, path):
+    """
+    Copies the file object `source` to `path` through a temp file in the same
+    folder. Returns False, writing nothing, if `path` already exists: files
+    already recorded are skipped on resume, so a changed file under an old
+    name would never be processed.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(source, f, UPLOAD_CHUNK)
+        # Unlike os.replace, link() never overwrites
+        os.link(temp_path, path)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.unlink(temp_path)
+
+
+# --- LISTING ---
+def _is_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _zip_items(path, prefix):
+    with zipfile.ZipFile(path) as archive:
+        names = [info.filename for info in archive.infolist() if not info.is_dir() and _is_image(info.filename)]
+    for name in names:
+        yield f"{prefix}/{name}", path, name
+
+
+def iter_items(source):
+    """
+    (key, path, member) for every image in `source` - a folder, a zip or a
+    single image - in a stable order. `member` is the name inside a zip,
+    else None. Zips inside a folder are walked as well.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                key = os.path.relpath(path, source).replace(os.sep, "/")
+                if name.lower().endswith(".zip"):
+                    yield from _zip_items(path, key)
+                elif _is_image(name):
+                    yield key, path, None
+    elif source.lower().endswith(".zip"):
+        yield from _zip_items(source, os.path.basename(source))
+    else:
+        yield os.path.basename(source), source, None
+
+
+# --- DECODING (runs in the pool processes) ---
+_worker_archives = {}
+
+
+def _read(path, member):
+    if member is None:
+        with open(path, "rb") as f:
+            return f.read()
+    # Each worker keeps its zips open instead of re-reading the directory for every member
+    archive = _worker_archives.get(path)
+    if archive is None:
+        archive = _worker_archives[path] = zipfile.ZipFile(path)
+    return archive.read(member)
+
+
+def _degrees(dms, ref):
+    d, m, s = (float(v) for v in dms)
+    value = d + m / 60 + s / 3600
+    return -value if ref in ("S", "W") else value
+
+
+def exif_location(data):
+    """(latitude, longitude) from a photo's EXIF GPS tags, or None."""
+    try:
+        gps = Image.open(io.BytesIO(data)).getexif().get_ifd(0x8825)
+        if 2 not in gps or 4 not in gps:
+            return None
+        return _degrees(gps[2], gps.get(1, "N")), _degrees(gps[4], gps.get(3, "E"))
+    except Exception:
+        # Missing or broken EXIF just means "no location"
+        return None
+
+
+def decode_image(path, member=None, max_side=MAX_SIDE):
+    """Reads, decodes and downsizes one image. Returns (BGR frame, location or None)."""
+    data = _read(path, member)
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("not a readable image")
+    height, width = frame.shape[:2]
+    if max(height, width) > max_side:
+        scale = max_side / max(height, width)
+        frame = cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    return frame, exif_location(data)
+
+
+# --- JOBS ---
+def job_to_dict(job):
+    return {
+        "job": job.name,
+        "source": job.source,
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+        "failed": job.failed,
+        "detections": job.detections,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def get_job(db: Session, name):
+    return db.execute(select(IngestJob).where(IngestJob.name == name)).scalar_one_or_none()
+
+
+def format_progress(progress):
+    done = progress["processed"] + progress["failed"]
+    percent = 100 * done / progress["total"] if progress["total"] else 100
+    eta = f", ETA {progress['eta_s']}s" if progress["eta_s"] is not None else ""
+    return (f"📦 {progress['job']}: {done}/{progress['total']} ({percent:.0f}%), "
+            f"{progress['images_per_s']} img/s, {progress['detections']} detections, "
+            f"{progress['failed']} failed{eta}")
+
+
+class IngestRun:
+    """
+    One pass of a bulk ingest job over `source`. `detect_batch(frames)`
+    returns one YOLO result per frame (e.g. InferenceEngine.predict_many).
+    run() blocks until the source is done; start() runs it on a thread.
+    """
+
+    def __init__(self, session_factory, detect_batch, name, source, latitude=None, longitude=None,
+                 batch_size=BATCH_SIZE, workers=DECODE_WORKERS, max_side=MAX_SIDE):
+        self.session_factory = session_factory
+        self.detect_batch = detect_batch
+        self.name = name
+        self.source = source
+        self.latitude = latitude
+        self.longitude = longitude
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_side = max_side
+
+        self.job_id = None
+        self.started = None
+        self.thread = None
+        self.stop_requested = threading.Event()
+        self.lock = threading.Lock()
+        self.state = {
+            "job": name, "source": source, "status": "pending", "total": 0, "processed": 0,
+            "failed": 0, "detections": 0, "skipped": 0, "this_run": 0, "error": None,
+        }
+
+    # --- Lifecycle ---
+    def start(self, on_progress=None):
+        self.thread = threading.Thread(target=self.run, args=(on_progress,), name=f"ingest-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Finishes the images already being decoded, writes them and stops (resumable)."""
+        self.stop_requested.set()
+
+    @property
+    def running(self):
+        return self.state["status"] in ("pending", "running")
+
+    def run(self, on_progress=None):
+        db = self.session_factory()
+        status = "failed"
+        try:
+            job, done = self._open_job(db)
+            job.total = sum(1 for _ in iter_items(self.source))
+            db.commit()
+            with self.lock:
+                self.state.update(status="running", total=job.total, processed=job.processed,
+                                  failed=job.failed, detections=job.detections, skipped=len(done))
+            self.started = time.monotonic()
+            if done:
+                print(f"📦 {self.name}: resuming, {len(done)} of {job.total} images already done")
+            status = self._process(db, done, on_progress)
+        except KeyboardInterrupt:
+            status = "interrupted"
+            raise
+        except Exception as e:
+            print(f"❌ Ingest {self.name} failed: {e}")
+            with self.lock:
+                self.state["error"] = str(e)
+        finally:
+            self._finish(db, status)
+            db.close()
+            if on_progress:
+                on_progress(self.progress())
+        return self.progress()
+
+    def _open_job(self, db):
+        job = get_job(db, self.name)
+        if job is None:
+            job = IngestJob(name=self.name, processed=0, failed=0, detections=0)
+            db.add(job)
+        job.source = self.source
+        # Resuming keeps the stored default location unless a new one is given
+        if self.latitude is not None and self.longitude is not None:
+            job.latitude, job.longitude = self.latitude, self.longitude
+        job.status = "running"
+        job.updated_at = datetime.datetime.utcnow()
+        job.finished_at = None
+        db.commit()
+        self.job_id = job.id
+        self.latitude, self.longitude = job.latitude, job.longitude
+        done = set(db.execute(select(IngestedFile.key).where(IngestedFile.job_id == job.id)).scalars())
+        return job, done
+
+    def _finish(self, db, status):
+        # Drops a half-written batch; its images are picked up again on resume
+        db.rollback()
+        with self.lock:
+            self.state["status"] = status
+        if self.job_id is None:
+            return
+        try:
+            now = datetime.datetime.utcnow()
+            db.execute(update(IngestJob).where(IngestJob.id == self.job_id).values(
+                status=status, updated_at=now, finished_at=now if status == "done" else None,
+            ))
+            db.commit()
+        except Exception as e:
+            print(f"⚠️ Could not record the status of ingest {self.name}: {e}")
+
+    # --- Pipeline ---
+    def _process(self, db, done, on_progress):
+        pending = (item for item in iter_items(self.source) if item[0] not in done)
+        window = deque()   # (key, future) in listing order
+        batch = []         # (key, frame, location, error)
+        next_report = time.monotonic() + PROGRESS_SECONDS
+
+        # spawn, not fork: a forked copy of a process holding the model and server threads can deadlock
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            try:
+                while True:
+                    # Keep every worker busy, but never hold more than PREFETCH decoded images each
+                    while len(window) < self.workers * PREFETCH and not self.stop_requested.is_set():
+                        item = next(pending, None)
+                        if item is None:
+                            break
+                        key, path, member = item
+                        window.append((key, pool.submit(decode_image, path, member, self.max_side)))
+                    if not window:
+                        break
+
+                    key, future = window.popleft()
+                    try:
+                        frame, location = future.result()
+                        batch.append((key, frame, location, None))
+                    except Exception as e:
+                        batch.append((key, None, None, str(e) or type(e).__name__))
+
+                    if len(batch) >= self.batch_size:
+                        self._flush(db, batch)
+                        batch = []
+                    if on_progress and time.monotonic() >= next_report:
+                        on_progress(self.progress())
+                        next_report = time.monotonic() + PROGRESS_SECONDS
+                self._flush(db, batch)
+            finally:
+                for _, future in window:
+                    future.cancel()
+        return "interrupted" if self.stop_requested.is_set() else "done"
+
+    def _flush(self, db, batch):
+        """Inference for one batch, then its detections and file records in one transaction."""
+        if not batch:
+            return
+        decoded = [entry for entry in batch if entry[1] is not None]
+        results = self.detect_batch([frame for _, frame, _, _ in decoded]) if decoded else []
+        result_for = {entry[0]: result for entry, result in zip(decoded, results)}
+
+        timestamp = datetime.datetime.utcnow()
+        rows, files = [], []
+        for key, frame, location, error in batch:
+            if error is not None:
+                files.append({"job_id": self.job_id, "key": key, "status": "failed", "detections": 0,
+                              "error": error[:500]})
+                continue
+            detections = detections_from_result(result_for[key])
+            latitude, longitude = location or (self.latitude, self.longitude)
+            where = point_wkt(latitude, longitude) if latitude is not None and longitude is not None else None
+            rows += build_rows(detections, "bulk", location=where, timestamp=timestamp)
+            files.append({"job_id": self.job_id, "key": key, "status": "ok", "detections": len(detections),
+                          "error": None})
+
+        ok = sum(1 for f in files if f["status"] == "ok")
+        # Uploaded photos have no camera, they roll up under camera 0 / zone 0
+        write_batch(db, rows, lambda camera_id: 0)
+        db.execute(insert(IngestedFile), files)
+        db.execute(update(IngestJob).where(IngestJob.id == self.job_id).values(
+            processed=IngestJob.processed + ok,
+            failed=IngestJob.failed + len(files) - ok,
+            detections=IngestJob.detections + len(rows),
+            updated_at=timestamp,
+        ))
+        db.commit()
+
+        with self.lock:
+            self.state["processed"] += ok
+            self.state["failed"] += len(files) - ok
+            self.state["detections"] += len(rows)
+            self.state["this_run"] += len(files)
+
+    def progress(self):
+        with self.lock:
+            progress = dict(self.state)
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        rate = progress["this_run"] / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, progress["total"] - progress["processed"] - progress["failed"])
+        progress["elapsed_s"] = round(elapsed, 1)
+        progress["images_per_s"] = round(rate, 2)
+        progress["eta_s"] = round(remaining / rate) if rate and progress["status"] == "running" else None
+        return progress
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run YOLO over a folder or zip of photos")
+    parser.add_argument("source", help="Folder, zip archive or single image")
+    parser.add_argument("--job", help="Job name (default: the source name); re-running a job resumes it")
+    parser.add_argument("--lat", type=float, default=None, help="Latitude for photos without GPS EXIF")
+    parser.add_argument("--lng", type=float, default=None, help="Longitude for photos without GPS EXIF")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS, help="Decode processes")
+    args = parser.parse_args()
+
+    # Only the database and the model, not the web app (importing main would start its scheduler and cameras)
+    from database import SessionLocal
+    from inference import get_engine
+
+    name = args.job or os.path.basename(os.path.normpath(args.source))
+    run = IngestRun(SessionLocal, get_engine().start().predict_many, name, os.path.abspath(args.source),
+                    args.lat, args.lng, batch_size=args.batch, workers=args.workers)
+    try:
+        result = run.run(on_progress=lambda progress: print(format_progress(progress)))
+    except KeyboardInterrupt:
+        print(f"⏸️ Interrupted, run the same command again to resume job '{name}'")
+    else:
+        print(f"✅ {result['status']}: {result['processed']} images, {result['detections']} detections, "
+              f"{result['failed']} failed in {result['elapsed_s']}s")
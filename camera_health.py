@@ -0,0 +1,226 @@
+"""
+Camera health tracking for the capture hub.
+
+Every hub reader owns a CameraHealth that:
+  - spaces reconnect attempts with exponential backoff plus jitter, so a
+    dead phone costs a retry every few seconds instead of a busy loop
+  - trips a circuit breaker after a few failures in a row; while it is
+    open, viewers and the scheduled scan fail fast instead of waiting for
+    the FFmpeg timeout (one probe is let through every cooldown period)
+  - keeps uptime, reconnect count, last frame age and decode fps
+
+Try it against the fake flaky source:
+
+    python camera_health.py --url "flaky://?fail_rate=0.05&outage_every=40&outage_seconds=15"
+"""
+import argparse
+import os
+import random
+import threading
+import time
+
+BACKOFF_BASE = float(os.getenv("CAPTURE_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("CAPTURE_BACKOFF_MAX", "60"))
+# Consecutive failures before the breaker opens
+BREAKER_FAILURES = int(os.getenv("CAPTURE_BREAKER_FAILURES", "3"))
+# While open, one caller per cooldown may try the camera again
+BREAKER_COOLDOWN = float(os.getenv("CAPTURE_BREAKER_COOLDOWN", "30"))
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of waiting on a camera that is known to be down."""
+
+
+class Backoff:
+    """Exponential backoff with jitter: ~base, 2*base, 4*base ... up to max_delay."""
+
+    def __init__(self, base=BACKOFF_BASE, max_delay=BACKOFF_MAX, factor=2.0, jitter=0.5):
+        self.base = base
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.attempt = 0
+
+    def next_delay(self):
+        delay = min(self.max_delay, self.base * self.factor ** self.attempt)
+        # Stop counting once capped, a long outage would overflow factor ** attempt
+        if delay < self.max_delay:
+            self.attempt += 1
+        # Spread retries out so cameras on the same dead Wi-Fi don't reconnect in lockstep
+        return delay * random.uniform(1 - self.jitter, 1)
+
+    def reset(self):
+        self.attempt = 0
+
+
+class CircuitBreaker:
+    """closed -> (N failures) -> open -> (cooldown, one probe) -> closed on success."""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.last_probe = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - (self.last_probe or self.opened_at) >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """True if a caller may use the camera now. A half-open breaker lets one probe through."""
+        state = self.state
+        if state == "half_open":
+            self.last_probe = time.monotonic()
+        return state != "open"
+
+    def retry_in(self):
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - (self.last_probe or self.opened_at)))
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.last_probe = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold and self.opened_at is None:
+            self.opened_at = time.monotonic()
+            return True  # Just tripped
+        return False
+
+
+class CameraHealth:
+    """Connection state and metrics for one camera stream (one hub reader)."""
+
+    def __init__(self, name, backoff=None, breaker=None):
+        self.name = name
+        self.backoff = backoff or Backoff()
+        self.breaker = breaker or CircuitBreaker()
+        self.lock = threading.Lock()
+
+        self.online = False
+        self.online_since = None
+        self.first_opened = None
+        self.uptime = 0.0          # Seconds connected, not counting the current session
+        self.reconnects = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_frame = None     # time.monotonic() of the last decoded frame
+        self.fps = 0.0
+        self.next_retry = None
+
+    def allow(self):
+        with self.lock:
+            return self.breaker.allow()
+
+    def check(self):
+        """Raises CircuitOpenError while the breaker is open."""
+        if not self.allow():
+            raise CircuitOpenError(
+                f"{self.name} is down, retry in {self.breaker.retry_in():.0f}s ({self.last_error})"
+            )
+
+    def record_frame(self):
+        """Called for every decoded frame. Returns True if the camera just came (back) online."""
+        now = time.monotonic()
+        with self.lock:
+            if self.last_frame is not None and self.online:
+                dt = now - self.last_frame
+                if dt > 0:
+                    # Smoothed decode rate
+                    self.fps = 1 / dt if self.fps == 0 else 0.9 * self.fps + 0.1 / dt
+            self.last_frame = now
+            if self.online:
+                return False
+            self.online = True
+            self.online_since = now
+            self.first_opened = self.first_opened or now
+            self.next_retry = None
+            self.backoff.reset()
+            self.breaker.record_success()
+            return True
+
+    def record_failure(self, error):
+        """Open or read failed. Returns how long to wait before reconnecting."""
+        now = time.monotonic()
+        with self.lock:
+            self._went_offline(now)
+            self.failures += 1
+            self.reconnects += 1
+            self.last_error = error
+            tripped = self.breaker.record_failure()
+            delay = self.backoff.next_delay()
+            self.next_retry = now + delay
+        if tripped:
+            print(f"🔌 {self.name}: circuit open after {self.breaker.failures} failures ({error})")
+        return delay
+
+    def record_closed(self):
+        """Reader closed on purpose (idle), not a failure."""
+        with self.lock:
+            self._went_offline(time.monotonic())
+            self.next_retry = None
+
+    def _went_offline(self, now):
+        if self.online:
+            self.uptime += now - self.online_since
+            self.online = False
+            self.online_since = None
+            self.fps = 0.0
+
+    def reset(self):
+        """Forget past failures (e.g. after fixing the phone) so callers may try right away."""
+        with self.lock:
+            self.breaker.record_success()
+            self.backoff.reset()
+            self.next_retry = None
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            uptime = self.uptime + (now - self.online_since if self.online else 0.0)
+            tracked = now - self.first_opened if self.first_opened else 0.0
+            return {
+                "online": self.online,
+                "circuit": self.breaker.state,
+                "uptime_s": round(uptime, 1),
+                "uptime_ratio": round(uptime / tracked, 3) if tracked else None,
+                "reconnects": self.reconnects,
+                "consecutive_failures": self.breaker.failures,
+                "last_frame_age_s": round(now - self.last_frame, 2) if self.last_frame else None,
+                "fps": round(self.fps, 1),
+                "retry_in_s": round(max(0.0, self.next_retry - now), 1) if self.next_retry else None,
+                "circuit_retry_in_s": round(self.breaker.retry_in(), 1),
+                "last_error": self.last_error,
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch camera health against a (flaky) source")
+    parser.add_argument("--url", default="flaky://?fail_rate=0.05&outage_every=40&outage_seconds=15")
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--every", type=float, default=5, help="Print interval in seconds")
+    args = parser.parse_args()
+
+    from camera_hub import CaptureHub
+
+    hub = CaptureHub([{"id": 1, "url": args.url}])
+    subscription = hub.subscribe(1)
+    stop_at = time.monotonic() + args.seconds
+    next_print = time.monotonic()
+    try:
+        while time.monotonic() < stop_at:
+            subscription.next_frame(timeout=0.5)
+            if time.monotonic() >= next_print:
+                print(f"🩺 {hub.health(1)}")
+                next_print += args.every
+    finally:
+        subscription.close()
+        hub.stop_all()
@@ -0,0 +1,610 @@
+"""
+Shared capture hub for the live camera streams.
+
+One background reader per camera pulls frames from the phone camera and
+publishes the latest decoded frame. Every /video_feed viewer subscribes to
+that reader instead of opening its own cv2.VideoCapture, so ten viewers on
+camera 2 still means one connection to the phone. Cameras configured with
+the same URL share one reader as well.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+import urllib.parse
+
+import cv2
+import numpy as np
+
+from camera_health import CameraHealth, CircuitOpenError
+from frame_ring import RING_SLOTS, FrameRing
+
+# How long a reader keeps the camera open after the last viewer leaves
+IDLE_TIMEOUT = float(os.getenv("CAPTURE_IDLE_TIMEOUT", "30"))
+# Set this to a local video file to replace every camera with a looping file
+FAKE_SOURCE = os.getenv("LITTERLENS_FAKE_SOURCE")
+
+
+# --- STAND-IN SOURCE (for testing without real cameras) ---
+class LoopingVideoSource:
+    """
+    Behaves like cv2.VideoCapture but replays a local video file forever,
+    paced at the file's own FPS so it feels like a live camera.
+    """
+
+    def __init__(self, path, fps=None):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        file_fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.isOpened() else 0
+        self.frame_interval = 1.0 / (fps or file_fps or 25)
+        self.last_read = 0.0
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        # Keep real-time pacing so readers don't spin through the file
+        wait = self.frame_interval - (time.monotonic() - self.last_read)
+        if wait > 0:
+            time.sleep(wait)
+        self.last_read = time.monotonic()
+
+        # Like cv2.VideoCapture.read: decodes into `image` when it has the right shape
+        success, frame = self.cap.read(image) if image is not None else self.cap.read()
+        if not success:
+            # End of file -> rewind and loop
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.cap.read(image) if image is not None else self.cap.read()
+        return success, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class FlakyVideoSource:
+    """
+    Synthetic camera that misbehaves on purpose, for testing reconnects and
+    the circuit breaker:
+
+        flaky://?fail_rate=0.05&outage_every=60&outage_seconds=20&fps=15&seed=1
+
+    Each read fails with probability `fail_rate`, and for `outage_seconds` out
+    of every `outage_every` seconds the stream can't be opened or read at all.
+    """
+
+    # Outages follow the wall clock, so they survive reopening the source
+    EPOCH = time.monotonic()
+
+    def __init__(self, fail_rate=0.0, outage_every=0.0, outage_seconds=0.0, fps=15.0,
+                 size=(640, 480), seed=None):
+        self.fail_rate = fail_rate
+        self.outage_every = outage_every
+        self.outage_seconds = outage_seconds
+        self.frame_interval = 1.0 / fps
+        self.size = size
+        self.rng = random.Random(seed)
+        self.count = 0
+        self.last_read = 0.0
+        self.opened = not self.in_outage()
+
+    @classmethod
+    def from_url(cls, url):
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+        options = {key: float(values[0]) for key, values in query.items()
+                   if key in ("fail_rate", "outage_every", "outage_seconds", "fps")}
+        if "seed" in query:
+            options["seed"] = int(query["seed"][0])
+        return cls(**options)
+
+    def in_outage(self):
+        if self.outage_every <= 0:
+            return False
+        return (time.monotonic() - self.EPOCH) % self.outage_every < self.outage_seconds
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self, image=None):
+        wait = self.frame_interval - (time.monotonic() - self.last_read)
+        if wait > 0:
+            time.sleep(wait)
+        self.last_read = time.monotonic()
+
+        if not self.opened or self.in_outage() or self.rng.random() < self.fail_rate:
+            return False, None
+        self.count += 1
+        width, height = self.size
+        if image is not None and image.shape == (height, width, 3):
+            frame = image
+            frame[:] = 40
+        else:
+            frame = np.full((height, width, 3), 40, dtype=np.uint8)
+        # A moving bar so consecutive frames differ
+        x = (self.count * 8) % width
+        frame[:, x:x + 16] = (0, 200, 0)
+        return True, frame
+
+    def release(self):
+        self.opened = False
+
+
+def open_source(url):
+    """Opens a camera URL, or a looping file when running without cameras."""
+    if FAKE_SOURCE:
+        return LoopingVideoSource(FAKE_SOURCE)
+    if url.startswith("file://"):
+        return LoopingVideoSource(url[len("file://"):])
+    if url.startswith("flaky://"):
+        return FlakyVideoSource.from_url(url)
+
+    os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "timeout;5000000"
+    return cv2.VideoCapture(url)
+
+
+# --- LATEST-VALUE BROADCASTER ---
+class FrameBroadcaster:
+    """
+    Runs a producer thread while anyone is subscribed and publishes only the
+    latest value it produced. Subclasses implement `_produce(generation)`,
+    looping while `self._keep_running(generation)` is true.
+
+    The thread starts with the first subscriber and stops once nobody has
+    been subscribed for `idle_timeout` seconds. Published values are shared
+    between subscribers, so treat them as read-only.
+    """
+
+    thread_name = "broadcaster"
+
+    # True for producers that publish FrameRing views (see _publish_ring_frame)
+    ring_backed = False
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+
+        self.condition = threading.Condition()
+        self.subscribers = 0
+        self.idle_since = None
+        self.thread = None
+        self.running = False
+        # Bumped on every (re)start so a stale thread never clobbers a new one
+        self.generation = 0
+
+        # Latest value and a counter so subscribers can tell new values apart
+        self.frame = None
+        self.seq = 0
+        self.frame_time = None
+        # Ring slot behind each recently published view: {seq: (ring, ring seq)}
+        self.published_slots = {}
+
+        # asyncio subscribers, grouped by event loop: {loop: set of AsyncSubscription}
+        self.async_queues = {}
+
+    def subscribe(self):
+        self._add_subscriber()
+        return Subscription(self)
+
+    def subscribe_async(self, maxsize=1):
+        """
+        Subscribes from inside a running event loop. Values are pushed into an
+        asyncio queue; when a slow client's queue is full the oldest value is
+        dropped for that client only, the producer never waits.
+        """
+        loop = asyncio.get_running_loop()
+        subscription = AsyncSubscription(self, loop, maxsize)
+        with self.condition:
+            self.async_queues.setdefault(loop, set()).add(subscription)
+        self._add_subscriber()
+        return subscription
+
+    def unsubscribe_async(self, subscription):
+        with self.condition:
+            queues = self.async_queues.get(subscription.loop)
+            if queues is not None:
+                queues.discard(subscription)
+                if not queues:
+                    del self.async_queues[subscription.loop]
+        self.unsubscribe()
+
+    def _add_subscriber(self):
+        with self.condition:
+            self.subscribers += 1
+            self.idle_since = None
+            if not self.running:
+                self.running = True
+                self.generation += 1
+                self.thread = threading.Thread(
+                    target=self._run, args=(self.generation,),
+                    name=self.thread_name, daemon=True
+                )
+                self.thread.start()
+
+    def unsubscribe(self):
+        with self.condition:
+            self.subscribers = max(0, self.subscribers - 1)
+            if self.subscribers == 0:
+                self.idle_since = time.monotonic()
+
+    def wait_for_frame(self, last_seq, timeout=5.0):
+        """Blocks until a value newer than `last_seq` arrives. Returns (seq, value)."""
+        with self.condition:
+            # The value is cleared when the producer idles out; wait for the restarted one
+            self.condition.wait_for(
+                lambda: (self.seq != last_seq and self.frame is not None) or not self.running, timeout=timeout
+            )
+            if self.seq == last_seq or self.frame is None:
+                return last_seq, None
+            return self.seq, self.frame
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+    def _keep_running(self, generation):
+        """Decides (atomically with subscribe) whether this producer thread should go on."""
+        with self.condition:
+            if not self.running or generation != self.generation:
+                return False
+            idle = (
+                self.subscribers == 0
+                and self.idle_since is not None
+                and time.monotonic() - self.idle_since >= self.idle_timeout
+            )
+            if idle:
+                self.running = False
+                self.frame = None
+                self.condition.notify_all()
+            return not idle
+
+    def _publish(self, frame):
+        with self.condition:
+            self.frame = frame
+            self.seq += 1
+            self.frame_time = time.time()
+            self.condition.notify_all()
+            async_queues = [(loop, list(subs)) for loop, subs in self.async_queues.items()]
+
+        # One hop per event loop, not per client
+        for loop, subscriptions in async_queues:
+            try:
+                loop.call_soon_threadsafe(_deliver, subscriptions, frame)
+            except RuntimeError:
+                # Loop already closed (server shutting down)
+                pass
+
+    def _publish_ring_frame(self, ring, ring_seq):
+        """Publishes frame `ring_seq` of a FrameRing as a zero-copy view. False if it is already gone."""
+        frame = ring.get(ring_seq)
+        if frame is None:
+            return False
+        with self.condition:
+            # _publish() gives this frame the next seq; older slots have been reused by now
+            self.published_slots[self.seq + 1] = (ring, ring_seq)
+            self.published_slots.pop(self.seq + 1 - ring.slots, None)
+        self._publish(frame)
+        return True
+
+    def frame_intact(self, seq):
+        """
+        True while published value `seq` is unmodified. Ring views are
+        overwritten after a few newer frames, so consumers check this after
+        using a frame and drop whatever they made from it if it is False.
+        """
+        if not self.ring_backed:
+            return True
+        with self.condition:
+            slot = self.published_slots.get(seq)
+        return slot is not None and slot[0].valid(slot[1])
+
+    def _run(self, generation):
+        try:
+            self._produce(generation)
+        finally:
+            with self.condition:
+                if generation == self.generation:
+                    self.running = False
+                self.condition.notify_all()
+
+    def _produce(self, generation):
+        raise NotImplementedError
+
+
+# --- ONE READER PER CAMERA ---
+class CameraReader(FrameBroadcaster):
+    """
+    Background thread that owns the single connection to one camera.
+
+    The connection is opened when the first viewer subscribes and closed
+    once nobody has been subscribed for `idle_timeout` seconds. Reconnects
+    are spaced out by `health` (backoff with jitter, circuit breaker).
+
+    Frames are decoded straight into the slots of a shared-memory FrameRing
+    and published as views of those slots, without a copy. A published
+    frame stays intact for `ring_slots - 1` further frames: subscribers
+    check `subscription.intact()` after using (or copying) a frame and
+    throw the work away if the slot was overwritten meanwhile.
+    """
+
+    ring_backed = True
+
+    def __init__(self, cam_id, url, source_factory=open_source, idle_timeout=IDLE_TIMEOUT,
+                 on_status=None, ring_slots=RING_SLOTS):
+        super().__init__(idle_timeout)
+        self.cam_id = cam_id
+        self.url = url
+        self.source_factory = source_factory
+        self.thread_name = f"capture-cam{cam_id}"
+        # Called as on_status(cam_id, online) whenever the camera goes up or down
+        self.on_status = on_status
+        self.online = None
+        self.health = CameraHealth(f"camera {cam_id}")
+        # Created on the first frame, replaced if the camera's resolution grows
+        self.ring = None
+        self.ring_slots = ring_slots
+        self.frame_shape = None
+
+    def _set_online(self, online):
+        if online == self.online:
+            return
+        self.online = online
+        if self.on_status is not None:
+            try:
+                self.on_status(self.cam_id, online)
+            except Exception as e:
+                print(f"⚠️ Camera status callback failed: {e}")
+
+    def _backoff(self, generation, error):
+        """Records the failure and sleeps out the backoff (cut short by stop())."""
+        delay = self.health.record_failure(error)
+        self._set_online(False)
+        print(f"⚠️ Camera {self.cam_id}: {error}. Retrying in {delay:.1f}s")
+        with self.condition:
+            self.condition.wait_for(
+                lambda: not self.running or generation != self.generation, timeout=delay
+            )
+
+    def _produce(self, generation):
+        print(f"📷 Opening camera {self.cam_id} ({self.url})")
+        cap = None
+
+        try:
+            while self._keep_running(generation):
+                if cap is None:
+                    cap = self.source_factory(self.url)
+                if not cap.isOpened():
+                    cap.release()
+                    cap = None
+                    self._backoff(generation, "could not open stream")
+                    continue
+
+                # Decode into the next ring slot; no new frame array per read
+                target = self.ring.writable(self.frame_shape) if self.ring is not None else None
+                success, frame = cap.read(target) if target is not None else cap.read()
+                if not success:
+                    cap.release()
+                    cap = None
+                    self._backoff(generation, "frame lost")
+                    continue
+
+                if self.health.record_frame():
+                    print(f"✅ Camera {self.cam_id} online")
+                self._set_online(True)
+                ring = self._ring_for(frame.shape)
+                seq = ring.commit(frame)
+                self.frame_shape = frame.shape
+                self._publish_ring_frame(ring, seq)
+        finally:
+            if cap is not None:
+                cap.release()
+            self.health.record_closed()
+            print(f"💤 Closed camera {self.cam_id}")
+
+    def _ring_for(self, shape):
+        """The ring, (re)created on the first frame or when frames no longer fit its slots."""
+        if self.ring is None or not self.ring.fits(shape):
+            old = self.ring
+            self.ring = FrameRing.create(shape, self.ring_slots)
+            self.ring.writable(shape)
+            if old is not None:
+                old.close()
+        return self.ring
+
+    def stop(self):
+        super().stop()
+        with self.condition:
+            self.frame = None
+            ring, self.ring = self.ring, None
+        if ring is not None:
+            ring.close()
+
+
+class Subscription:
+    """A single viewer's handle on a FrameBroadcaster. Use it as a context manager."""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.last_seq = 0
+        self.closed = False
+
+    def next_frame(self, timeout=5.0):
+        """Returns the next new frame, or None if the camera produced nothing in time."""
+        self.last_seq, frame = self.reader.wait_for_frame(self.last_seq, timeout)
+        return frame
+
+    def intact(self):
+        """True while the frame last returned by next_frame() is unmodified (check it after use)."""
+        return self.reader.frame_intact(self.last_seq)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.reader.unsubscribe()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncSubscription:
+    """
+    asyncio flavour of Subscription, fed by the producer thread through
+    loop.call_soon_threadsafe. Use it as an async context manager.
+    """
+
+    def __init__(self, broadcaster, loop, maxsize=1):
+        self.broadcaster = broadcaster
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, frame):
+        # Runs on the event loop thread. Drop the stale value if the client is behind.
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+    async def next_frame(self, timeout=5.0):
+        """Returns the next value, or None if nothing arrived in time."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.broadcaster.unsubscribe_async(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+
+def _deliver(subscriptions, frame):
+    for subscription in subscriptions:
+        if not subscription.closed:
+            subscription.offer(frame)
+
+
+# --- THE HUB ---
+class CaptureHub:
+    """
+    Keeps one CameraReader per source URL and hands out subscriptions by
+    camera id. Cameras that point at the same stream share a reader.
+    """
+
+    def __init__(self, cameras, source_factory=open_source, idle_timeout=IDLE_TIMEOUT, on_status=None):
+        self.source_factory = source_factory
+        self.idle_timeout = idle_timeout
+        self.on_status = on_status
+        self.lock = threading.Lock()
+        self.urls = {}
+        self.readers = {}
+        self.update(cameras)
+
+    def update(self, cameras):
+        """
+        Replaces the camera list (e.g. after a registry reload). Readers whose
+        stream is no longer used by any camera are stopped; subscribers of a
+        re-pointed camera should resubscribe (see `source`).
+        """
+        with self.lock:
+            self.urls = {cam["id"]: cam.get("source") or cam["url"] for cam in cameras}
+            in_use = set(self.urls.values())
+            stale = [url for url in self.readers if url not in in_use]
+            readers = [self.readers.pop(url) for url in stale]
+        for reader in readers:
+            reader.stop()
+
+    def source(self, cam_id):
+        """The URL a camera currently reads from, or None if it was removed."""
+        return self.urls.get(cam_id)
+
+    def _source_status(self, url, online):
+        # One stream up/down event fans out to every camera sharing it
+        if self.on_status is None:
+            return
+        for cam_id, cam_url in list(self.urls.items()):
+            if cam_url == url:
+                self.on_status(cam_id, online)
+
+    def reader(self, cam_id):
+        with self.lock:
+            if cam_id not in self.urls:
+                raise KeyError(cam_id)
+            url = self.urls[cam_id]
+            if url not in self.readers:
+                self.readers[url] = CameraReader(
+                    cam_id, url, self.source_factory, self.idle_timeout,
+                    lambda _cam_id, online, url=url: self._source_status(url, online)
+                )
+            return self.readers[url]
+
+    def subscribe(self, cam_id):
+        """Raises CircuitOpenError while the camera is known to be down."""
+        reader = self.reader(cam_id)
+        reader.health.check()
+        return reader.subscribe()
+
+    def available(self, cam_id):
+        """False while the camera's circuit breaker is open (fast-fail viewers)."""
+        with self.lock:
+            reader = self.readers.get(self.urls.get(cam_id))
+        return reader is None or reader.health.breaker.state != "open"
+
+    def health(self, cam_id):
+        """Metrics for one camera; cameras never opened report as idle."""
+        with self.lock:
+            url = self.urls.get(cam_id)
+            reader = self.readers.get(url)
+        if url is None:
+            raise KeyError(cam_id)
+        if reader is None:
+            return {"online": False, "circuit": "closed", "idle": True}
+        return {**reader.health.snapshot(), "idle": not reader.running}
+
+    def reset_health(self, cam_id):
+        self.reader(cam_id).health.reset()
+
+    def grab(self, url, timeout=5.0):
+        """
+        One frame from a source URL through its shared reader (for the scheduled
+        scan). Returns at once when the reader already has a frame, raises
+        CircuitOpenError instead of waiting on a camera known to be down, and
+        returns None if nothing arrived within `timeout`.
+        """
+        with self.lock:
+            cam_id = next((c for c, u in self.urls.items() if u == url), None)
+        if cam_id is None:
+            raise KeyError(url)
+        reader = self.reader(cam_id)
+        reader.health.check()
+
+        deadline = time.monotonic() + timeout
+        with reader.subscribe() as subscription:
+            while time.monotonic() < deadline:
+                frame = subscription.next_frame(timeout=min(0.5, max(0.0, deadline - time.monotonic())))
+                if frame is not None:
+                    # Hub frames are ring slots shared with live viewers, the caller gets its own
+                    # copy; one overwritten while it was copied is skipped for the next frame
+                    frame = frame.copy()
+                    if subscription.intact():
+                        return frame
+                if reader.health.breaker.state == "open":
+                    raise CircuitOpenError(f"camera {cam_id} went down ({reader.health.last_error})")
+        return None
+
+    def stop_all(self):
+        with self.lock:
+            readers = list(self.readers.values())
+        for reader in readers:
+            reader.stop()
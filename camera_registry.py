@@ -0,0 +1,209 @@
+"""
+In-memory camera registry backed by the `cameras` table.
+
+Everything that needs to know about cameras (live streams, the capture
+hub, the scheduled scan, continuous monitoring, zones) reads this registry
+instead of a hard-coded list. Lookups are plain dict reads by camera id.
+
+`reload()` re-reads the table and, when something changed, swaps in the
+new camera set and calls every `on_change` listener, so cameras can be
+added, moved or re-pointed without restarting the server. Cameras that
+share the same source URL are captured once (see `sources()`).
+"""
+import threading
+
+import cv2
+
+from models import Camera
+from roi_inference import parse_roi
+
+# Seeded into an empty `cameras` table (Replace these with the actual IPs from your Phone Apps)
+# Example: "http://192.168.1.5:8080/video"
+DEFAULT_CAMERAS = [
+    {"id": 1, "url": "http://172.30.19.16:8080/video", "name": "camera1"},
+    {"id": 2, "url": "http://172.30.11.196:8080/video", "name": "camera2"},
+    {"id": 3, "url": "http://172.30.19.16:8080/video", "name": "camera3"},
+    {"id": 4, "url": "http://172.30.19.16:8080/video", "name": "camera4"},
+    {"id": 5, "url": "http://172.30.19.16:8080/video", "name": "camera5"},
+    {"id": 6, "url": "http://172.30.19.16:8080/video", "name": "camera6"},
+    {"id": 7, "url": "http://172.30.19.16:8080/video", "name": "camera7"},
+    {"id": 8, "url": "http://172.30.11.196:8080/video", "name": "camera8"},
+    {"id": 9, "url": "http://172.30.11.196:8080/video", "name": "camera9"},
+    {"id": 10, "url": "http://172.30.11.196:8080/video", "name": "camera10"},
+    {"id": 11, "url": "http://172.30.11.196:8080/video", "name": "camera11"},
+    {"id": 12, "url": "http://172.30.11.196:8080/video", "name": "camera12"},
+]
+
+# Phone cameras are mounted sideways, so frames are turned 90 degrees clockwise by default
+DEFAULT_ROTATION = 90
+ROTATIONS = {
+    0: None,
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+
+def default_zone(cam_id):
+    # Same grouping as the zone picker in index.html (4 cameras per zone)
+    return (cam_id - 1) // 4 + 1
+
+
+def normalize_url(url):
+    """Key used to spot two cameras pointing at the same physical stream."""
+    return (url or "").strip().rstrip("/")
+
+
+def _parse_roi(text, cam_id):
+    try:
+        return parse_roi(text)
+    except (ValueError, TypeError, IndexError) as e:
+        # A typo in one camera's polygon shouldn't take the registry down
+        print(f"⚠️ Ignoring invalid ROI for camera {cam_id}: {e}")
+        return None
+
+
+def camera_config(row):
+    """Plain dict for one Camera row (or one DEFAULT_CAMERAS entry)."""
+    get = row.get if isinstance(row, dict) else lambda key, default=None: getattr(row, key, default)
+    cam_id = get("id")
+    rotation = get("rotation")
+    return {
+        "id": cam_id,
+        "name": get("name") or f"camera{cam_id}",
+        "url": get("url"),
+        "source": normalize_url(get("url")),
+        "zone": get("location_id") or default_zone(cam_id),
+        "rotation": DEFAULT_ROTATION if rotation is None else rotation % 360,
+        "width": get("width"),
+        "height": get("height"),
+        "enabled": get("enabled") is not False,
+        "retention_days": get("retention_days"),
+        "roi": _parse_roi(get("roi"), cam_id),
+        "tile_size": get("tile_size"),
+        "tile_overlap": get("tile_overlap"),
+    }
+
+
+def seed_cameras(db):
+    """Fills an empty `cameras` table with DEFAULT_CAMERAS."""
+    if db.query(Camera).first() is not None:
+        return 0
+    for cam in DEFAULT_CAMERAS:
+        db.add(Camera(id=cam["id"], name=cam["name"], url=cam["url"],
+                      location_id=default_zone(cam["id"]), rotation=DEFAULT_ROTATION))
+    db.commit()
+    print(f"✅ Seeded {len(DEFAULT_CAMERAS)} cameras.")
+    return len(DEFAULT_CAMERAS)
+
+
+def rotate_frame(frame, rotation, out=None):
+    """Rotated frame; written into `out` (see rotated_shape) when given, else a new array."""
+    code = ROTATIONS.get(rotation)
+    if code is None:
+        return frame
+    return cv2.rotate(frame, code) if out is None else cv2.rotate(frame, code, out)
+
+
+def rotated_shape(shape, rotation):
+    if rotation in (90, 270):
+        return (shape[1], shape[0]) + tuple(shape[2:])
+    return tuple(shape)
+
+
+class CameraRegistry:
+    """
+    Camera configs indexed by id. `session_factory` opens a sync session
+    (e.g. main.SessionLocal). Until the first successful load the registry
+    serves DEFAULT_CAMERAS so the app still works without a database.
+    """
+
+    def __init__(self, session_factory, fallback=DEFAULT_CAMERAS):
+        self.session_factory = session_factory
+        self.lock = threading.Lock()
+        self.cameras = {cam["id"]: camera_config(cam) for cam in fallback}
+        self.version = 0
+        self.listeners = []
+
+    # --- Lookups (no locking needed: the dict is replaced, never mutated) ---
+    def get(self, cam_id):
+        return self.cameras.get(cam_id)
+
+    def __contains__(self, cam_id):
+        return cam_id in self.cameras
+
+    def all(self, enabled_only=True):
+        cameras = sorted(self.cameras.values(), key=lambda cam: cam["id"])
+        return [cam for cam in cameras if cam["enabled"] or not enabled_only]
+
+    def ids(self, enabled_only=True):
+        return [cam["id"] for cam in self.all(enabled_only)]
+
+    def zone(self, cam_id):
+        cam = self.cameras.get(cam_id)
+        return cam["zone"] if cam else 0
+
+    def sources(self):
+        """{source url: [camera ids]} - one capture per physical stream."""
+        sources = {}
+        for cam in self.all():
+            sources.setdefault(cam["source"], []).append(cam["id"])
+        return sources
+
+    def retention_days(self, cam_id):
+        cam = self.cameras.get(cam_id)
+        return cam["retention_days"] if cam else None
+
+    def rotation(self, cam_id):
+        cam = self.cameras.get(cam_id)
+        return cam["rotation"] if cam else DEFAULT_ROTATION
+
+    def prepare_frame(self, cam_id, frame):
+        """Applies the camera's rotation and, if configured, its working resolution."""
+        cam = self.cameras.get(cam_id)
+        if cam is None:
+            return frame
+        frame = rotate_frame(frame, cam["rotation"])
+        if cam["width"] and cam["height"]:
+            frame = cv2.resize(frame, (cam["width"], cam["height"]))
+        return frame
+
+    # --- Hot reload ---
+    def on_change(self, listener):
+        """`listener(registry, changed_ids)` runs after every reload that changed something."""
+        self.listeners.append(listener)
+
+    def reload(self):
+        """Re-reads the cameras table. Returns the ids that were added, removed or changed."""
+        db = self.session_factory()
+        try:
+            rows = db.query(Camera).all()
+        finally:
+            db.close()
+        cameras = {row.id: camera_config(row) for row in rows}
+
+        with self.lock:
+            old = self.cameras
+            changed = sorted(
+                cam_id for cam_id in set(old) | set(cameras) if old.get(cam_id) != cameras.get(cam_id)
+            )
+            if not changed:
+                return []
+            self.cameras = cameras
+            self.version += 1
+
+        print(f"📷 Camera registry v{self.version}: {len(cameras)} cameras, "
+              f"{len(self.sources())} streams (changed: {changed})")
+        for listener in self.listeners:
+            try:
+                listener(self, changed)
+            except Exception as e:
+                print(f"⚠️ Camera registry listener failed: {e}")
+        return changed
+
+    def status(self):
+        return {
+            "version": self.version,
+            "cameras": self.all(enabled_only=False),
+            "streams": self.sources(),
+        }
@@ -1,5 +1,5 @@
 from sqlalchemy import inspect
-from main import engine
+from database import engine
 
 def verify_column():
     inspector = inspect(engine)
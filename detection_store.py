@@ -0,0 +1,84 @@
+"""
+Bulk writer for the unified `detection_events` table.
+
+Both the scheduled scan and the /detect upload path turn YOLO results into
+plain row dicts and write them with a single executemany INSERT per batch
+instead of one ORM object per box.
+"""
+import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from models import DetectionEvent
+from rollups import update_rollups
+
+MIN_CONFIDENCE = 0.25
+
+
+def severity_for_count(count):
+    if count == 0:
+        return "None"
+    elif count <= 5:
+        return "Low"      # 1-5 items
+    elif count <= 10:
+        return "Medium"   # 6-10 items
+    else:
+        return "High"     # 10+ items
+
+
+def point_wkt(latitude, longitude):
+    return f"SRID=4326;POINT({longitude} {latitude})"
+
+
+def detections_from_result(result, min_confidence=MIN_CONFIDENCE):
+    """[(class_name, confidence), ...] for the boxes above the threshold."""
+    detections = []
+    for box in result.boxes:
+        conf = float(box.conf[0])
+        if conf > min_confidence:
+            detections.append((result.names[int(box.cls[0])], conf))
+    return detections
+
+
+def build_rows(detections, source, camera_id=None, location=None, snapshot=None, timestamp=None,
+               item_count=None):
+    """
+    Turns [(class_name, confidence), ...] into row dicts for bulk_insert().
+    Severity is based on how many items were found in the same image, or on
+    `item_count` (e.g. unique tracked items in view) when given.
+    """
+    severity = severity_for_count(len(detections) if item_count is None else item_count)
+    timestamp = timestamp or datetime.datetime.utcnow()
+    return [
+        {
+            "source": source,
+            "camera_id": camera_id,
+            "waste_type": name,
+            "confidence": conf,
+            "severity": severity,
+            "timestamp": timestamp,
+            "snapshot": snapshot,
+            "location": location,
+        }
+        for name, conf in detections
+    ]
+
+
+def bulk_insert(db: Session, rows, commit=True):
+    """One executemany INSERT for all rows, committed together."""
+    if not rows:
+        return 0
+    db.execute(insert(DetectionEvent), rows)
+    if commit:
+        db.commit()
+    return len(rows)
+
+
+def write_batch(db: Session, rows, zone_for_camera):
+    """
+    Raw events plus their rollups, without committing - meant as the
+    write_fn of a write_behind.WriteBehindQueue, which commits the batch.
+    """
+    bulk_insert(db, rows, commit=False)
+    update_rollups(db, rows, zone_for_camera, commit=False)
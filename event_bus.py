@@ -0,0 +1,103 @@
+"""
+Server-push channel (Server-Sent Events) for dashboard updates.
+
+Producers anywhere in the app - scheduler threads, capture threads, async
+routes - call `publish(kind, key, data)`. Each connected client keeps a
+small dict of pending updates keyed by (kind, key); a newer update for the
+same key is merged into the pending one, so a slow client receives one
+coalesced message per camera instead of a backlog. Messages carry only the
+fields that changed.
+
+Event kinds used by the app:
+    risk      key=camera id  data=changed risk fields
+    camera    key=camera id  data={"online": bool}
+    snapshot  key=filename   data=new history item
+"""
+import asyncio
+import json
+import threading
+
+KEEPALIVE_SECONDS = 15
+# A client that falls this far behind is dropped; EventSource reconnects
+# by itself and starts again from a fresh full snapshot.
+MAX_PENDING = 500
+
+
+class EventClient:
+    def __init__(self, loop):
+        self.loop = loop
+        self.pending = {}
+        self.wakeup = asyncio.Event()
+        self.overflowed = False
+
+    def offer(self, kind, key, data):
+        # Runs on the client's event loop thread
+        slot = (kind, key)
+        if slot in self.pending:
+            self.pending[slot].update(data)
+        else:
+            if len(self.pending) >= MAX_PENDING:
+                self.overflowed = True
+            self.pending[slot] = dict(data)
+        self.wakeup.set()
+
+    def drain(self):
+        pending, self.pending = self.pending, {}
+        self.wakeup.clear()
+        return pending
+
+
+class EventBus:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = set()
+        self.stats = {"published": 0, "sent": 0, "connected": 0}
+
+    def publish(self, kind, key, data):
+        """Thread-safe. Queues `data` for every connected client."""
+        if not data:
+            return
+        with self.lock:
+            clients = list(self.clients)
+            self.stats["published"] += 1
+        for client in clients:
+            try:
+                client.loop.call_soon_threadsafe(client.offer, kind, key, data)
+            except RuntimeError:
+                # Loop closed during shutdown
+                pass
+
+    async def stream(self, initial_events=()):
+        """
+        Async generator of SSE-formatted text for one client. `initial_events`
+        is a list of (kind, data) sent first so the page can render right away.
+        """
+        client = EventClient(asyncio.get_running_loop())
+        with self.lock:
+            self.clients.add(client)
+            self.stats["connected"] = len(self.clients)
+        try:
+            for kind, data in initial_events:
+                yield format_event(kind, data)
+
+            while not client.overflowed:
+                try:
+                    await asyncio.wait_for(client.wakeup.wait(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # SSE comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+
+                pending = client.drain()
+                for (kind, key), data in pending.items():
+                    yield format_event(kind, {"key": key, **data})
+                with self.lock:
+                    self.stats["sent"] += len(pending)
+        finally:
+            with self.lock:
+                self.clients.discard(client)
+                self.stats["connected"] = len(self.clients)
+
+
+def format_event(kind, data):
+    return f"event: {kind}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,313 @@
+"""
+Shared-memory ring buffers for camera frames.
+
+Each camera reader decodes straight into one of N preallocated frame slots
+(cv2.VideoCapture.read with the slot as its destination) instead of getting
+a newly allocated frame on every read. The slots live in multiprocessing
+shared memory, so a process that attaches to the ring by name sees the very
+same pixels: no pickling, no copy.
+
+Every committed frame gets a sequence number. A slot's number is zeroed
+while the slot is being overwritten and set again once the frame is
+complete, so a reader can check that the view it worked on still holds the
+frame it asked for:
+
+    seq, frame = ring.latest()
+    ... use frame ...
+    if not ring.valid(seq):
+        ...  # the writer lapped us, throw the work away
+
+A view stays intact for RING_SLOTS - 1 further frames (about a quarter of a
+second at 30 fps with the default 8 slots); copy frames that must live
+longer. FrameBuffers keeps the destination arrays for cv2.rotate /
+cv2.resize (dst=...) so the steps after capture don't allocate either.
+
+    python frame_ring.py bench    # arrays and bytes allocated per frame, before vs. after
+"""
+import argparse
+import os
+import threading
+import time
+import tracemalloc
+from multiprocessing import shared_memory
+
+import numpy as np
+
+RING_SLOTS = int(os.getenv("FRAME_RING_SLOTS", "8"))
+# Header (int64): head seq, slot count, slot bytes, then seq/height/width/channels per slot
+GLOBAL_FIELDS = 3
+SLOT_FIELDS = 4
+HEADER_ALIGN = 64
+
+
+def _header_fields(slots):
+    return GLOBAL_FIELDS + slots * SLOT_FIELDS
+
+
+def _header_bytes(slots):
+    size = _header_fields(slots) * 8
+    # Keep the pixel data cache-line aligned
+    return (size + HEADER_ALIGN - 1) // HEADER_ALIGN * HEADER_ALIGN
+
+
+# Serializes attach (which must not register with the resource tracker) and create (which must)
+_tracker_lock = threading.Lock()
+
+
+def _open_shared(name):
+    """Attaches to an existing block without letting this process unlink it on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # Before Python 3.13 every attach registers the block with the resource
+    # tracker, which is shared with the process that created it: unregistering
+    # afterwards would drop the owner's registration too, so skip registering
+    from multiprocessing import resource_tracker
+    with _tracker_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class FrameRing:
+    """
+    Fixed number of uint8 frame slots in one shared memory block. One writer
+    (the camera reader) and any number of readers, in any process.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        slots = int(np.ndarray((GLOBAL_FIELDS,), dtype=np.int64, buffer=shm.buf)[1])
+        self.header = np.ndarray((_header_fields(slots),), dtype=np.int64, buffer=shm.buf)
+        self.slots = slots
+        self.slot_bytes = int(self.header[2])
+        self.data_offset = _header_bytes(slots)
+        self.writing = None
+
+    @classmethod
+    def create(cls, shape, slots=RING_SLOTS, name=None):
+        """New ring whose slots hold frames of up to `shape` (h, w, c) bytes."""
+        slot_bytes = int(np.prod(shape))
+        with _tracker_lock:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=_header_bytes(slots) + slot_bytes * slots)
+        header = np.ndarray((_header_fields(slots),), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[1] = slots
+        header[2] = slot_bytes
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Opens a ring created by another process (see `name`)."""
+        return cls(_open_shared(name), owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def head(self):
+        """Sequence number of the newest complete frame (0 = none yet, or closed)."""
+        if self.header is None:
+            return 0
+        return int(self.header[0])
+
+    def fits(self, shape):
+        return int(np.prod(shape)) <= self.slot_bytes
+
+    def _meta(self, index):
+        start = GLOBAL_FIELDS + index * SLOT_FIELDS
+        return self.header[start:start + SLOT_FIELDS]
+
+    def _view(self, index, shape):
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=self.data_offset + index * self.slot_bytes)
+
+    @staticmethod
+    def _shape(meta):
+        height, width, channels = (int(v) for v in meta[1:])
+        return (height, width, channels) if channels else (height, width)
+
+    # --- Writer ---
+    def writable(self, shape):
+        """
+        Array over the slot the next frame goes into, e.g. the destination of
+        cap.read(). Its old frame is invalidated now; call commit() when done.
+        """
+        if not self.fits(shape):
+            raise ValueError(f"frame {shape} does not fit a {self.slot_bytes} byte slot")
+        index = self.head % self.slots
+        meta = self._meta(index)
+        meta[0] = 0  # Invalidate before touching the pixels
+        meta[1:] = (shape[0], shape[1], shape[2] if len(shape) > 2 else 0)
+        self.writing = index
+        return self._view(index, tuple(shape))
+
+    def commit(self, frame=None):
+        """
+        Publishes the slot handed out by writable() and returns its sequence
+        number. A `frame` that isn't that slot (cv2 had to allocate, e.g.
+        after a resolution change) is copied in first.
+        """
+        index = self.writing
+        meta = self._meta(index)
+        view = self._view(index, self._shape(meta))
+        if frame is not None and frame.ctypes.data != view.ctypes.data:
+            if frame.shape != view.shape:
+                view = self.writable(frame.shape)
+            np.copyto(view, frame)
+        seq = self.head + 1
+        meta[0] = seq
+        self.header[0] = seq
+        self.writing = None
+        return seq
+
+    def put(self, frame):
+        """Copies a frame into the next slot, for sources that can't decode in place."""
+        self.writable(frame.shape)
+        return self.commit(frame)
+
+    # --- Readers ---
+    def get(self, seq):
+        """Zero-copy view of frame `seq`, or None once it has been overwritten (or the ring closed)."""
+        if seq <= 0 or self.header is None:
+            return None
+        meta = self._meta((seq - 1) % self.slots)
+        if int(meta[0]) != seq:
+            return None
+        view = self._view((seq - 1) % self.slots, self._shape(meta))
+        return view if int(meta[0]) == seq else None
+
+    def latest(self):
+        """(seq, view) of the newest frame; (0, None) before the first one and after close()."""
+        seq = self.head
+        return seq, self.get(seq)
+
+    def valid(self, seq):
+        """True while the slot still holds frame `seq` (check it after using a view)."""
+        if self.header is None:
+            # Closed: the writer moved on to a new ring
+            return False
+        return seq > 0 and int(self._meta((seq - 1) % self.slots)[0]) == seq
+
+    def read_into(self, out, seq=None):
+        """Copies frame `seq` (default: newest) into `out`. Returns its seq, or None if it was overwritten."""
+        seq = seq or self.head
+        view = self.get(seq)
+        if view is None or view.shape != out.shape:
+            return None
+        np.copyto(out, view)
+        return seq if self.valid(seq) else None
+
+    def close(self):
+        """Unmaps the ring (and removes it, for the owner). Views still held elsewhere keep it mapped."""
+        self.header = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # Someone still holds a view; the mapping goes away with the last one
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class FrameBuffers:
+    """
+    Reusable destination arrays for cv2 calls that accept dst=..., one per
+    key, replaced only when the needed shape changes. Not thread-safe: give
+    every worker thread its own.
+    """
+
+    def __init__(self):
+        self.buffers = {}
+        self.allocations = 0
+
+    def get(self, key, shape, dtype=np.uint8):
+        shape = tuple(shape)
+        buffer = self.buffers.get(key)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self.buffers[key] = np.empty(shape, dtype=dtype)
+            self.allocations += 1
+        return buffer
+
+
+# --- BENCHMARK ---
+def _bench(mode, frames, shape, rotation, size):
+    """Runs capture -> rotate -> resize -> JPEG over synthetic frames. Returns per-frame numbers."""
+    import cv2
+
+    from camera_registry import rotate_frame, rotated_shape
+
+    rng = np.random.default_rng(1)
+    source = rng.integers(0, 255, shape, dtype=np.uint8)
+    ring = FrameRing.create(shape) if mode == "ring" else None
+    buffers = FrameBuffers()
+    new_arrays = 0
+    allocated = 0
+
+    def fresh(array, *owned):
+        # A stage output counts as an allocation unless it is one of our preallocated arrays
+        return 0 if any(array.ctypes.data == o.ctypes.data for o in owned) else 1
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+
+            if ring is not None:
+                # Decode in place: stands in for cap.read(slot)
+                slot = ring.writable(shape)
+                np.copyto(slot, source)
+                frame = ring.get(ring.commit(slot))
+                rotated = rotate_frame(frame, rotation, out=buffers.get("rotated", rotated_shape(shape, rotation)))
+                resized = cv2.resize(rotated, size, dst=buffers.get("resized", (size[1], size[0], shape[2])))
+                new_arrays += fresh(frame, slot) + fresh(rotated, buffers.buffers["rotated"], frame) \
+                    + fresh(resized, buffers.buffers["resized"])
+            else:
+                # What cap.read() without a destination does: a new frame every time
+                frame = source.copy()
+                rotated = rotate_frame(frame, rotation)
+                resized = cv2.resize(rotated, size)
+                new_arrays += 3
+
+            ok, jpeg = cv2.imencode(".jpg", resized, [int(cv2.IMWRITE_JPEG_QUALITY), 50])
+            new_arrays += 1  # imencode always returns a new buffer
+            allocated += tracemalloc.get_traced_memory()[1] - before
+            del frame, rotated, resized, jpeg
+    finally:
+        elapsed = time.perf_counter() - start
+        tracemalloc.stop()
+        if ring is not None:
+            ring.close()
+
+    # The buffers (and the ring) are set up once; spread over the run they're near zero per frame
+    return {
+        "mode": mode,
+        "fps": round(frames / elapsed, 1),
+        "new_arrays_per_frame": round(new_arrays / frames, 2),
+        "allocated_kb_per_frame": round(allocated / frames / 1024, 1),
+        "setup_allocations": buffers.allocations + (1 if mode == "ring" else 0),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Frame ring buffer tools")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--rotation", type=int, default=90)
+    args = parser.parse_args()
+
+    for mode in ("allocating", "ring"):
+        print(f"🧪 {_bench(mode, args.frames, (args.height, args.width, 3), args.rotation, (640, 480))}")
@@ -0,0 +1,155 @@
+"""
+Shared YOLO inference service.
+
+The model is loaded once and a single worker thread owns it. Callers (the
+scheduled scan, the /detect upload endpoint, live streams) submit images
+and get a Future back; the worker gathers whatever is waiting into a
+micro-batch - at most MAX_BATCH images, waiting at most MAX_WAIT_MS for
+stragglers - and runs it through one forward pass.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from model_export import load_runtime
+
+MODEL_PATH = os.getenv("YOLO_MODEL", "best.pt")
+MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "8"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+
+
+def load_model(path=MODEL_PATH):
+    """
+    Loads the weights with the fastest installed CPU runtime (see model_export)
+    and warms it up. Falls back to yolov8n.pt if `path` doesn't exist.
+    """
+    print(f"Attempting to load {path}...")
+    return load_runtime(path)
+
+
+class InferenceEngine:
+    """Micro-batching front end for one YOLO model."""
+
+    def __init__(self, model=None, model_path=MODEL_PATH, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.model_path = model_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.ready = threading.Event()
+        self.load_error = None
+
+        # Simple counters for /api/inference_stats style reporting
+        self.stats = {"images": 0, "batches": 0, "busy_seconds": 0.0}
+
+    # --- Lifecycle ---
+    def start(self):
+        """Starts the worker and waits until the model is loaded. Safe to call repeatedly."""
+        self._ensure_worker()
+        self.ready.wait()
+        if self.load_error is not None:
+            raise RuntimeError(f"Could not load model: {self.load_error}")
+        return self
+
+    def warm_start(self):
+        """Starts loading + warming the model in the background, returns immediately."""
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        # Doesn't wait for the model, so async callers never block on loading
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._worker, name="inference", daemon=True)
+                self.thread.start()
+
+    @property
+    def names(self):
+        self.start()
+        return self.model.names
+
+    # --- Submitting work ---
+    def submit(self, image):
+        """Queues one image (numpy BGR frame or PIL image). Returns a Future of its Results."""
+        self._ensure_worker()
+        future = Future()
+        self.requests.put((image, future))
+        return future
+
+    def predict(self, image, timeout=None):
+        return self.submit(image).result(timeout)
+
+    def predict_many(self, images, timeout=None):
+        """Submits several images at once; they usually land in the same batch."""
+        futures = [self.submit(image) for image in images]
+        return [future.result(timeout) for future in futures]
+
+    async def predict_async(self, image):
+        """Awaitable version for async routes, the event loop is never blocked."""
+        return await asyncio.wrap_future(self.submit(image))
+
+    # --- Worker ---
+    def _next_batch(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                # Take anything already queued, then wait briefly for stragglers
+                batch.append(self.requests.get_nowait() if remaining <= 0 else self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        try:
+            if self.model is None:
+                self.model = load_model(self.model_path)
+        except Exception as e:
+            print(f"❌ Could not load any YOLO model: {e}")
+            self.load_error = e
+        self.ready.set()
+
+        while True:
+            batch = self._next_batch()
+            # Skip requests whose callers already gave up
+            batch = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            if self.load_error is not None:
+                for _, future in batch:
+                    future.set_exception(RuntimeError(f"Could not load model: {self.load_error}"))
+                continue
+
+            start = time.perf_counter()
+            try:
+                results = self.model([image for image, _ in batch], verbose=False)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.stats["images"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["busy_seconds"] += time.perf_counter() - start
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Returns the process-wide engine. The model is loaded on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = InferenceEngine()
+        return _engine
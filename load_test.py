@@ -0,0 +1,102 @@
+"""
+Load test for the dashboard update channel.
+
+Simulates N operators watching the admin dashboard and compares the
+request rate of the old per-camera polling with the bulk endpoint and the
+SSE push channel. Run it against a live server:
+
+    python load_test.py --url http://localhost:8000 --clients 20 --cameras 12 --duration 30
+"""
+import argparse
+import http.client
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+
+def poll_client(base_url, cameras, interval, stop, counters, lock, bulk):
+    while not stop.is_set():
+        started = time.monotonic()
+        paths = ["/api/risk_status"] if bulk else [f"/api/risk_status/{cam_id}" for cam_id in range(1, cameras + 1)]
+        for path in paths:
+            try:
+                with urllib.request.urlopen(base_url + path, timeout=10) as response:
+                    size = len(response.read())
+                with lock:
+                    counters["requests"] += 1
+                    counters["bytes"] += size
+            except Exception:
+                with lock:
+                    counters["errors"] += 1
+        stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+
+def sse_client(base_url, stop, counters, lock):
+    url = urllib.parse.urlparse(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    try:
+        conn.request("GET", "/api/events", headers={"Accept": "text/event-stream"})
+        response = conn.getresponse()
+        with lock:
+            counters["requests"] += 1
+        while not stop.is_set():
+            line = response.fp.readline()
+            if not line:
+                break
+            with lock:
+                counters["bytes"] += len(line)
+                if line.startswith(b"event:"):
+                    counters["messages"] += 1
+    except Exception:
+        with lock:
+            counters["errors"] += 1
+    finally:
+        conn.close()
+
+
+def run_mode(mode, args):
+    counters = {"requests": 0, "bytes": 0, "errors": 0, "messages": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    threads = []
+    for _ in range(args.clients):
+        if mode == "sse":
+            target, targs = sse_client, (args.url, stop, counters, lock)
+        else:
+            target, targs = poll_client, (args.url, args.cameras, args.interval, stop, counters, lock, mode == "bulk")
+        thread = threading.Thread(target=target, args=targs, daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=1)
+
+    counters["req_per_s"] = round(counters["requests"] / args.duration, 1)
+    counters["kb_per_s"] = round(counters["bytes"] / 1024 / args.duration, 1)
+    return counters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dashboard polling vs. push load test")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--cameras", type=int, default=12)
+    parser.add_argument("--interval", type=float, default=2.0, help="Polling interval in seconds")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per mode")
+    parser.add_argument("--modes", default="poll,bulk,sse")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes.split(","):
+        print(f"🚦 Running '{mode}' with {args.clients} clients for {args.duration:.0f}s...")
+        results[mode] = run_mode(mode, args)
+
+    labels = {"poll": "per-camera polling (before)", "bulk": "bulk polling", "sse": "SSE push (after)"}
+    print(f"\n{'mode':<30}{'req/s':>8}{'KB/s':>8}{'msgs':>8}{'errors':>8}")
+    for mode, row in results.items():
+        print(f"{labels.get(mode, mode):<30}{row['req_per_s']:>8}{row['kb_per_s']:>8}"
+              f"{row['messages']:>8}{row['errors']:>8}")
@@ -0,0 +1,213 @@
+"""
+CPU-friendly model export, runtime selection and warm start.
+
+Our detection nodes have no GPU, so the PyTorch weights are exported once
+to a faster CPU backend (OpenVINO, ONNX Runtime or TorchScript). Exports are
+cached under model_cache/<weights hash>/<backend and export options>/, so
+they are rebuilt only when the weights or the export settings change.
+ONNX and OpenVINO graphs are exported with a dynamic batch axis, so the
+micro-batches of inference.py run as one call.
+
+Usage:
+    python model_export.py export [--backend onnx] [--weights best.pt]
+    python model_export.py benchmark [--images detected_snapshots] [--runs 20] [--batch 8]
+"""
+import argparse
+import glob
+import hashlib
+import importlib.util
+import os
+import shutil
+import statistics
+import time
+
+import numpy as np
+from ultralytics import YOLO
+
+CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "model_cache")
+# auto | openvino | onnx | torchscript | pytorch
+RUNTIME = os.getenv("YOLO_RUNTIME", "auto")
+IMGSZ = int(os.getenv("YOLO_IMGSZ", "640"))
+WARMUP_RUNS = int(os.getenv("YOLO_WARMUP_RUNS", "2"))
+# Same batch size as the inference engine's micro-batches (inference.MAX_BATCH)
+BENCH_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "8"))
+
+# Preference order for "auto", fastest CPU backend first.
+# Each backend lists the python module it needs at runtime, its export artifact
+# and extra export() arguments. dynamic=True leaves the batch axis free: a
+# static export only takes one image per call.
+BACKENDS = {
+    "openvino": {"requires": "openvino", "artifact": "model_openvino_model", "export": {"dynamic": True}},
+    "onnx": {"requires": "onnxruntime", "artifact": "model.onnx", "export": {"dynamic": True}},
+    "torchscript": {"requires": "torch", "artifact": "model.torchscript", "export": {}},
+    "pytorch": {"requires": "torch", "artifact": "model.pt", "export": {}},
+}
+
+
+def weights_hash(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()[:16]
+
+
+def resolve_weights(path, fallback="yolov8n.pt"):
+    """Returns a weights file that exists on disk (downloads the fallback if needed)."""
+    if os.path.exists(path):
+        return path
+    print(f"⚠️ {path} not found. Using standard {fallback}...")
+    return YOLO(fallback).ckpt_path
+
+
+def backend_available(backend):
+    return importlib.util.find_spec(BACKENDS[backend]["requires"]) is not None
+
+
+def export_options(backend):
+    return {"imgsz": IMGSZ, **BACKENDS[backend]["export"]}
+
+
+def export_model(weights, backend):
+    """
+    Exports `weights` to `backend` (if not cached yet) and returns the artifact path.
+    The weights are copied into the cache folder first, so ultralytics writes
+    its export right next to them. Every set of export options gets its own
+    folder, e.g. onnx-dynamicTrue-imgsz640.
+    """
+    options = export_options(backend)
+    variant = "-".join([backend] + [f"{key}{value}" for key, value in sorted(options.items())])
+    cache_dir = os.path.join(CACHE_DIR, weights_hash(weights), variant)
+    os.makedirs(cache_dir, exist_ok=True)
+    cached_weights = os.path.join(cache_dir, "model.pt")
+    if not os.path.exists(cached_weights):
+        shutil.copyfile(weights, cached_weights)
+
+    artifact = os.path.join(cache_dir, BACKENDS[backend]["artifact"])
+    if os.path.exists(artifact):
+        return artifact
+
+    print(f"📦 Exporting {weights} to {backend} (one-time, cached in {cache_dir})...")
+    exported = YOLO(cached_weights).export(format=backend, **options)
+    if os.path.abspath(str(exported)) != os.path.abspath(artifact):
+        shutil.move(str(exported), artifact)
+    return artifact
+
+
+def load_backend(weights, backend):
+    artifact = export_model(weights, backend)
+    return YOLO(artifact, task="detect")
+
+
+def warm_up(model, runs=WARMUP_RUNS, imgsz=IMGSZ):
+    """Runs dummy frames through the model so the first real request skips graph setup."""
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    for _ in range(runs):
+        model(dummy, verbose=False)
+
+
+def load_runtime(weights, runtime=RUNTIME, warmup=True):
+    """
+    Loads the model with the requested runtime ("auto" picks the first
+    backend that is installed and exports cleanly) and warms it up.
+    """
+    weights = resolve_weights(weights)
+    candidates = list(BACKENDS) if runtime == "auto" else [runtime]
+
+    for backend in candidates:
+        if not backend_available(backend):
+            continue
+        try:
+            start = time.perf_counter()
+            model = load_backend(weights, backend)
+            if warmup:
+                warm_up(model)
+            print(f"✅ YOLO runtime: {backend} (ready in {time.perf_counter() - start:.1f}s)")
+            return model
+        except Exception as e:
+            print(f"⚠️ {backend} runtime unavailable: {e}")
+
+    raise RuntimeError(f"No usable YOLO runtime among {candidates}")
+
+
+# --- BENCHMARK ---
+def benchmark(weights, image_dir="detected_snapshots", runs=20, batch=BENCH_BATCH):
+    """Compares latency and throughput of every installed backend on real snapshots."""
+    import cv2
+
+    paths = sorted(glob.glob(os.path.join(image_dir, "*.jpg")))
+    images = [cv2.imread(p) for p in paths]
+    images = [img for img in images if img is not None]
+    if not images:
+        print(f"❌ No images found in {image_dir}")
+        return []
+
+    weights = resolve_weights(weights)
+    rows = []
+    for backend in BACKENDS:
+        if not backend_available(backend):
+            print(f"⏭️ Skipping {backend} ({BACKENDS[backend]['requires']} not installed)")
+            continue
+        try:
+            start = time.perf_counter()
+            model = load_backend(weights, backend)
+            warm_up(model)
+            load_s = time.perf_counter() - start
+        except Exception as e:
+            print(f"⚠️ Skipping {backend}: {e}")
+            continue
+
+        row = {"backend": backend, "load_s": round(load_s, 2)}
+        try:
+            # Single-image latency
+            latencies = []
+            for i in range(runs):
+                start = time.perf_counter()
+                model(images[i % len(images)], verbose=False)
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+            row["p50_ms"] = round(statistics.median(latencies), 1)
+            row["p95_ms"] = round(latencies[int(0.95 * (len(latencies) - 1))], 1)
+
+            # Batched throughput over the whole folder (one call per batch)
+            start = time.perf_counter()
+            for i in range(0, len(images), batch):
+                model(images[i:i + batch], verbose=False)
+            row["images_per_s"] = round(len(images) / (time.perf_counter() - start), 1)
+        except Exception as e:
+            # e.g. a graph that doesn't take batches: report it, keep benchmarking the others
+            print(f"⚠️ {backend} failed: {e}")
+            row["error"] = str(e)
+        rows.append(row)
+
+    print(f"\n📊 {len(images)} images from {image_dir}, {runs} latency runs, batch {batch}")
+    print(f"{'backend':<12}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}{'img/s':>8}")
+    for row in rows:
+        line = f"{row['backend']:<12}{row['load_s']:>8}"
+        for key, width in (("p50_ms", 9), ("p95_ms", 9), ("images_per_s", 8)):
+            line += f"{row.get(key, '-'):>{width}}"
+        if "error" in row:
+            line += f"  error: {row['error']}"
+        print(line)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export / benchmark the LitterLens YOLO model")
+    parser.add_argument("command", choices=["export", "benchmark"])
+    parser.add_argument("--weights", default=os.getenv("YOLO_MODEL", "best.pt"))
+    parser.add_argument("--backend", default="all", choices=["all"] + list(BACKENDS))
+    parser.add_argument("--images", default="detected_snapshots")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=BENCH_BATCH)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        weights = resolve_weights(args.weights)
+        for backend in (BACKENDS if args.backend == "all" else [args.backend]):
+            if backend_available(backend):
+                print(f"✅ {backend}: {export_model(weights, backend)}")
+            else:
+                print(f"⏭️ {backend}: {BACKENDS[backend]['requires']} not installed")
+    else:
+        benchmark(args.weights, args.images, args.runs, args.batch)
@@ -1,5 +1,8 @@
-from sqlalchemy import Column, Integer, String
+import datetime
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Boolean, Text, Index, UniqueConstraint
+from sqlalchemy import inspect, literal, text
 from sqlalchemy.ext.declarative import declarative_base
+from geoalchemy2 import Geometry
 
 # Standard SQLAlchemy Base definition
 Base = declarative_base()
@@ -41,4 +44,150 @@ class Camera(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
     url = Column(String)
-    location_id = Column(Integer) # Links to zone number (1, 2, or 3)
\ No newline at end of file
+    location_id = Column(Integer) # Links to zone number (1, 2, or 3)
+    # Capture settings, picked up by the camera registry without a restart
+    rotation = Column(Integer, default=90)   # Degrees clockwise: 0, 90, 180 or 270
+    width = Column(Integer, nullable=True)   # Working resolution for detection (empty = as captured)
+    height = Column(Integer, nullable=True)
+    enabled = Column(Boolean, default=True)
+    retention_days = Column(Integer, nullable=True)  # Snapshot retention (empty = SNAPSHOT_RETENTION_DAYS)
+    # Detection regions: JSON list of polygons, points normalized 0..1 in the rotated frame
+    roi = Column(Text, nullable=True)
+    tile_size = Column(Integer, nullable=True)  # Split regions into tiles of this many px (empty = no tiling)
+    tile_overlap = Column(Float, nullable=True)  # Fraction of overlap between tiles (default 0.2)
+
+# 4. SNAPSHOT CATALOG (one row per file in detected_snapshots/)
+class Snapshot(Base):
+    __tablename__ = "snapshots"
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String, unique=True, index=True)  # e.g. cam1_2026-01-28_16-00-00.jpg
+    camera_id = Column(Integer, nullable=True)
+    taken_at = Column(DateTime, index=True)
+    waste_detected = Column(String, default="Unknown")  # e.g. "Plastic, Bottle"
+    boxes = Column(Text, nullable=True)  # JSON box record (see snapshot_render), empty for old snapshots
+    file_mtime = Column(Float)
+    # Storage tier: "hot" (as written), "warm" (re-encoded) or "archived"
+    tier = Column(String, default="hot")
+    archive = Column(String, nullable=True)  # Day archive holding it, e.g. 2026-01-28.zip
+
+    # History is read newest-first, optionally for a single camera
+    __table_args__ = (Index("ix_snapshots_camera_taken", "camera_id", "taken_at"),)
+
+
+# 4b. SNAPSHOT CLASSES (one row per waste class found in a snapshot, for the /api/history filter)
+class SnapshotClass(Base):
+    __tablename__ = "snapshot_classes"
+    snapshot_id = Column(Integer, primary_key=True)
+    waste_class = Column(String, primary_key=True)  # Lower-case class name, e.g. "bottle"
+
+    # Snapshots with a given class, by id
+    __table_args__ = (Index("ix_snapshot_classes_class", "waste_class", "snapshot_id"),)
+
+
+# 5. DETECTION EVENTS (one row per detected item, from the scheduler and from uploads)
+class DetectionEvent(Base):
+    __tablename__ = "detection_events"
+    id = Column(BigInteger, primary_key=True)
+    source = Column(String)                 # "scheduler", "monitor", "upload" or "bulk"
+    camera_id = Column(Integer, nullable=True)  # Empty for uploaded photos
+    waste_type = Column(String)
+    confidence = Column(Float)
+    severity = Column(String, nullable=True)
+    timestamp = Column(DateTime, default=datetime.datetime.utcnow)
+    snapshot = Column(String, nullable=True)  # Snapshot filename, if one was saved
+    # GeoAlchemy2 creates a GIST spatial index for this column
+    location = Column(Geometry(geometry_type='POINT', srid=4326, spatial_index=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_detection_events_camera_time", "camera_id", "timestamp"),
+        Index("ix_detection_events_type_time", "waste_type", "timestamp"),
+    )
+
+
+# 6. DETECTION ROLLUPS (hourly / daily counts, kept up to date as detections arrive)
+class DetectionRollup(Base):
+    __tablename__ = "detection_rollups"
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String)     # "hour" or "day"
+    bucket_start = Column(DateTime)  # Start of the hour / day (UTC)
+    camera_id = Column(Integer, default=0)  # 0 = uploaded photos (no camera)
+    zone = Column(Integer, default=0)       # 0 = unknown zone
+    waste_type = Column(String)
+    severity = Column(String)
+    count = Column(Integer, default=0)
+
+    __table_args__ = (
+        # One row per bucket/key; also what the upsert conflicts on
+        UniqueConstraint("granularity", "bucket_start", "camera_id", "zone", "waste_type", "severity",
+                         name="uq_detection_rollups_key"),
+        Index("ix_detection_rollups_zone_time", "granularity", "zone", "bucket_start"),
+    )
+
+
+# 7. BULK INGEST JOBS (offline detection over uploaded folders / archives)
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, index=True)  # Re-running a job name resumes it
+    source = Column(String)                  # Folder, zip or image path being ingested
+    status = Column(String, default="pending")  # running / done / interrupted / failed
+    total = Column(Integer, default=0)
+    processed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    detections = Column(Integer, default=0)
+    # Location for photos without GPS in their EXIF
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+# 8. INGESTED FILES (one row per image of a job, written with its detections)
+class IngestedFile(Base):
+    __tablename__ = "ingested_files"
+    id = Column(BigInteger, primary_key=True)
+    job_id = Column(Integer)
+    key = Column(String)          # Path inside the job source, e.g. day2/IMG_0042.jpg or photos.zip/IMG_1.jpg
+    status = Column(String)       # "ok" or "failed"
+    detections = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+
+    __table_args__ = (UniqueConstraint("job_id", "key", name="uq_ingested_files_job_key"),)
+
+
+# --- SCHEMA UPGRADES ---
+# create_all() only creates missing tables, it never adds columns to a table
+# that already exists. Columns added to existing tables go in this list and
+# are added by upgrade_schema() on startup.
+ADDED_COLUMNS = [
+    Camera.rotation, Camera.width, Camera.height, Camera.enabled,
+    Camera.retention_days,
+    Camera.roi, Camera.tile_size, Camera.tile_overlap,
+    Snapshot.tier, Snapshot.archive, Snapshot.boxes,
+]
+
+
+def upgrade_schema(engine):
+    """ALTER TABLE ... ADD COLUMN for every ADDED_COLUMNS entry the database doesn't have yet."""
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for attribute in ADDED_COLUMNS:
+            column = attribute.property.columns[0]
+            table = column.table.name
+            if not inspector.has_table(table):
+                continue  # create_all() makes it with every column
+            if column.name in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            ddl = f"ALTER TABLE {table} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+            if column.default is not None and column.default.is_scalar:
+                # Existing rows get the model default instead of NULL
+                value = literal(column.default.arg, column.type).compile(
+                    dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+                ddl += f" DEFAULT {value}"
+            conn.execute(text(ddl))
+            added.append(f"{table}.{column.name}")
+    if added:
+        print(f"🛠️ Added database columns: {', '.join(added)}")
+    return added
@@ -0,0 +1,305 @@
+"""
+Continuous low-rate monitoring mode.
+
+Instead of one daily cron shot, every enabled camera is sampled every N
+seconds (configurable per camera) and the frame goes through the change
+gate and the shared inference engine. A global CPU budget paces the work:
+inference time is paid for out of a token bucket that refills at
+`cpu_budget` CPU-seconds per second. When the system falls behind -
+budget exhausted, workers busy, or a camera overdue - samples are skipped
+and counted, never queued up.
+"""
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from camera_health import CircuitOpenError
+from tracker import detections_with_boxes
+
+DEFAULT_INTERVAL = float(os.getenv("MONITOR_INTERVAL", "30"))
+# Fraction of one core the monitor may spend on inference (0.5 = half a core)
+CPU_BUDGET = float(os.getenv("MONITOR_CPU_BUDGET", "0.5"))
+MAX_WORKERS = int(os.getenv("MONITOR_WORKERS", "4"))
+# How long a sample may wait for a fresh frame from the capture hub
+FRAME_TIMEOUT = 5.0
+
+
+class CpuBudget:
+    """Token bucket measured in inference seconds."""
+
+    def __init__(self, cpu_budget=CPU_BUDGET, burst_seconds=5.0):
+        self.rate = cpu_budget
+        self.capacity = cpu_budget * burst_seconds
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self):
+        with self.lock:
+            self._refill()
+            return self.tokens > 0
+
+    def spend(self, seconds):
+        # May go negative: the next samples are skipped until it is paid back
+        with self.lock:
+            self._refill()
+            self.tokens -= seconds
+
+
+class ContinuousMonitor:
+    """
+    Samples cameras from the capture hub on per-camera intervals.
+
+    `detect(cam_id, frame)` returns one YOLO result (e.g. RoiDetector.detect),
+    `on_result(cam_id, result)` receives every result, `prepare(cam_id, frame)`
+    can rotate/crop the raw hub frame before detection.
+
+    With a tracker.MultiCameraTracker, YOLO only runs every few samples per
+    camera and the samples in between update the tracks cheaply. on_result is
+    then called as `on_result(cam_id, result, new_items)`, with result None
+    for tracking-only samples and new_items the items confirmed by this sample.
+    """
+
+    def __init__(self, hub, camera_ids, detect, on_result, gate=None, prepare=None,
+                 default_interval=DEFAULT_INTERVAL, cpu_budget=CPU_BUDGET, max_workers=MAX_WORKERS,
+                 tracker=None):
+        self.hub = hub
+        self.detect = detect
+        self.on_result = on_result
+        self.gate = gate
+        self.prepare = prepare
+        self.tracker = tracker
+        self.budget = CpuBudget(cpu_budget)
+        self.max_workers = max_workers
+
+        self.default_interval = default_interval
+        self.lock = threading.Lock()
+        self.schedules = {cam_id: {"interval": default_interval, "enabled": True} for cam_id in camera_ids}
+        self.counters = {cam_id: self._new_counters() for cam_id in camera_ids}
+        self.subscriptions = {}
+        self.in_flight = set()
+        # Cameras added while running, picked up by the scheduling loop
+        self.added = []
+
+        self.running = False
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pool = None
+
+    @staticmethod
+    def _new_counters():
+        return {"sampled": 0, "inferred": 0, "gated": 0, "tracked": 0, "skipped_budget": 0,
+                "skipped_busy": 0, "skipped_late": 0, "no_frame": 0, "overwritten": 0, "circuit_open": 0,
+                "errors": 0}
+
+    # --- Configuration ---
+    def configure(self, cam_id, interval=None, enabled=None):
+        with self.lock:
+            if cam_id not in self.schedules:
+                raise KeyError(cam_id)
+            if interval is not None:
+                if interval <= 0:
+                    raise ValueError("interval must be positive")
+                self.schedules[cam_id]["interval"] = float(interval)
+            if enabled is not None:
+                self.schedules[cam_id]["enabled"] = bool(enabled)
+        self.wakeup.set()
+        return dict(self.schedules[cam_id])
+
+    def sync_cameras(self, camera_ids, changed=()):
+        """
+        Follows a camera registry reload: new cameras get the default schedule,
+        removed ones are dropped, and `changed` cameras drop their hub
+        subscription so the next sample reads from the new stream.
+        """
+        camera_ids = list(camera_ids)
+        with self.lock:
+            for cam_id in camera_ids:
+                if cam_id not in self.schedules:
+                    self.schedules[cam_id] = {"interval": self.default_interval, "enabled": True}
+                    self.counters[cam_id] = self._new_counters()
+                    self.added.append(cam_id)
+            for cam_id in [c for c in self.schedules if c not in camera_ids]:
+                del self.schedules[cam_id]
+                del self.counters[cam_id]
+        for cam_id in set(changed):
+            self._release(cam_id)
+        self.wakeup.set()
+
+    def status(self):
+        with self.lock:
+            return {
+                "running": self.running,
+                "cpu_budget": self.budget.rate,
+                "budget_tokens": round(self.budget.tokens, 2),
+                "cameras": {
+                    cam_id: {**self.schedules[cam_id], **self.counters[cam_id]}
+                    for cam_id in self.schedules
+                },
+            }
+
+    # --- Lifecycle ---
+    def start(self):
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.added = []
+            self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="monitor")
+            self.thread = threading.Thread(target=self._loop, name="monitor", daemon=True)
+            self.thread.start()
+        print("👁️ Continuous monitoring started")
+
+    def stop(self):
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            subscriptions, self.subscriptions = self.subscriptions, {}
+        self.wakeup.set()
+        self.thread.join(timeout=5)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        for subscription in subscriptions.values():
+            subscription.close()
+        print("👁️ Continuous monitoring stopped")
+
+    # --- Scheduling loop ---
+    def _loop(self):
+        now = time.monotonic()
+        # Spread the first samples out so all cameras don't fire at once
+        due = [(now + i * 0.5, cam_id) for i, cam_id in enumerate(self.schedules)]
+        heapq.heapify(due)
+
+        while self.running:
+            with self.lock:
+                added, self.added = self.added, []
+            for cam_id in added:
+                heapq.heappush(due, (time.monotonic(), cam_id))
+            if not due:
+                self.wakeup.wait(1.0)
+                self.wakeup.clear()
+                continue
+
+            next_time, cam_id = due[0]
+            wait = next_time - time.monotonic()
+            if wait > 0:
+                self.wakeup.wait(min(wait, 1.0))
+                self.wakeup.clear()
+                continue
+
+            heapq.heappop(due)
+            with self.lock:
+                schedule = self.schedules.get(cam_id)
+                schedule = dict(schedule) if schedule is not None else None
+            if schedule is None:
+                # Removed from the registry, stop scheduling it
+                self._release(cam_id)
+                continue
+            interval = schedule["interval"]
+
+            # Overdue by more than a whole interval -> skip to the next slot
+            if time.monotonic() - next_time > interval:
+                self.counters[cam_id]["skipped_late"] += 1
+            elif schedule["enabled"]:
+                self._dispatch(cam_id)
+            else:
+                self._release(cam_id)
+
+            heapq.heappush(due, (next_time + interval, cam_id))
+            # Keep the heap from running in the past after long stalls
+            if due[0][0] < time.monotonic() - interval:
+                due = [(max(t, time.monotonic()), c) for t, c in due]
+                heapq.heapify(due)
+
+    def _dispatch(self, cam_id):
+        counters = self.counters[cam_id]
+        if not self.budget.available():
+            counters["skipped_budget"] += 1
+            return
+        with self.lock:
+            if cam_id in self.in_flight or len(self.in_flight) >= self.max_workers:
+                counters["skipped_busy"] += 1
+                return
+            self.in_flight.add(cam_id)
+            if cam_id not in self.subscriptions:
+                # Keeps the hub reader open while the camera is monitored
+                try:
+                    self.subscriptions[cam_id] = self.hub.subscribe(cam_id)
+                except KeyError:
+                    # Not in the hub (yet) - the registry is being reloaded
+                    self.in_flight.discard(cam_id)
+                    counters["no_frame"] += 1
+                    return
+                except CircuitOpenError:
+                    # Camera is known to be down, don't tie up a worker waiting on it
+                    self.in_flight.discard(cam_id)
+                    counters["circuit_open"] += 1
+                    return
+            subscription = self.subscriptions[cam_id]
+        self.pool.submit(self._sample, cam_id, subscription)
+
+    def _release(self, cam_id):
+        with self.lock:
+            subscription = self.subscriptions.pop(cam_id, None)
+        if subscription is not None:
+            subscription.close()
+
+    def _sample(self, cam_id, subscription):
+        # The camera may be removed from the registry while this sample runs
+        counters = self.counters.get(cam_id) or self._new_counters()
+        try:
+            frame = subscription.next_frame(timeout=FRAME_TIMEOUT)
+            if frame is None:
+                counters["no_frame"] += 1
+                return
+            counters["sampled"] += 1
+            raw = frame
+            if self.prepare is not None:
+                frame = self.prepare(cam_id, frame)
+            if frame is raw:
+                # Hub frames are ring slots that get overwritten; detection, the
+                # gate and the tracker hold on to this one, so keep a copy
+                frame = frame.copy()
+            if not subscription.intact():
+                # The slot was rewritten while we copied it; the next sample gets a whole frame
+                counters["overwritten"] += 1
+                return
+
+            if self.tracker is not None and not self.tracker.needs_detection(cam_id):
+                # Between YOLO passes: follow the known items
+                start = time.perf_counter()
+                self.tracker.follow(cam_id, frame)
+                self.budget.spend(time.perf_counter() - start)
+                counters["tracked"] += 1
+                self.on_result(cam_id, None, [])
+                return
+
+            result = self.gate.check(cam_id, frame) if self.gate is not None else None
+            if result is not None:
+                counters["gated"] += 1
+            else:
+                start = time.perf_counter()
+                result = self.detect(cam_id, frame)
+                self.budget.spend(time.perf_counter() - start)
+                counters["inferred"] += 1
+                if self.gate is not None:
+                    self.gate.remember(cam_id, frame, result)
+
+            if self.tracker is not None:
+                new_items = self.tracker.update(cam_id, frame, detections_with_boxes(result))
+                self.on_result(cam_id, result, new_items)
+            else:
+                self.on_result(cam_id, result)
+        except Exception as e:
+            counters["errors"] += 1
+            print(f"⚠️ Monitor sample failed for camera {cam_id}: {e}")
+        finally:
+            with self.lock:
+                self.in_flight.discard(cam_id)
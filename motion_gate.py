@@ -0,0 +1,102 @@
+"""
+Change-gated inference: skip YOLO when a fixed camera sees the same scene.
+
+Each frame is shrunk to a tiny blurred grayscale thumbnail and compared with
+the thumbnail of the frame YOLO last looked at. If only a small fraction of
+pixels changed, the previous detection result is reused instead of running
+the model again. Sensitivity is configurable per camera and every camera
+keeps counters of frames skipped vs. inferred.
+"""
+import copy
+import os
+import threading
+import time
+
+import cv2
+
+# Fraction of thumbnail pixels that must change before we run YOLO again
+DEFAULT_THRESHOLD = float(os.getenv("MOTION_GATE_THRESHOLD", "0.02"))
+# Grayscale difference (0-255) for a pixel to count as "changed"
+DEFAULT_PIXEL_DELTA = int(os.getenv("MOTION_GATE_PIXEL_DELTA", "25"))
+# Re-run YOLO at least this often even on a static scene (seconds)
+DEFAULT_MAX_AGE = float(os.getenv("MOTION_GATE_MAX_AGE", "600"))
+THUMB_SIZE = (64, 48)
+
+
+def scene_signature(frame):
+    """Cheap fingerprint of a frame: tiny, blurred grayscale thumbnail."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(small, (5, 5), 0)
+
+
+def change_score(signature, reference, pixel_delta=DEFAULT_PIXEL_DELTA):
+    """Fraction of pixels that differ by more than `pixel_delta`."""
+    diff = cv2.absdiff(signature, reference)
+    return float((diff > pixel_delta).mean())
+
+
+def reuse_result(result, frame):
+    """Previous YOLO result re-attached to the new frame, so plots show the current image."""
+    reused = copy.copy(result)
+    reused.orig_img = frame
+    return reused
+
+
+class DetectionGate:
+    """Per-camera change gate in front of the detector."""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, pixel_delta=DEFAULT_PIXEL_DELTA, max_age=DEFAULT_MAX_AGE):
+        self.defaults = {"threshold": threshold, "pixel_delta": pixel_delta, "max_age": max_age}
+        self.lock = threading.Lock()
+        self.settings = {}    # cam_id -> overrides of self.defaults
+        self.reference = {}   # cam_id -> (signature, result, time of inference)
+        self.counters = {}    # cam_id -> {"inferred": n, "skipped": n, "last_score": x}
+
+    def set_sensitivity(self, cam_id, **settings):
+        unknown = set(settings) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"Unknown gate settings: {', '.join(sorted(unknown))}")
+        with self.lock:
+            self.settings.setdefault(cam_id, {}).update(settings)
+
+    def sensitivity(self, cam_id):
+        return {**self.defaults, **self.settings.get(cam_id, {})}
+
+    def check(self, cam_id, frame):
+        """
+        Returns the reusable previous result when the scene hasn't changed,
+        or None when the frame should go through YOLO (then call remember()).
+        """
+        settings = self.sensitivity(cam_id)
+        signature = scene_signature(frame)
+        with self.lock:
+            counters = self.counters.setdefault(cam_id, {"inferred": 0, "skipped": 0, "last_score": None})
+            ref = self.reference.get(cam_id)
+            if ref is None or ref[0].shape != signature.shape:
+                return None
+            ref_signature, ref_result, ref_time = ref
+            if time.monotonic() - ref_time > settings["max_age"]:
+                return None
+
+            score = change_score(signature, ref_signature, settings["pixel_delta"])
+            counters["last_score"] = round(score, 4)
+            if score > settings["threshold"]:
+                return None
+            counters["skipped"] += 1
+        return reuse_result(ref_result, frame)
+
+    def remember(self, cam_id, frame, result):
+        """Stores a fresh detection as the new reference for this camera."""
+        signature = scene_signature(frame)
+        with self.lock:
+            self.reference[cam_id] = (signature, result, time.monotonic())
+            counters = self.counters.setdefault(cam_id, {"inferred": 0, "skipped": 0, "last_score": None})
+            counters["inferred"] += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                cam_id: {**counters, **self.sensitivity(cam_id)}
+                for cam_id, counters in self.counters.items()
+            }
@@ -0,0 +1,67 @@
+"""
+In-memory latest risk state per camera.
+
+The detection pipeline writes the newest count / classes for each camera
+here, and the dashboard endpoints read it back in O(1) instead of
+recomputing anything per request.
+"""
+import datetime
+import threading
+
+
+def calculate_risk_level(waste_count):
+    if waste_count >= 10:
+        return "High Risk", "red"    # Critical
+    elif waste_count >= 5:
+        return "Medium Risk", "orange" # Warning
+    else:
+        return "Low Risk", "green"   # Safe
+
+
+def _no_data():
+    return {"status": "No Data", "color": "grey", "count": 0, "classes": [], "updated_at": None}
+
+
+class RiskStateStore:
+    """Latest detection state per camera, safe to update from worker threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.states = {}
+        # Bumped on every change so readers can cheaply tell if anything moved
+        self.version = 0
+
+    def update(self, cam_id, classes, count=None):
+        """
+        Records a new detection for `cam_id`. Returns only the fields that
+        changed (empty dict if nothing did), ready to push to dashboards.
+        """
+        count = len(classes) if count is None else count
+        status, color = calculate_risk_level(count)
+        state = {
+            "status": status,
+            "color": color,
+            "count": count,
+            "classes": sorted(set(classes)),
+            "updated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+        with self.lock:
+            previous = self.states.get(cam_id) or _no_data()
+            self.states[cam_id] = state
+            changes = {
+                key: value for key, value in state.items()
+                if key != "updated_at" and previous.get(key) != value
+            }
+            if changes:
+                self.version += 1
+                changes["updated_at"] = state["updated_at"]
+        return changes
+
+    def get(self, cam_id):
+        with self.lock:
+            return dict(self.states.get(cam_id) or _no_data())
+
+    def all(self, cam_ids):
+        """State of every camera in `cam_ids` (cameras without detections get 'No Data')."""
+        with self.lock:
+            return {cam_id: dict(self.states.get(cam_id) or _no_data()) for cam_id in cam_ids}
@@ -0,0 +1,258 @@
+"""
+Region-of-interest and tiled inference.
+
+Cameras can store ROI polygons (cameras.roi, normalized 0..1 points in the
+rotated frame). Only the bounding box of each region is cut out and sent to
+YOLO, with pixels outside the polygon greyed out, so sky and buildings cost
+nothing. With a tile size set (cameras.tile_size), large regions are split
+into overlapping tiles that each go through the model at full detail, which
+keeps small litter visible instead of being lost in the model's downscale.
+
+Boxes from all crops are shifted back into frame coordinates and merged
+with a class-aware NMS that also folds together the halves of an item cut
+by a tile border. The merged result looks like a YOLO result (`.boxes`
+with cls / conf / xyxy / xyxyn, `.names`, `.orig_img`) to the rest of the app.
+
+Cameras without ROI or tiling go straight through as full frames.
+"""
+import json
+import threading
+
+import cv2
+import numpy as np
+
+from tracker import iou
+
+NMS_IOU = 0.5
+# A box mostly inside a same-class box (cut at a tile edge) is merged into it
+CONTAINMENT = 0.8
+# Letterbox grey used by YOLO, so masked areas look like padding
+MASK_VALUE = 114
+
+
+def parse_roi(text):
+    """List of polygons [[[x, y], ...], ...] from the stored JSON, or None."""
+    if not text:
+        return None
+    polygons = json.loads(text) if isinstance(text, str) else text
+    # A single polygon is accepted too
+    if polygons and isinstance(polygons[0][0], (int, float)):
+        polygons = [polygons]
+    return [polygon for polygon in polygons if len(polygon) >= 3] or None
+
+
+def _tile_spans(start, end, tile, overlap):
+    """Start/end pairs covering [start, end) with tiles of `tile` px overlapping by `overlap`."""
+    length = end - start
+    if length <= tile:
+        return [(start, end)]
+    step = max(1, int(tile * (1 - overlap)))
+    spans = list(range(start, end - tile, step)) + [end - tile]
+    return [(s, s + tile) for s in spans]
+
+
+def plan_regions(shape, polygons=None, tile_size=None, overlap=0.2):
+    """
+    Crop rectangles (x1, y1, x2, y2) to run YOLO on, plus the pixel polygons
+    (None = whole frame). An ROI whose polygons are all degenerate or off-frame
+    falls back to the whole frame rather than detecting nothing.
+    """
+    height, width = shape[:2]
+    if polygons:
+        pixel_polygons, rects = [], []
+        for polygon in polygons:
+            polygon = np.array([[round(x * width), round(y * height)] for x, y in polygon], dtype=np.int32)
+            x, y, w, h = cv2.boundingRect(polygon)
+            rect = (max(0, x), max(0, y), min(width, x + w), min(height, y + h))
+            # A degenerate (zero-area) or off-frame polygon leaves nothing to crop
+            if cv2.contourArea(polygon) == 0 or rect[2] <= rect[0] or rect[3] <= rect[1]:
+                continue
+            pixel_polygons.append(polygon)
+            rects.append(rect)
+        if not rects:
+            pixel_polygons = None
+            rects = [(0, 0, width, height)]
+    else:
+        pixel_polygons = None
+        rects = [(0, 0, width, height)]
+
+    if tile_size:
+        tiles = []
+        for x1, y1, x2, y2 in rects:
+            for ty1, ty2 in _tile_spans(y1, y2, tile_size, overlap):
+                for tx1, tx2 in _tile_spans(x1, x2, tile_size, overlap):
+                    tiles.append((tx1, ty1, tx2, ty2))
+        rects = tiles
+    return rects, pixel_polygons
+
+
+def merge_boxes(boxes, nms_iou=NMS_IOU, containment=CONTAINMENT):
+    """
+    Class-aware NMS over [(cls, conf, (x1, y1, x2, y2)), ...] from overlapping
+    crops. Highest confidence wins; duplicates are grown to cover both boxes.
+    """
+    kept = []
+    for cls, conf, box in sorted(boxes, key=lambda b: b[1], reverse=True):
+        duplicate = False
+        for i, (kept_cls, kept_conf, kept_box) in enumerate(kept):
+            if kept_cls != cls:
+                continue
+            ix = max(0.0, min(box[2], kept_box[2]) - max(box[0], kept_box[0]))
+            iy = max(0.0, min(box[3], kept_box[3]) - max(box[1], kept_box[1]))
+            smaller = min((box[2] - box[0]) * (box[3] - box[1]), (kept_box[2] - kept_box[0]) * (kept_box[3] - kept_box[1]))
+            if iou(box, kept_box) > nms_iou or (smaller > 0 and ix * iy / smaller > containment):
+                kept[i] = (kept_cls, kept_conf, (min(box[0], kept_box[0]), min(box[1], kept_box[1]),
+                                                 max(box[2], kept_box[2]), max(box[3], kept_box[3])))
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append((cls, conf, box))
+    return kept
+
+
+# --- YOLO-LIKE RESULT ---
+class MergedBox:
+    """One box with the same indexable fields as an ultralytics Boxes row."""
+
+    def __init__(self, cls, conf, box, shape):
+        height, width = shape[:2]
+        x1, y1, x2, y2 = box
+        self.cls = [cls]
+        self.conf = [conf]
+        self.xyxy = [[x1, y1, x2, y2]]
+        self.xyxyn = [[x1 / width, y1 / height, x2 / width, y2 / height]]
+
+
+class MergedResult:
+    def __init__(self, boxes, names, frame):
+        self.boxes = boxes
+        self.names = names
+        self.orig_img = frame
+
+
+# --- DETECTOR ---
+class RoiDetector:
+    """
+    Wraps a batch detector (e.g. InferenceEngine.predict_many) with per-camera
+    ROI cropping and tiling. `config_for(cam_id)` returns the camera config
+    dict with "roi", "tile_size" and "tile_overlap" (e.g. CameraRegistry.get).
+    """
+
+    def __init__(self, detect_batch, config_for):
+        self.detect_batch = detect_batch
+        self.config_for = config_for
+        self.lock = threading.Lock()
+        self.masks = {}   # (cam_id, shape, roi) -> polygon mask
+        self.stats = {}
+        # (cam_id, roi) already reported as unusable
+        self.unusable = set()
+
+    def _settings(self, cam_id):
+        config = self.config_for(cam_id) or {}
+        overlap = config.get("tile_overlap")
+        # 0 is a valid overlap (tiles edge to edge)
+        return config.get("roi"), config.get("tile_size"), 0.2 if overlap is None else overlap
+
+    def _mask(self, cam_id, shape, polygons, pixel_polygons):
+        key = (cam_id, shape[:2], json.dumps(polygons))
+        with self.lock:
+            mask = self.masks.get(key)
+            if mask is None:
+                if len(self.masks) > 64:
+                    self.masks.clear()
+                mask = np.zeros(shape[:2], dtype=np.uint8)
+                cv2.fillPoly(mask, pixel_polygons, 255)
+                self.masks[key] = mask
+        return mask
+
+    def _crops(self, cam_id, frame):
+        polygons, tile_size, overlap = self._settings(cam_id)
+        if not polygons and not tile_size:
+            return None, None, None
+        rects, pixel_polygons = plan_regions(frame.shape, polygons, tile_size, overlap)
+        if polygons and pixel_polygons is None:
+            self._report_unusable(cam_id, polygons)
+        mask = self._mask(cam_id, frame.shape, polygons, pixel_polygons) if pixel_polygons is not None else None
+
+        crops = []
+        for x1, y1, x2, y2 in rects:
+            crop = frame[y1:y2, x1:x2].copy()
+            if mask is not None:
+                crop[mask[y1:y2, x1:x2] == 0] = MASK_VALUE
+            crops.append(crop)
+        return rects, crops, mask
+
+    def _report_unusable(self, cam_id, polygons):
+        key = (cam_id, json.dumps(polygons))
+        with self.lock:
+            if key in self.unusable:
+                return
+            self.unusable.add(key)
+        print(f"⚠️ ROI of camera {cam_id} has no usable area in the frame, detecting on the whole frame")
+
+    def detect_many(self, cam_ids, frames):
+        """One result per frame; all crops of all frames go to the model together."""
+        plans, inputs = [], []
+        for cam_id, frame in zip(cam_ids, frames):
+            plan = self._crops(cam_id, frame)
+            if plan[0] is None:
+                plans.append((None, [frame], None))
+            else:
+                plans.append(plan)
+            inputs.extend(plans[-1][1])
+
+        outputs = self.detect_batch(inputs) if inputs else []
+        results, position = [], 0
+        for cam_id, frame, (rects, crops, mask) in zip(cam_ids, frames, plans):
+            crop_results = outputs[position:position + len(crops)]
+            position += len(crops)
+            if rects is None:
+                # Full frame, no ROI and no tiling
+                self._count(cam_id, frame, [frame], None, None)
+                results.append(crop_results[0])
+                continue
+            results.append(self._merge(cam_id, frame, rects, crops, crop_results, mask))
+        return results
+
+    def detect(self, cam_id, frame):
+        return self.detect_many([cam_id], [frame])[0]
+
+    def _merge(self, cam_id, frame, rects, crops, crop_results, mask):
+        names = crop_results[0].names if crop_results else {}
+        boxes, outside = [], 0
+        for (x1, y1, _, _), result in zip(rects, crop_results):
+            for box in result.boxes:
+                bx1, by1, bx2, by2 = (float(v) for v in box.xyxy[0])
+                frame_box = (bx1 + x1, by1 + y1, bx2 + x1, by2 + y1)
+                if mask is not None:
+                    # Drop boxes whose centre lies outside the ROI
+                    cx = min(mask.shape[1] - 1, int((frame_box[0] + frame_box[2]) / 2))
+                    cy = min(mask.shape[0] - 1, int((frame_box[1] + frame_box[3]) / 2))
+                    if mask[cy, cx] == 0:
+                        outside += 1
+                        continue
+                boxes.append((int(box.cls[0]), float(box.conf[0]), frame_box))
+        merged = merge_boxes(boxes)
+        self._count(cam_id, frame, crops, len(boxes) - len(merged), outside)
+        return MergedResult([MergedBox(cls, conf, box, frame.shape) for cls, conf, box in merged], names, frame)
+
+    def _count(self, cam_id, frame, crops, merged, outside):
+        with self.lock:
+            stats = self.stats.setdefault(cam_id, {
+                "frames": 0, "crops": 0, "frame_pixels": 0, "processed_pixels": 0,
+                "merged_duplicates": 0, "outside_roi": 0,
+            })
+            stats["frames"] += 1
+            stats["crops"] += len(crops)
+            stats["frame_pixels"] += frame.shape[0] * frame.shape[1]
+            stats["processed_pixels"] += sum(crop.shape[0] * crop.shape[1] for crop in crops)
+            stats["merged_duplicates"] += merged or 0
+            stats["outside_roi"] += outside or 0
+
+    def metrics(self):
+        with self.lock:
+            return {
+                cam_id: {**stats, "pixel_ratio": round(stats["processed_pixels"] / stats["frame_pixels"], 3)
+                         if stats["frame_pixels"] else None}
+                for cam_id, stats in self.stats.items()
+            }
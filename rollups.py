@@ -0,0 +1,165 @@
+"""
+Hourly and daily rollups of detection_events.
+
+Dashboards and analytics read `detection_rollups` (counts per camera, zone,
+waste class and severity) instead of scanning raw detections. The rollups
+are updated incrementally whenever detections are written, and can be
+rebuilt from the raw events at any time:
+
+    python rollups.py backfill [--since 2026-01-01]
+"""
+import argparse
+import datetime
+from collections import Counter
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Camera, DetectionEvent, DetectionRollup
+
+GRANULARITIES = ("hour", "day")
+KEY_COLUMNS = ["granularity", "bucket_start", "camera_id", "zone", "waste_type", "severity"]
+
+
+def bucket_start(timestamp, granularity):
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _upsert(db: Session, counts):
+    """Adds `counts` ({key tuple: n}) onto the existing rollup rows in one statement."""
+    if not counts:
+        return
+    rows = [dict(zip(KEY_COLUMNS, key), count=n) for key, n in counts.items()]
+
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(DetectionRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=KEY_COLUMNS,
+        set_={"count": DetectionRollup.count + stmt.excluded.count},
+    )
+    db.execute(stmt, rows)
+
+
+def update_rollups(db: Session, rows, zone_for_camera, commit=True):
+    """
+    Folds freshly inserted detection rows (the dicts given to
+    detection_store.bulk_insert) into the hourly and daily rollups.
+    """
+    counts = Counter()
+    for row in rows:
+        camera_id = row.get("camera_id") or 0
+        timestamp = row.get("timestamp") or datetime.datetime.utcnow()
+        for granularity in GRANULARITIES:
+            counts[(granularity, bucket_start(timestamp, granularity), camera_id,
+                    zone_for_camera(camera_id), row["waste_type"], row.get("severity") or "None")] += 1
+    _upsert(db, counts)
+    if commit:
+        db.commit()
+
+
+def _truncate(db: Session, granularity):
+    # Bucket the timestamp inside the database so the backfill streams
+    # grouped counts instead of every raw row
+    if db.bind.dialect.name == "postgresql":
+        return func.date_trunc(granularity, DetectionEvent.timestamp)
+    fmt = "%Y-%m-%d %H:00:00" if granularity == "hour" else "%Y-%m-%d 00:00:00"
+    return func.strftime(fmt, DetectionEvent.timestamp)
+
+
+def camera_zones(db: Session):
+    """
+    zone_for_camera() read straight from the cameras table (location_id, else
+    4 cameras per zone, as in the camera registry), for the command line.
+    """
+    from camera_registry import default_zone
+
+    zones = {cam_id: location_id or default_zone(cam_id)
+             for cam_id, location_id in db.query(Camera.id, Camera.location_id)}
+    # Uploads (camera 0) and unknown cameras roll up under zone 0
+    return lambda camera_id: zones.get(camera_id, 0)
+
+
+def backfill(db: Session, zone_for_camera, since=None):
+    """Rebuilds the rollups (from `since` onwards, or entirely) out of detection_events."""
+    delete = db.query(DetectionRollup)
+    if since is not None:
+        delete = delete.filter(DetectionRollup.bucket_start >= bucket_start(since, "day"))
+    delete.delete(synchronize_session=False)
+
+    for granularity in GRANULARITIES:
+        bucket = _truncate(db, granularity)
+        query = db.query(
+            bucket, DetectionEvent.camera_id, DetectionEvent.waste_type,
+            DetectionEvent.severity, func.count(DetectionEvent.id),
+        )
+        if since is not None:
+            query = query.filter(DetectionEvent.timestamp >= bucket_start(since, "day"))
+        query = query.group_by(bucket, DetectionEvent.camera_id, DetectionEvent.waste_type,
+                               DetectionEvent.severity)
+
+        counts = Counter()
+        for start, camera_id, waste_type, severity, n in query.yield_per(1000):
+            if isinstance(start, str):
+                start = datetime.datetime.fromisoformat(start)
+            camera_id = camera_id or 0
+            counts[(granularity, start, camera_id, zone_for_camera(camera_id),
+                    waste_type, severity or "None")] += n
+        _upsert(db, counts)
+        print(f"📊 Rebuilt {len(counts)} {granularity} rollup rows")
+
+    db.commit()
+
+
+def query_trend(db: Session, granularity="day", since=None, camera_id=None, zone=None):
+    """
+    Counts per bucket and waste class from the rollups:
+    [{"bucket": "...", "waste_type": "...", "count": n}, ...] oldest first.
+    """
+    query = db.query(
+        DetectionRollup.bucket_start, DetectionRollup.waste_type, func.sum(DetectionRollup.count)
+    ).filter(DetectionRollup.granularity == granularity)
+    if since is not None:
+        query = query.filter(DetectionRollup.bucket_start >= since)
+    if camera_id is not None:
+        query = query.filter(DetectionRollup.camera_id == camera_id)
+    if zone is not None:
+        query = query.filter(DetectionRollup.zone == zone)
+    query = query.group_by(DetectionRollup.bucket_start, DetectionRollup.waste_type)
+    return [
+        {"bucket": start.isoformat(), "waste_type": waste_type, "count": int(n)}
+        for start, waste_type, n in query.order_by(DetectionRollup.bucket_start)
+    ]
+
+
+def query_totals(db: Session, granularity="day", since=None, zone=None):
+    """Total count per severity (e.g. for dashboard tiles), from the rollups."""
+    query = db.query(DetectionRollup.severity, func.sum(DetectionRollup.count)).filter(
+        DetectionRollup.granularity == granularity
+    )
+    if since is not None:
+        query = query.filter(DetectionRollup.bucket_start >= since)
+    if zone is not None:
+        query = query.filter(DetectionRollup.zone == zone)
+    return {severity: int(n) for severity, n in query.group_by(DetectionRollup.severity)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild detection rollups from raw events")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--since", type=datetime.datetime.fromisoformat, default=None,
+                        help="Only rebuild from this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    # Only the database, not the web app (importing main would start its scheduler and cameras)
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        backfill(db, camera_zones(db), args.since)
+    finally:
+        db.close()
@@ -0,0 +1,272 @@
+"""
+Indexed catalog of the snapshots in detected_snapshots/.
+
+The scheduled scan records every snapshot in the `snapshots` table as it
+writes it, so /api/history is a single indexed query instead of a glob +
+stat + open of every file. reconcile() picks up files that were copied in
+(or deleted) outside the app.
+"""
+import base64
+import datetime
+import json
+import os
+import re
+
+from sqlalchemy import and_, exists, insert, or_
+from sqlalchemy.orm import Session
+
+from models import Snapshot, SnapshotClass
+
+SNAPSHOT_DIR = "detected_snapshots"
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+# waste_detected values that mean "no classes"
+NO_CLASSES = {"no waste detected", "unknown"}
+# Rows per IN (...) list
+CHUNK = 500
+
+# cam1_2026-01-28_16-00-00.jpg (scheduler) or detected_cam1_20260128_160000.jpg (older files)
+FILENAME_PATTERNS = [
+    (re.compile(r"cam(\d+)_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})"), "%Y-%m-%d_%H-%M-%S"),
+    (re.compile(r"cam(\d+)_(\d{8}_\d{6})"), "%Y%m%d_%H%M%S"),
+]
+
+
+def parse_snapshot_filename(filename):
+    """Returns (camera_id, taken_at) from a snapshot filename, or (None, None)."""
+    for pattern, time_format in FILENAME_PATTERNS:
+        match = pattern.search(filename)
+        if match:
+            try:
+                return int(match.group(1)), datetime.datetime.strptime(match.group(2), time_format)
+            except ValueError:
+                continue
+    return None, None
+
+
+def _read_sidecar(img_path):
+    """(waste_detected, boxes JSON) from the .json box record, or the older .txt."""
+    json_path = os.path.splitext(img_path)[0] + ".json"
+    if os.path.exists(json_path):
+        with open(json_path, "r") as f:
+            record = json.load(f)
+        names = [box[0] for box in record.get("boxes", [])]
+        return (", ".join(names) if names else "No Waste Detected"), json.dumps(record, separators=(",", ":"))
+    txt_path = os.path.splitext(img_path)[0] + ".txt"
+    if os.path.exists(txt_path):
+        with open(txt_path, "r") as f:
+            return f.read(), None
+    return "Unknown", None
+
+
+def waste_classes(waste_detected):
+    """Lower-case class names in a waste_detected string: "Plastic, Bottle" -> {"plastic", "bottle"}."""
+    names = {name.strip().lower() for name in (waste_detected or "").split(",")}
+    return names - NO_CLASSES - {""}
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), CHUNK):
+        yield values[start:start + CHUNK]
+
+
+def _sync_classes(db: Session, filenames):
+    """Rewrites the snapshot_classes rows of these snapshots from their waste_detected."""
+    for chunk in _chunks(filenames):
+        snapshots = db.query(Snapshot.id, Snapshot.waste_detected).filter(Snapshot.filename.in_(chunk)).all()
+        drop_classes(db, [snapshot_id for snapshot_id, _ in snapshots])
+        rows = [{"snapshot_id": snapshot_id, "waste_class": name}
+                for snapshot_id, waste_detected in snapshots for name in waste_classes(waste_detected)]
+        if rows:
+            db.execute(insert(SnapshotClass), rows)
+
+
+def drop_classes(db: Session, snapshot_ids):
+    """Removes the class rows of snapshots that are being deleted (no commit)."""
+    for chunk in _chunks(snapshot_ids):
+        db.query(SnapshotClass).filter(SnapshotClass.snapshot_id.in_(chunk)).delete(synchronize_session=False)
+
+
+def _backfill_classes(db: Session):
+    """Class rows for snapshots catalogued before snapshot_classes existed. Returns how many snapshots."""
+    missing = (
+        db.query(Snapshot.filename)
+        .filter(~exists().where(SnapshotClass.snapshot_id == Snapshot.id))
+        .filter(Snapshot.waste_detected.isnot(None))
+        .filter(~Snapshot.waste_detected.in_(["No Waste Detected", "Unknown"]))
+    )
+    filenames = [filename for (filename,) in missing]
+    _sync_classes(db, filenames)
+    return len(filenames)
+
+
+def _insert(db: Session):
+    # INSERT ... ON CONFLICT needs the dialect's own insert() (same idiom as rollups._upsert)
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(Snapshot)
+
+
+def record_snapshots(db: Session, entries):
+    """
+    Adds freshly written snapshots to the catalog in one transaction.
+    Each entry: {"img_path", "camera_id", "taken_at", "waste_detected"} and
+    optionally "boxes" (the box record written next to the image).
+
+    Upserts on filename: if reconcile() indexed a file first, the scan's
+    own values (with its boxes) replace that row instead of failing the batch.
+    """
+    rows = []
+    for entry in entries:
+        boxes = entry.get("boxes")
+        rows.append({
+            "filename": os.path.basename(entry["img_path"]),
+            "camera_id": entry["camera_id"],
+            "taken_at": entry["taken_at"],
+            "waste_detected": entry["waste_detected"],
+            "boxes": json.dumps(boxes, separators=(",", ":")) if boxes is not None else None,
+            "file_mtime": os.path.getmtime(entry["img_path"]),
+            "tier": "hot",
+        })
+    if not rows:
+        return
+    stmt = _insert(db)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["filename"],
+        set_={column: stmt.excluded[column]
+              for column in ("camera_id", "taken_at", "waste_detected", "boxes", "file_mtime")},
+    )
+    db.execute(stmt, rows)
+    _sync_classes(db, [row["filename"] for row in rows])
+    db.commit()
+
+
+def reconcile(db: Session, directory=SNAPSHOT_DIR):
+    """
+    Brings the catalog in line with what is on disk: adds rows for .jpg files
+    the app didn't write itself and drops rows whose file is gone.
+    Returns {"added": n, "removed": n}.
+    """
+    on_disk = {}
+    if os.path.isdir(directory):
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith(".jpg"):
+                    on_disk[entry.name] = entry
+
+    # Archived snapshots live in day archives, not as loose files
+    known = {filename for (filename,) in db.query(Snapshot.filename).filter(Snapshot.archive.is_(None))}
+
+    rows = []
+    archived = {filename for (filename,) in db.query(Snapshot.filename).filter(Snapshot.archive.isnot(None))}
+    for name in on_disk.keys() - known - archived:
+        entry = on_disk[name]
+        mtime = entry.stat().st_mtime
+        camera_id, taken_at = parse_snapshot_filename(name)
+        waste_detected, boxes = _read_sidecar(entry.path)
+        rows.append({
+            "filename": name,
+            "camera_id": camera_id,
+            "taken_at": taken_at or datetime.datetime.fromtimestamp(mtime),
+            "waste_detected": waste_detected,
+            "boxes": boxes,
+            "file_mtime": mtime,
+            "tier": "hot",
+        })
+    if rows:
+        # A scan that recorded the same file in the meantime wins
+        db.execute(_insert(db).on_conflict_do_nothing(index_elements=["filename"]), rows)
+    added = len(rows)
+
+    missing = known - on_disk.keys()
+    for chunk in _chunks(missing):
+        gone = db.query(Snapshot.id).filter(Snapshot.filename.in_(chunk))
+        drop_classes(db, [snapshot_id for (snapshot_id,) in gone])
+        db.query(Snapshot).filter(Snapshot.filename.in_(chunk)).delete(synchronize_session=False)
+
+    # New rows, and rows from before the class index existed
+    _sync_classes(db, [row["filename"] for row in rows])
+    backfilled = _backfill_classes(db)
+    db.commit()
+    if backfilled:
+        print(f"🗂️ Indexed the waste classes of {backfilled} snapshots")
+    if added or missing:
+        print(f"🗂️ Snapshot catalog reconciled: +{added} / -{len(missing)}")
+    return {"added": added, "removed": len(missing)}
+
+
+def snapshot_to_dict(snapshot):
+    """
+    Same fields /api/history has always returned, plus id, tier and a thumbnail URL.
+    image_url is rendered with boxes on demand (add ?min_conf= / ?width=), raw_url
+    is the stored frame.
+    """
+    if snapshot.archive:
+        # Packed into a day archive, served by /api/snapshot_image
+        raw_url = f"/api/snapshot_image/{snapshot.filename}?annotated=false"
+    else:
+        raw_url = f"/detected_snapshots/{snapshot.filename}"
+    return {
+        "id": snapshot.id,
+        "image_url": f"/api/snapshot_image/{snapshot.filename}",
+        "raw_url": raw_url,
+        "thumb_url": f"/api/thumbnail/{snapshot.filename}",
+        "cam_id": str(snapshot.camera_id) if snapshot.camera_id is not None else "?",
+        "timestamp": snapshot.taken_at.strftime("%Y-%m-%d %H:%M:%S") if snapshot.taken_at else "Unknown",
+        "waste_detected": snapshot.waste_detected,
+        "tier": snapshot.tier or "hot",
+    }
+
+
+# --- CURSOR PAGINATION ---
+# The cursor is the (taken_at, id) of the last item on the previous page, so
+# every page is one index range scan no matter how deep the user scrolls.
+def encode_cursor(snapshot):
+    raw = f"{snapshot.taken_at.isoformat()}|{snapshot.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        taken_at, snapshot_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.datetime.fromisoformat(taken_at), int(snapshot_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def query_history(db: Session, camera_id=None, since=None, until=None, waste_class=None,
+                  cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of snapshots, newest first, optionally filtered by camera,
+    time range and detected waste class (a whole class name, any case).
+    Returns {"items", "next_cursor"}.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = db.query(Snapshot)
+
+    if camera_id is not None:
+        query = query.filter(Snapshot.camera_id == camera_id)
+    if since is not None:
+        query = query.filter(Snapshot.taken_at >= since)
+    if until is not None:
+        query = query.filter(Snapshot.taken_at <= until)
+    if waste_class:
+        # Indexed lookup in snapshot_classes, not a substring scan of waste_detected
+        query = query.filter(exists().where(
+            SnapshotClass.snapshot_id == Snapshot.id,
+            SnapshotClass.waste_class == waste_class.strip().lower(),
+        ))
+    if cursor:
+        cursor_time, cursor_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Snapshot.taken_at < cursor_time,
+            and_(Snapshot.taken_at == cursor_time, Snapshot.id < cursor_id),
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(Snapshot.taken_at.desc(), Snapshot.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return {"items": [snapshot_to_dict(row) for row in rows[:limit]], "next_cursor": next_cursor}
@@ -0,0 +1,206 @@
+"""
+Concurrent snapshot pipeline used by the scheduled waste scan.
+
+Stages:
+  1. grab   - all cameras are read at the same time, each with its own timeout,
+              so one dead phone can't hold up the whole run
+  2. infer  - the frames that arrived (and whose scene changed) are sent to
+              YOLO in batches
+  3. write  - JPEG encoding and disk writes run on a worker pool. The raw
+              frame is stored with a JSON box record; boxes are only drawn
+              when somebody opens the image (see snapshot_render)
+
+Every run returns a timing report per camera and per stage.
+"""
+import datetime
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import cv2
+
+from snapshot_render import detection_record, waste_summary
+
+SNAPSHOT_DIR = "detected_snapshots"
+# Seconds a single camera gets to deliver its frame
+GRAB_TIMEOUT = float(os.getenv("SNAPSHOT_GRAB_TIMEOUT", "10"))
+# Frames per YOLO forward pass
+BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "4"))
+WRITE_WORKERS = int(os.getenv("SNAPSHOT_WRITE_WORKERS", "4"))
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    value = fn(*args)
+    return value, time.perf_counter() - start
+
+
+def grab_frames(cameras, grab_fn, timeout=GRAB_TIMEOUT):
+    """
+    Reads one frame from every camera concurrently. Cameras that share a
+    source URL are grabbed once and each get their own copy of the frame.
+    Returns ({cam_id: frame}, {cam_id: report}) where the per-camera report
+    holds the grab time and, for cameras without a frame, the reason.
+    """
+    frames, report = {}, {}
+    sources = {}
+    for cam in cameras:
+        sources.setdefault(cam.get("source") or cam["url"], []).append(cam["id"])
+
+    pool = ThreadPoolExecutor(max_workers=max(1, len(sources)), thread_name_prefix="grab")
+    futures = {pool.submit(_timed, grab_fn, url): cam_ids for url, cam_ids in sources.items()}
+
+    done, not_done = wait(futures, timeout=timeout)
+    for future in done:
+        cam_ids = futures[future]
+        try:
+            frame, elapsed = future.result()
+        except Exception as e:
+            for cam_id in cam_ids:
+                report[cam_id] = {"status": f"error: {e}", "grab": None}
+            continue
+        for i, cam_id in enumerate(cam_ids):
+            report[cam_id] = {"grab": round(elapsed, 3)}
+            if frame is None:
+                report[cam_id]["status"] = "no frame"
+            else:
+                frames[cam_id] = frame if i == 0 else frame.copy()
+
+    for future in not_done:
+        for cam_id in futures[future]:
+            report[cam_id] = {"status": "timeout", "grab": timeout}
+
+    # Don't wait for stuck captures, they finish (or time out in FFmpeg) on their own
+    pool.shutdown(wait=False, cancel_futures=True)
+    return frames, report
+
+
+def infer_batches(frames, detect_batch, batch_size=BATCH_SIZE):
+    """
+    Runs YOLO over the grabbed frames in batches. `detect_batch(cam_ids, frames)`
+    returns one result per frame (e.g. RoiDetector.detect_many).
+    Returns ({cam_id: result}, {cam_id: seconds}), where each camera is
+    charged its share of the batch time.
+    """
+    results, timings = {}, {}
+    cam_ids = list(frames)
+    for i in range(0, len(cam_ids), batch_size):
+        batch_ids = cam_ids[i:i + batch_size]
+        try:
+            batch_results, elapsed = _timed(detect_batch, batch_ids, [frames[cam_id] for cam_id in batch_ids])
+        except Exception as e:
+            # Skip this batch, the report marks its cameras as failed
+            print(f"❌ Inference failed for cameras {batch_ids}: {e}")
+            continue
+        for cam_id, result in zip(batch_ids, batch_results):
+            results[cam_id] = result
+            timings[cam_id] = round(elapsed / len(batch_ids), 3)
+    return results, timings
+
+
+def save_snapshot(cam_id, frame, result, timestamp, output_dir=SNAPSHOT_DIR):
+    """
+    Writes the raw JPEG and the JSON box record for one camera.
+    Returns (img_path, waste_str, detections, record).
+    """
+    detections = [(result.names[int(box.cls[0])], float(box.conf[0])) for box in result.boxes]
+    record = detection_record(result, frame)
+    # Create a string like "Plastic, Bottle"
+    waste_str = waste_summary(record)
+
+    filename_base = f"cam{cam_id}_{timestamp}"
+    img_path = os.path.join(output_dir, f"{filename_base}.jpg")
+    cv2.imwrite(img_path, frame)
+
+    # Replaces the old comma-joined .txt: classes, confidences and boxes
+    json_path = os.path.join(output_dir, f"{filename_base}.json")
+    with open(json_path, "w") as f:
+        json.dump(record, f, separators=(",", ":"))
+
+    print(f"✅ Saved {img_path} (Found: {waste_str})")
+    return img_path, waste_str, detections, record
+
+
+def run_snapshot_pipeline(cameras, detect_batch, grab_fn, output_dir=SNAPSHOT_DIR, gate=None,
+                          on_saved=None, prepare=None):
+    """
+    Grabs, detects and saves a snapshot for every camera. Returns the timing report.
+    `grab_fn(url)` reads one raw frame, `prepare(cam_id, frame)` can then rotate,
+    resize or stamp it per camera.
+    With a motion_gate.DetectionGate, static scenes skip YOLO and reuse the last result.
+    `on_saved(entries)` is called once with every snapshot written (e.g. to catalog them
+    and update the live risk state).
+    """
+    taken_at = datetime.datetime.now().replace(microsecond=0)
+    timestamp = taken_at.strftime("%Y-%m-%d_%H-%M-%S")
+    os.makedirs(output_dir, exist_ok=True)
+    run_start = time.perf_counter()
+    stages = {}
+
+    # 1. Grab
+    frames, cameras_report = grab_frames(cameras, grab_fn)
+    if prepare is not None:
+        frames = {cam_id: prepare(cam_id, frame) for cam_id, frame in frames.items()}
+    stages["grab"] = round(time.perf_counter() - run_start, 3)
+
+    # 2. Infer (cameras whose scene hasn't changed reuse their last result)
+    stage_start = time.perf_counter()
+    results, to_infer = {}, {}
+    for cam_id, frame in frames.items():
+        reused = gate.check(cam_id, frame) if gate is not None else None
+        if reused is not None:
+            results[cam_id] = reused
+            cameras_report[cam_id].update(infer=0.0, gated=True)
+        else:
+            to_infer[cam_id] = frame
+
+    new_results, infer_times = infer_batches(to_infer, detect_batch) if to_infer else ({}, {})
+    results.update(new_results)
+    stages["infer"] = round(time.perf_counter() - stage_start, 3)
+    for cam_id in to_infer:
+        if cam_id in infer_times:
+            cameras_report[cam_id]["infer"] = infer_times[cam_id]
+            if gate is not None:
+                gate.remember(cam_id, to_infer[cam_id], new_results[cam_id])
+        else:
+            cameras_report[cam_id]["status"] = "infer error"
+
+    # 3. Write
+    stage_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS, thread_name_prefix="snapshot-write") as pool:
+        # Gated cameras reuse the last boxes, but the current frame is what gets saved
+        futures = {
+            cam_id: pool.submit(_timed, save_snapshot, cam_id, frames[cam_id], result, timestamp, output_dir)
+            for cam_id, result in results.items()
+        }
+        saved = []
+        for cam_id, future in futures.items():
+            try:
+                (img_path, waste_str, detections, record), elapsed = future.result()
+                cameras_report[cam_id].update(write=round(elapsed, 3), status="ok", found=waste_str)
+                saved.append({"img_path": img_path, "camera_id": cam_id, "taken_at": taken_at,
+                              "waste_detected": waste_str, "detections": detections,
+                              "classes": [name for name, _ in detections], "boxes": record})
+            except Exception as e:
+                cameras_report[cam_id]["status"] = f"write error: {e}"
+    if saved and on_saved is not None:
+        try:
+            on_saved(saved)
+        except Exception as e:
+            print(f"⚠️ Could not record snapshots: {e}")
+    stages["write"] = round(time.perf_counter() - stage_start, 3)
+
+    stages["total"] = round(time.perf_counter() - run_start, 3)
+    report = {"timestamp": timestamp, "stages": stages, "cameras": cameras_report}
+    print_report(report)
+    return report
+
+
+def print_report(report):
+    stages = report["stages"]
+    print(f"⏱️ Snapshot run {report['timestamp']}: grab {stages['grab']}s | "
+          f"infer {stages['infer']}s | write {stages['write']}s | total {stages['total']}s")
+    for cam_id, info in sorted(report["cameras"].items()):
+        print(f"   cam{cam_id}: {info.get('status', '?'):<10} grab={info.get('grab')} "
+              f"infer={info.get('infer')} write={info.get('write')}")
@@ -0,0 +1,167 @@
+"""
+Lazy annotation of snapshots.
+
+The scheduled scan stores the raw frame plus a compact box record instead
+of a pre-drawn `result.plot()` image:
+
+    {"v": 1, "size": [w, h], "boxes": [["Plastic", 0.87, x1, y1, x2, y2], ...]}
+
+Coordinates are normalized to 0..1, so the record stays valid after the
+storage tiering downsizes the JPEG. Boxes are drawn only when somebody
+opens the image, at the requested width and confidence threshold, and the
+resulting JPEGs are kept in a byte-bounded LRU cache.
+"""
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+import cv2
+
+from snapshot_storage import load_image, snapshot_stat
+
+RENDER_CACHE_BYTES = int(os.getenv("RENDER_CACHE_MB", "64")) * 1024 * 1024
+RENDER_QUALITY = 85
+MIN_WIDTH, MAX_WIDTH = 64, 4096
+
+
+# --- BOX RECORDS ---
+def detection_record(result, frame):
+    """Compact, JSON-ready record of a YOLO result for `frame`."""
+    height, width = frame.shape[:2]
+    boxes = []
+    for box in result.boxes:
+        x1, y1, x2, y2 = (round(float(v), 4) for v in box.xyxyn[0])
+        boxes.append([result.names[int(box.cls[0])], round(float(box.conf[0]), 3), x1, y1, x2, y2])
+    return {"v": 1, "size": [width, height], "boxes": boxes}
+
+
+def parse_record(text):
+    """Record from its stored JSON text; None for legacy snapshots without one."""
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def detected_names(record, min_conf=0.0):
+    return [box[0] for box in record["boxes"] if box[1] >= min_conf]
+
+
+def waste_summary(record, min_conf=0.0):
+    """The same "Plastic, Bottle" text the .txt sidecars used to hold."""
+    names = detected_names(record, min_conf)
+    return ", ".join(names) if names else "No Waste Detected"
+
+
+# --- DRAWING ---
+def class_color(name):
+    # Stable colour per class, so "Plastic" looks the same in every image
+    h = zlib.crc32(name.encode())
+    return (h & 0xFF, (h >> 8) & 0xFF, (h >> 16) & 0xFF)
+
+
+def draw_boxes(image, record, min_conf=0.0):
+    """Draws the record's boxes (at or above `min_conf`) onto `image` in place."""
+    if not record:
+        return image
+    height, width = image.shape[:2]
+    thickness = max(1, round(width / 400))
+    font_scale = max(0.35, width / 1600)
+    for name, conf, x1, y1, x2, y2 in record["boxes"]:
+        if conf < min_conf:
+            continue
+        color = class_color(name)
+        p1 = (int(x1 * width), int(y1 * height))
+        p2 = (int(x2 * width), int(y2 * height))
+        cv2.rectangle(image, p1, p2, color, thickness)
+
+        label = f"{name} {conf:.2f}"
+        (text_w, text_h), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        top = max(p1[1], text_h + baseline)
+        cv2.rectangle(image, (p1[0], top - text_h - baseline), (p1[0] + text_w, top), color, -1)
+        cv2.putText(image, label, (p1[0], top - baseline), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, (255, 255, 255), thickness, cv2.LINE_AA)
+    return image
+
+
+# --- RENDER CACHE ---
+class RenderCache:
+    """LRU of rendered JPEGs, bounded by total bytes."""
+
+    def __init__(self, max_bytes=RENDER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.stats["evictions"] += 1
+
+    def metrics(self):
+        with self.lock:
+            return {**self.stats, "entries": len(self.entries), "bytes": self.size,
+                    "max_bytes": self.max_bytes}
+
+
+render_cache = RenderCache()
+
+
+def render_snapshot(filename, record, width=None, min_conf=0.0, annotated=True):
+    """
+    JPEG bytes of a snapshot at `width` pixels (None = stored size) with the
+    boxes at or above `min_conf` drawn in. Returns (bytes, etag).
+    Raises FileNotFoundError / ValueError.
+    """
+    if width is not None and not MIN_WIDTH <= width <= MAX_WIDTH:
+        raise ValueError(f"width must be between {MIN_WIDTH} and {MAX_WIDTH}")
+    min_conf = round(min_conf, 2)
+    if not 0.0 <= min_conf <= 1.0:
+        raise ValueError("min_conf must be between 0 and 1")
+
+    mtime, size = snapshot_stat(filename)
+    key = (os.path.basename(filename), int(mtime), size, width, min_conf if annotated else None)
+    etag = '"' + "-".join(str(part) for part in key[1:]) + '"'
+
+    data = render_cache.get(key)
+    if data is not None:
+        return data, etag
+
+    image = load_image(filename)
+    if width is not None and width != image.shape[1]:
+        height = max(1, round(image.shape[0] * width / image.shape[1]))
+        interpolation = cv2.INTER_AREA if width < image.shape[1] else cv2.INTER_LINEAR
+        image = cv2.resize(image, (width, height), interpolation=interpolation)
+    if annotated:
+        draw_boxes(image, record, min_conf)
+
+    ok, buffer = cv2.imencode(".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), RENDER_QUALITY])
+    if not ok:
+        raise ValueError(f"Could not encode {filename}")
+    data = buffer.tobytes()
+    render_cache.put(key, data)
+    return data, etag
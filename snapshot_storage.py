@@ -0,0 +1,374 @@
+"""
+Storage tiers for detected_snapshots/.
+
+Snapshots move through three tiers as they age, so disk usage and the
+number of files stay bounded:
+
+  hot      - the full-resolution JPEG (+ .json box record) as written by the scan
+  warm     - after SNAPSHOT_HOT_DAYS the JPEG is downscaled/re-encoded in
+             place and the sidecar removed (the boxes live in the catalog)
+  archived - after SNAPSHOT_ARCHIVE_DAYS each day is packed into one
+             archive/YYYY-MM-DD.zip holding the images and an index.json
+
+Snapshots older than their camera's retention window are deleted from every
+tier. compact() does all of this and runs as a nightly background job; reads
+go through read_snapshot(), which finds a snapshot wherever it lives.
+
+    python snapshot_storage.py compact
+    python snapshot_storage.py stats
+"""
+import argparse
+import datetime
+import json
+import os
+import threading
+import zipfile
+from collections import defaultdict
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from models import Camera, Snapshot
+from snapshot_catalog import SNAPSHOT_DIR, drop_classes, parse_snapshot_filename
+
+ARCHIVE_DIR = os.path.join(SNAPSHOT_DIR, "archive")
+INDEX_NAME = "index.json"
+
+HOT_DAYS = int(os.getenv("SNAPSHOT_HOT_DAYS", "2"))
+ARCHIVE_DAYS = int(os.getenv("SNAPSHOT_ARCHIVE_DAYS", "7"))
+# Default retention; cameras can override it (cameras.retention_days)
+RETENTION_DAYS = int(os.getenv("SNAPSHOT_RETENTION_DAYS", "90"))
+WARM_WIDTH = int(os.getenv("SNAPSHOT_WARM_WIDTH", "960"))
+WARM_QUALITY = int(os.getenv("SNAPSHOT_WARM_QUALITY", "60"))
+
+
+def loose_path(filename):
+    # basename() keeps requests inside the snapshot folder
+    return os.path.join(SNAPSHOT_DIR, os.path.basename(filename))
+
+
+def archive_path(day):
+    return os.path.join(ARCHIVE_DIR, f"{day:%Y-%m-%d}.zip")
+
+
+def archive_for(filename):
+    """The day archive a snapshot would be packed into (from the date in its name)."""
+    _, taken_at = parse_snapshot_filename(os.path.basename(filename))
+    return archive_path(taken_at.date()) if taken_at else None
+
+
+# --- READS (loose file or archive, transparently) ---
+class _CachedArchive:
+    """An open ZipFile shared by request threads. `users` counts reads in progress."""
+
+    def __init__(self, path, mtime):
+        self.zip = zipfile.ZipFile(path)
+        self.mtime = mtime
+        self.users = 0
+        self.retired = False
+
+
+_open_archives = {}
+_archives_lock = threading.Lock()
+
+
+def _retire(cached):
+    # Caller holds _archives_lock. A handle still being read is closed by its last reader.
+    cached.retired = True
+    if cached.users == 0:
+        cached.zip.close()
+
+
+@contextmanager
+def _archive(path):
+    """
+    Open ZipFile for `path`, reused until the archive file changes. Held for
+    the whole `with` block, so compaction rewriting the archive meanwhile
+    never closes it under a reader.
+    """
+    mtime = os.path.getmtime(path)
+    with _archives_lock:
+        cached = _open_archives.get(path)
+        if cached is None or cached.mtime != mtime:
+            if cached is not None:
+                _retire(cached)
+            cached = _open_archives[path] = _CachedArchive(path, mtime)
+        cached.users += 1
+    try:
+        yield cached.zip
+    finally:
+        with _archives_lock:
+            cached.users -= 1
+            if cached.retired and cached.users == 0:
+                cached.zip.close()
+
+
+def _forget_archive(path):
+    with _archives_lock:
+        cached = _open_archives.pop(path, None)
+        if cached is not None:
+            _retire(cached)
+
+
+def snapshot_stat(filename):
+    """(mtime, size) of a snapshot wherever it is stored. Raises FileNotFoundError."""
+    path = loose_path(filename)
+    if os.path.exists(path):
+        stat = os.stat(path)
+        return stat.st_mtime, stat.st_size
+    archive = archive_for(filename)
+    if archive and os.path.exists(archive):
+        try:
+            with _archive(archive) as zf:
+                info = zf.getinfo(os.path.basename(filename))
+        except KeyError:
+            raise FileNotFoundError(filename)
+        return datetime.datetime(*info.date_time).timestamp(), info.file_size
+    raise FileNotFoundError(filename)
+
+
+def read_snapshot(filename):
+    """JPEG bytes of a snapshot, hot/warm or archived. Raises FileNotFoundError."""
+    path = loose_path(filename)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    archive = archive_for(filename)
+    if archive and os.path.exists(archive):
+        try:
+            with _archive(archive) as zf:
+                return zf.read(os.path.basename(filename))
+        except KeyError:
+            pass
+    raise FileNotFoundError(filename)
+
+
+def load_image(filename):
+    """Decoded BGR image of a snapshot, for thumbnails and re-encoding."""
+    image = cv2.imdecode(np.frombuffer(read_snapshot(filename), dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise FileNotFoundError(filename)
+    return image
+
+
+# --- TIER MOVES ---
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove_sidecars(path):
+    # .json box records, and .txt from before they existed
+    stem = os.path.splitext(path)[0]
+    _remove(stem + ".json")
+    _remove(stem + ".txt")
+
+
+def _reencode(path):
+    """Downscales a JPEG to WARM_WIDTH and re-encodes it at WARM_QUALITY, in place."""
+    image = cv2.imread(path)
+    if image is None:
+        return False
+    if image.shape[1] > WARM_WIDTH:
+        height = max(1, round(image.shape[0] * WARM_WIDTH / image.shape[1]))
+        image = cv2.resize(image, (WARM_WIDTH, height), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), WARM_QUALITY])
+    if not ok:
+        return False
+    # Write to a temp file first so a half-written image is never served
+    with open(path + ".tmp", "wb") as f:
+        f.write(buffer.tobytes())
+    os.replace(path + ".tmp", path)
+    return True
+
+
+def _index_entry(snapshot):
+    return {
+        "filename": snapshot.filename,
+        "camera_id": snapshot.camera_id,
+        "taken_at": snapshot.taken_at.isoformat() if snapshot.taken_at else None,
+        "waste_detected": snapshot.waste_detected,
+        "boxes": json.loads(snapshot.boxes) if snapshot.boxes else None,
+    }
+
+
+def _write_archive(path, members, index):
+    """
+    (Re)writes a day archive from {name: bytes} plus its index. JPEGs are
+    stored, not deflated - they are already compressed.
+    """
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED) as archive:
+        for name in sorted(members):
+            archive.writestr(name, members[name])
+        archive.writestr(zipfile.ZipInfo(INDEX_NAME), json.dumps(index, indent=1),
+                         compress_type=zipfile.ZIP_DEFLATED)
+    _forget_archive(path)
+    os.replace(tmp_path, path)
+
+
+def _read_archive(path):
+    """({name: bytes}, {name: index entry}) of an existing day archive."""
+    if not os.path.exists(path):
+        return {}, {}
+    with _archive(path) as archive:
+        members = {name: archive.read(name) for name in archive.namelist() if name != INDEX_NAME}
+        try:
+            index = {entry["filename"]: entry for entry in json.loads(archive.read(INDEX_NAME))}
+        except KeyError:
+            index = {}
+    return members, index
+
+
+def compact(db: Session, retention_for=None, now=None, dry_run=False):
+    """
+    One compaction pass over the catalog: expire, re-encode, archive.
+    `retention_for(camera_id)` returns the retention in days (None = default).
+    Returns counts per step.
+    """
+    now = now or datetime.datetime.now()
+    retention_for = retention_for or (lambda camera_id: None)
+    report = {"expired": 0, "reencoded": 0, "archived": 0, "archives_written": 0}
+    repack = defaultdict(set)  # archive path -> filenames to drop from it
+
+    # 1. Retention (per camera)
+    camera_ids = [camera_id for (camera_id,) in db.query(Snapshot.camera_id).distinct()]
+    for camera_id in camera_ids:
+        days = retention_for(camera_id) or RETENTION_DAYS
+        expired = db.query(Snapshot).filter(
+            Snapshot.camera_id == camera_id if camera_id is not None else Snapshot.camera_id.is_(None),
+            Snapshot.taken_at < now - datetime.timedelta(days=days),
+        ).all()
+        for snapshot in expired:
+            report["expired"] += 1
+            if dry_run:
+                continue
+            if snapshot.archive:
+                repack[os.path.join(ARCHIVE_DIR, snapshot.archive)].add(snapshot.filename)
+            else:
+                path = loose_path(snapshot.filename)
+                _remove(path)
+                _remove_sidecars(path)
+            db.delete(snapshot)
+        if not dry_run:
+            drop_classes(db, [snapshot.id for snapshot in expired])
+
+    for path, names in repack.items():
+        members, index = _read_archive(path)
+        for name in names:
+            members.pop(name, None)
+            index.pop(name, None)
+        if members:
+            _write_archive(path, members, list(index.values()))
+        else:
+            _forget_archive(path)
+            _remove(path)
+    if not dry_run:
+        db.commit()
+
+    # 2. Hot -> warm: smaller JPEG, no sidecar
+    warm_before = now - datetime.timedelta(days=HOT_DAYS)
+    hot = db.query(Snapshot).filter(
+        Snapshot.archive.is_(None), or_(Snapshot.tier.is_(None), Snapshot.tier == "hot"),
+        Snapshot.taken_at < warm_before,
+    ).all()
+    for snapshot in hot:
+        path = loose_path(snapshot.filename)
+        if not os.path.exists(path):
+            continue
+        if dry_run:
+            report["reencoded"] += 1
+        elif _reencode(path):
+            # Box coordinates are normalized, so the record still fits the smaller image
+            _remove_sidecars(path)
+            snapshot.tier = "warm"
+            snapshot.file_mtime = os.path.getmtime(path)
+            report["reencoded"] += 1
+    if not dry_run:
+        db.commit()
+
+    # 3. Warm -> archived: one zip per day
+    archive_before = (now - datetime.timedelta(days=ARCHIVE_DAYS)).replace(hour=0, minute=0, second=0, microsecond=0)
+    old = db.query(Snapshot).filter(Snapshot.archive.is_(None), Snapshot.taken_at < archive_before).all()
+    by_archive = defaultdict(list)
+    for snapshot in old:
+        path = archive_for(snapshot.filename)
+        # Files without a date in their name stay loose
+        if path and os.path.exists(loose_path(snapshot.filename)):
+            by_archive[path].append(snapshot)
+
+    for path, snapshots in sorted(by_archive.items()):
+        report["archived"] += len(snapshots)
+        if dry_run:
+            continue
+        members, index = _read_archive(path)
+        for snapshot in snapshots:
+            with open(loose_path(snapshot.filename), "rb") as f:
+                members[snapshot.filename] = f.read()
+            index[snapshot.filename] = _index_entry(snapshot)
+        # Archive first, catalog second, loose files last: a crash in between
+        # leaves duplicates that the next run merges, never a lost snapshot
+        _write_archive(path, members, list(index.values()))
+        for snapshot in snapshots:
+            snapshot.archive = os.path.basename(path)
+            snapshot.tier = "archived"
+        db.commit()
+        for snapshot in snapshots:
+            _remove(loose_path(snapshot.filename))
+            _remove_sidecars(loose_path(snapshot.filename))
+        report["archives_written"] += 1
+
+    print(f"🗜️ Snapshot compaction{' (dry run)' if dry_run else ''}: {report}")
+    return report
+
+
+def camera_retention(db: Session):
+    """
+    retention_for() for compact() read straight from cameras.retention_days,
+    for callers that have no camera registry loaded (the command line).
+    """
+    days = dict(db.query(Camera.id, Camera.retention_days).all())
+    return days.get
+
+
+def storage_stats(directory=SNAPSHOT_DIR):
+    """File count and bytes per tier location, for /api/storage_stats."""
+    stats = {"loose_files": 0, "loose_bytes": 0, "archives": 0, "archive_bytes": 0}
+    if os.path.isdir(directory):
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_file():
+                    stats["loose_files"] += 1
+                    stats["loose_bytes"] += entry.stat().st_size
+    if os.path.isdir(ARCHIVE_DIR):
+        with os.scandir(ARCHIVE_DIR) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".zip"):
+                    stats["archives"] += 1
+                    stats["archive_bytes"] += entry.stat().st_size
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot storage tiering")
+    parser.add_argument("command", choices=["compact", "stats"])
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would change")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(storage_stats())
+    else:
+        # Only the database, not the web app (importing main would start its scheduler and cameras)
+        from database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            compact(db, camera_retention(db), dry_run=args.dry_run)
+        finally:
+            db.close()
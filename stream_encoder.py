@@ -0,0 +1,138 @@
+"""
+Encode-once MJPEG fan-out for the live camera streams.
+
+Each (camera, variant) pair gets one encoder thread that rotates, resizes,
+stamps the clock and JPEG-encodes every new hub frame a single time. All
+viewers of that variant receive the very same `bytes` chunk, so the CPU
+cost per frame no longer grows with the number of viewers. A variant is
+only encoded while somebody is subscribed to it.
+"""
+import datetime
+import threading
+
+import cv2
+
+from camera_hub import FrameBroadcaster
+from camera_registry import DEFAULT_ROTATION, ROTATIONS, rotate_frame, rotated_shape
+from frame_ring import FrameBuffers
+
+# Preset stream variants: /video_feed/{cam_id}?variant=thumb
+STREAM_VARIANTS = {
+    "full": {"size": (640, 480), "quality": 50, "font_scale": 0.7},
+    "thumb": {"size": (320, 240), "quality": 40, "font_scale": 0.4},
+}
+DEFAULT_VARIANT = "full"
+CHUNK_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+
+def encode_chunk(frame, size=(640, 480), quality=50, font_scale=0.7, rotation=DEFAULT_ROTATION, buffers=None):
+    """
+    Turns one raw camera frame into a ready-to-send multipart MJPEG chunk.
+    With `buffers` (a FrameBuffers) the rotated and resized images are written
+    into reused arrays instead of new ones. Returns None if JPEG encoding fails.
+    """
+    # 1. Rotate and Resize (into new or reused arrays, the hub frame stays untouched)
+    if buffers is None:
+        frame = rotate_frame(frame, rotation)
+        frame = cv2.resize(frame, size)
+    else:
+        if ROTATIONS.get(rotation) is not None:
+            frame = rotate_frame(frame, rotation, out=buffers.get("rotated", rotated_shape(frame.shape, rotation)))
+        frame = cv2.resize(frame, size, dst=buffers.get("resized", (size[1], size[0]) + frame.shape[2:]))
+
+    # 2. Date and Time Overlay (e.g. 2026-02-14 15:30:45)
+    time_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cv2.putText(frame, time_str, (10, int(40 * font_scale / 0.7)), cv2.FONT_HERSHEY_SIMPLEX,
+                font_scale, (0, 0, 255), 2)
+
+    # 3. Compress
+    ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    if not ret:
+        return None
+
+    # One copy straight from the JPEG buffer into the chunk (no tobytes() + concatenation)
+    return b"".join((CHUNK_HEADER, buffer, b'\r\n'))
+
+
+class EncodedFeed(FrameBroadcaster):
+    """
+    Encoded-frame cache for one camera variant. Publishes the latest
+    multipart chunk; every subscriber gets the same bytes object.
+
+    The hub reader is looked up again whenever the camera is re-pointed at
+    another stream, and the rotation is read per frame, so registry reloads
+    apply to open streams.
+    """
+
+    def __init__(self, hub, cam_id, variant, rotation_for=None):
+        # Stop encoding as soon as the last viewer of this variant leaves;
+        # the camera reader keeps its own idle timeout.
+        super().__init__(idle_timeout=0)
+        self.hub = hub
+        self.cam_id = cam_id
+        self.variant = variant
+        self.settings = STREAM_VARIANTS[variant]
+        self.rotation_for = rotation_for or (lambda cam_id: DEFAULT_ROTATION)
+        self.thread_name = f"encode-cam{cam_id}-{variant}"
+        # Only the encoder thread touches these
+        self.buffers = FrameBuffers()
+
+    def _produce(self, generation):
+        while self._keep_running(generation):
+            source = self.hub.source(self.cam_id)
+            try:
+                reader = self.hub.reader(self.cam_id)
+            except KeyError:
+                # Camera was removed from the registry
+                return
+            with reader.subscribe() as subscription:
+                while self._keep_running(generation) and self.hub.source(self.cam_id) == source:
+                    frame = subscription.next_frame(timeout=1.0)
+                    if frame is None:
+                        continue
+                    try:
+                        chunk = encode_chunk(frame, rotation=self.rotation_for(self.cam_id), buffers=self.buffers,
+                                             **self.settings)
+                    except Exception as e:
+                        print(f"Error processing frame: {e}")
+                        continue
+                    # The hub frame is a ring slot; drop the chunk if it was overwritten mid-encode
+                    if chunk is not None and subscription.intact():
+                        self._publish(chunk)
+
+
+class StreamEncoder:
+    """
+    Hands out EncodedFeed subscriptions, creating one feed per (camera, variant).
+    `rotation_for(cam_id)` gives the camera's rotation (e.g. from the registry).
+    """
+
+    def __init__(self, hub, rotation_for=None):
+        self.hub = hub
+        self.rotation_for = rotation_for
+        self.lock = threading.Lock()
+        self.feeds = {}
+
+    def feed(self, cam_id, variant=DEFAULT_VARIANT):
+        if variant not in STREAM_VARIANTS:
+            raise KeyError(variant)
+        if self.hub.source(cam_id) is None:
+            raise KeyError(cam_id)
+        with self.lock:
+            feed = self.feeds.get((cam_id, variant))
+            if feed is None:
+                feed = self.feeds[(cam_id, variant)] = EncodedFeed(self.hub, cam_id, variant, self.rotation_for)
+        return feed
+
+    def subscribe(self, cam_id, variant=DEFAULT_VARIANT):
+        return self.feed(cam_id, variant).subscribe()
+
+    def subscribe_async(self, cam_id, variant=DEFAULT_VARIANT):
+        """Must be called from the event loop; see FrameBroadcaster.subscribe_async."""
+        return self.feed(cam_id, variant).subscribe_async()
+
+    def stop_all(self):
+        with self.lock:
+            feeds = list(self.feeds.values())
+        for feed in feeds:
+            feed.stop()
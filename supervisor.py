@@ -0,0 +1,202 @@
+"""
+Runs LitterLens as separate processes on one machine, with one command:
+
+    python supervisor.py
+    python supervisor.py --inference-workers 3 --web-workers 2 --port 8000
+
+  broker     local IPC for small messages (broker.py)
+  capture    processes holding the camera connections; frames go into
+             shared-memory rings (frame_ring.py)
+  inference  one model per process; by default one process per core,
+             minus SUPERVISOR_RESERVED_CORES for the other tiers
+  scheduler  scheduled scan, compaction and continuous monitoring (main.py
+             with LITTERLENS_ROLE=scheduler)
+  web        uvicorn workers serving main.py with LITTERLENS_ROLE=web: no
+             cameras, no model, no jobs
+
+Processes that die are restarted with backoff. Every CPU_REPORT_SECONDS the
+CPU use per tier (100% = one core) is printed and published for GET /api/tiers.
+
+Risk states, tracked items and dashboard events come from the scheduler
+and capture processes; web workers read them through the broker.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import psutil
+
+from broker import BROKER_ADDRESS, connect, serve
+from camera_health import Backoff
+from tiers import capture_main, inference_main, scheduler_main
+
+CPU_REPORT_SECONDS = float(os.getenv("CPU_REPORT_SECONDS", "10"))
+CORES = os.cpu_count() or 2
+# Cores left to capture, web and the scheduler; inference gets the rest
+RESERVED_CORES = int(os.getenv("SUPERVISOR_RESERVED_CORES", "1"))
+INFERENCE_CORES = max(1, CORES - RESERVED_CORES)
+DEFAULT_INFERENCE_WORKERS = INFERENCE_CORES
+
+
+class Tier:
+    """
+    `count` copies of one kind of process. `launch(index)` starts a member
+    and returns its multiprocessing.Process or subprocess.Popen.
+    """
+
+    def __init__(self, name, launch, count=1):
+        self.name = name
+        self.launch = launch
+        self.count = count
+        self.members = [None] * count
+        self.backoffs = [Backoff(max_delay=30) for _ in range(count)]
+        self.restart_at = [0.0] * count
+        self.restarts = 0
+        self.psutil_processes = {}
+
+    @staticmethod
+    def _alive(member):
+        if isinstance(member, subprocess.Popen):
+            return member.poll() is None
+        return member.is_alive()
+
+    def start(self):
+        for index in range(self.count):
+            self.members[index] = self.launch(index)
+
+    def check(self):
+        """Restarts members that died, each after its own backoff."""
+        now = time.monotonic()
+        for index, member in enumerate(self.members):
+            if member is not None and self._alive(member):
+                continue
+            if member is not None:
+                delay = self.backoffs[index].next_delay()
+                code = member.returncode if isinstance(member, subprocess.Popen) else member.exitcode
+                print(f"⚠️ {self.name}[{index}] exited ({code}), restarting in {delay:.1f}s")
+                self.members[index] = None
+                self.restart_at[index] = now + delay
+            elif now >= self.restart_at[index]:
+                self.members[index] = self.launch(index)
+                self.restarts += 1
+
+    def pids(self):
+        return [member.pid for member in self.members if member is not None and self._alive(member)]
+
+    def cpu(self):
+        """CPU % (100 = one core) and memory of the tier's processes and their children."""
+        cpu, rss, count = 0.0, 0, 0
+        seen = set()
+        for pid in self.pids():
+            try:
+                root = psutil.Process(pid)
+                processes = [root] + root.children(recursive=True)
+            except psutil.NoSuchProcess:
+                continue
+            for process in processes:
+                seen.add(process.pid)
+                # Reuse Process objects: cpu_percent() measures since the previous call on the same object
+                process = self.psutil_processes.setdefault(process.pid, process)
+                try:
+                    cpu += process.cpu_percent(interval=None)
+                    rss += process.memory_info().rss
+                    count += 1
+                except psutil.NoSuchProcess:
+                    pass
+        self.psutil_processes = {pid: p for pid, p in self.psutil_processes.items() if pid in seen}
+        return {"processes": count, "cpu_percent": round(cpu, 1), "rss_mb": round(rss / 2**20, 1),
+                "restarts": self.restarts}
+
+    def stop(self, timeout=10):
+        for member in self.members:
+            if member is not None and self._alive(member):
+                member.terminate()
+        deadline = time.monotonic() + timeout
+        for member in self.members:
+            if member is None:
+                continue
+            if isinstance(member, subprocess.Popen):
+                try:
+                    member.wait(max(0.0, deadline - time.monotonic()))
+                except subprocess.TimeoutExpired:
+                    member.kill()
+            else:
+                member.join(max(0.0, deadline - time.monotonic()))
+                if member.is_alive():
+                    member.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run LitterLens as supervised capture / inference / web processes")
+    parser.add_argument("--broker", default=BROKER_ADDRESS, help="host:port for the local IPC broker")
+    parser.add_argument("--capture-workers", type=int, default=1)
+    parser.add_argument("--inference-workers", type=int, default=DEFAULT_INFERENCE_WORKERS)
+    parser.add_argument("--web-workers", type=int, default=2)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    # spawn: no child inherits the supervisor's threads or broker connection
+    context = multiprocessing.get_context("spawn")
+    # Model threads per worker, so the pool as a whole stays on its share of the cores
+    threads = max(1, INFERENCE_CORES // args.inference_workers)
+
+    def process(name, target, *target_args):
+        member = context.Process(target=target, args=target_args, name=name, daemon=False)
+        member.start()
+        return member
+
+    def web(index):
+        env = {**os.environ, "LITTERLENS_ROLE": "web", "BROKER_ADDRESS": args.broker}
+        return subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", args.host,
+                                 "--port", str(args.port), "--workers", str(args.web_workers)], env=env)
+
+    tiers = [
+        Tier("capture", lambda i: process(f"capture-{i}", capture_main, i, args.capture_workers, args.broker),
+             args.capture_workers),
+        Tier("inference", lambda i: process(f"inference-{i}", inference_main, args.broker, threads),
+             args.inference_workers),
+        Tier("scheduler", lambda i: process("scheduler", scheduler_main, args.broker)),
+        # uvicorn supervises its own workers; the tier restarts uvicorn as a whole
+        Tier("web", web),
+    ]
+
+    manager = serve(args.broker)
+    broker = connect(args.broker)
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *a: stopping.set())
+
+    print(f"🚀 Starting {args.capture_workers} capture, {args.inference_workers} inference "
+          f"({threads} threads each) and {args.web_workers} web workers on {CORES} cores")
+    for tier in tiers:
+        tier.start()
+
+    next_report = time.monotonic() + CPU_REPORT_SECONDS
+    try:
+        while not stopping.is_set():
+            for tier in tiers:
+                tier.check()
+            if time.monotonic() >= next_report:
+                next_report = time.monotonic() + CPU_REPORT_SECONDS
+                report = {tier.name: tier.cpu() for tier in tiers}
+                print("📊 " + " | ".join(f"{name} {r['cpu_percent']}% ({r['processes']} proc, {r['rss_mb']} MB)"
+                                         for name, r in report.items()))
+                broker.table("tiers").update({"cores": CORES, "updated_at": time.time(), "tiers": report})
+            stopping.wait(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("🛑 Stopping all tiers...")
+        # Web first (no new requests), broker last (everyone else talks to it)
+        for tier in reversed(tiers):
+            tier.stop()
+        manager.shutdown()
+
+
+if __name__ == "__main__":
+    main()
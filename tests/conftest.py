@@ -0,0 +1,51 @@
+import os
+import sys
+
+# The app is a set of top-level modules, run the tests against them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database.py builds its engines on import; keep tests off the PostgreSQL server (and asyncpg)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+
+import pytest
+from sqlalchemy import BigInteger, create_engine, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+@compiles(BigInteger, "sqlite")
+def _bigint_as_rowid(type_, compiler, **kw):
+    # SQLite only autoincrements an INTEGER PRIMARY KEY
+    return "INTEGER"
+
+# SpatiaLite isn't loaded in tests; GeoAlchemy's calls for Geometry columns
+# become no-ops and geometries are stored as their EWKT text (don't select them)
+SPATIALITE_FUNCTIONS = {
+    "RecoverGeometryColumn": 5, "DiscardGeometryColumn": 2, "CreateSpatialIndex": 2,
+    "DisableSpatialIndex": 2, "CheckSpatialIndex": 2,
+}
+
+
+@pytest.fixture
+def sqlite_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    @event.listens_for(engine, "connect")
+    def add_functions(connection, record):
+        for name, args in SPATIALITE_FUNCTIONS.items():
+            connection.create_function(name, args, lambda *a: 1)
+        for name in ("GeomFromEWKT", "ST_GeomFromEWKT", "AsEWKB", "ST_AsEWKB"):
+            connection.create_function(name, 1, lambda value: value)
+
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sessions(sqlite_engine):
+    """Session factory on the test engine, with every table of models.py created."""
+    import models
+    models.Base.metadata.create_all(sqlite_engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=sqlite_engine)
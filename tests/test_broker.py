@@ -0,0 +1,55 @@
+import queue
+
+import pytest
+
+import broker
+from broker import LocalBroker, RemoteBroker, connect, serve
+
+
+def test_local_broker_hands_out_one_queue_and_table_per_name():
+    local = LocalBroker()
+    assert local.queue("jobs") is local.queue("jobs")
+    assert local.queue("jobs") is not local.queue("replies")
+    local.table("rings")[1] = "ring-1"
+    assert local.table("rings") == {1: "ring-1"}
+    assert local.table("health") == {}
+
+    jobs = local.queue("jobs")
+    jobs.put({"id": 1})
+    assert local.queue("jobs").get_nowait() == {"id": 1}
+    with pytest.raises(queue.Empty):
+        jobs.get_nowait()
+
+
+def test_connect_local_is_one_broker_per_process(monkeypatch):
+    monkeypatch.setattr(broker, "_local_broker", None)
+    first = connect("local")
+    assert isinstance(first, LocalBroker)
+    assert connect("local") is first
+
+
+def test_connect_reads_the_address_when_called(monkeypatch):
+    # A spawned tier process sets BROKER_ADDRESS after broker.py was imported
+    monkeypatch.setattr(broker, "_local_broker", None)
+    monkeypatch.setenv("BROKER_ADDRESS", "local")
+    assert isinstance(connect(), LocalBroker)
+
+
+def test_remote_broker_roundtrip():
+    manager = serve("127.0.0.1:0")
+    try:
+        host, port = manager.address
+        first, second = RemoteBroker(f"{host}:{port}"), connect(f"{host}:{port}")
+
+        first.queue("inference").put({"id": 1, "seq": 5})
+        assert second.queue("inference").get(timeout=5) == {"id": 1, "seq": 5}
+
+        first.table("rings")[3] = "ring-3"
+        rings = second.table("rings")
+        assert rings.get(3) == "ring-3"
+        rings.update({4: "ring-4"})
+        assert first.table("rings").copy() == {3: "ring-3", 4: "ring-4"}
+        assert first.table("rings").pop(3) == "ring-3"
+        assert 3 not in second.table("rings")
+    finally:
+        manager.shutdown()
@@ -0,0 +1,117 @@
+import io
+import os
+import zipfile
+
+import cv2
+import numpy as np
+import pytest
+
+import bulk_ingest
+from bulk_ingest import IngestRun, get_job, iter_items, job_directory, store_upload, upload_path
+from models import IngestedFile
+
+
+class Box:
+    def __init__(self, cls, conf):
+        self.cls, self.conf = [cls], [conf]
+
+
+class Result:
+    names = {0: "bottle"}
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+def write_image(path, value=80):
+    cv2.imwrite(str(path), np.full((20, 30, 3), value, dtype=np.uint8))
+
+
+@pytest.fixture
+def photos(tmp_path):
+    folder = tmp_path / "photos"
+    (folder / "day2").mkdir(parents=True)
+    for name in ("a.jpg", "b.png", "day2/c.jpg"):
+        write_image(folder / name)
+    (folder / "notes.txt").write_text("not a photo")
+    (folder / "broken.jpg").write_bytes(b"not a jpeg")
+    with zipfile.ZipFile(folder / "extra.zip", "w") as archive:
+        ok, encoded = cv2.imencode(".jpg", np.zeros((10, 10, 3), dtype=np.uint8))
+        archive.writestr("d.jpg", encoded.tobytes())
+    return folder
+
+
+@pytest.fixture
+def written(monkeypatch):
+    # detection rows (+ rollups) are detection_store's business, collect them here
+    rows = []
+    monkeypatch.setattr(bulk_ingest, "write_batch", lambda db, batch, zone_for: rows.extend(batch))
+    return rows
+
+
+def detect_one_bottle(frames):
+    return [Result([Box(0, 0.9)]) for _ in frames]
+
+
+def test_items_are_listed_in_a_stable_order_with_zip_members(photos):
+    keys = [key for key, _, _ in iter_items(str(photos))]
+    # Files of a folder first, then its subfolders
+    assert keys == ["a.jpg", "b.png", "broken.jpg", "extra.zip/d.jpg", "day2/c.jpg"]
+
+
+def test_a_job_records_every_file_once(sessions, photos, written):
+    run = IngestRun(sessions, detect_one_bottle, "survey", str(photos), 12.9, 77.5, batch_size=2, workers=1)
+    progress = run.run()
+    assert progress["status"] == "done"
+    assert progress["processed"] == 4 and progress["failed"] == 1 and progress["detections"] == 4
+    assert len(written) == 4 and {row["source"] for row in written} == {"bulk"}
+
+    db = sessions()
+    files = {f.key: f.status for f in db.query(IngestedFile)}
+    assert files["broken.jpg"] == "failed" and files["extra.zip/d.jpg"] == "ok"
+    assert get_job(db, "survey").status == "done"
+    db.close()
+
+
+def test_resume_skips_files_already_done(sessions, photos, written):
+    calls = []
+
+    def detect(frames):
+        calls.append(len(frames))
+        return detect_one_bottle(frames)
+
+    first = IngestRun(sessions, detect, "survey", str(photos), batch_size=2, workers=1)
+    first.run()
+    write_image(photos / "e.jpg")
+    calls.clear()
+    written.clear()
+
+    progress = IngestRun(sessions, detect, "survey", str(photos), batch_size=2, workers=1).run()
+    # Only the new photo went through the model; nothing was written twice
+    assert sum(calls) == 1 and len(written) == 1
+    assert progress["skipped"] == 5 and progress["processed"] == 5 and progress["total"] == 6
+
+
+def test_job_names_are_plain_folder_names(tmp_path):
+    assert job_directory("survey-north_2", tmp_path) == os.path.join(os.path.realpath(tmp_path), "survey-north_2")
+    for name in ("..", ".", "", "a/b", "../main", "x y", "..%2f"):
+        with pytest.raises(ValueError):
+            job_directory(name, tmp_path)
+
+
+def test_uploads_stay_inside_the_job_folder(tmp_path):
+    directory = job_directory("survey", tmp_path)
+    assert upload_path(directory, "IMG_1.jpg") == os.path.join(directory, "IMG_1.jpg")
+    assert upload_path(directory, "../../main.py") == os.path.join(directory, "main.py")
+    assert upload_path(directory, "C:\\photos\\IMG_2.jpg") == os.path.join(directory, "IMG_2.jpg")
+    for name in ("..", ".", "", None):
+        assert upload_path(directory, name) is None
+
+
+def test_an_existing_upload_is_never_replaced(tmp_path):
+    path = str(tmp_path / "IMG_1.jpg")
+    assert store_upload(io.BytesIO(b"first"), path)
+    assert not store_upload(io.BytesIO(b"changed"), path)
+    assert open(path, "rb").read() == b"first"
+    # No temp files left behind
+    assert os.listdir(tmp_path) == ["IMG_1.jpg"]
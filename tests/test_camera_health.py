@@ -0,0 +1,161 @@
+import time
+
+import pytest
+
+import camera_health
+from camera_health import Backoff, CameraHealth, CircuitBreaker, CircuitOpenError
+from camera_hub import CaptureHub, FlakyVideoSource
+
+
+class Clock:
+    """Stands in for time.monotonic() so cooldowns pass instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(camera_health.time, "monotonic", clock)
+    return clock
+
+
+def test_backoff_grows_exponentially_up_to_the_cap():
+    backoff = Backoff(base=1.0, max_delay=5.0, jitter=0.0)
+    assert [backoff.next_delay() for _ in range(5)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+    backoff.reset()
+    assert backoff.next_delay() == 1.0
+
+
+def test_backoff_jitter_only_shortens_the_delay():
+    backoff = Backoff(base=4.0, max_delay=60, jitter=0.5)
+    for expected in (4.0, 8.0, 16.0):
+        delay = backoff.next_delay()
+        assert expected * 0.5 <= delay <= expected
+
+
+def test_breaker_opens_after_the_failure_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30)
+    assert not breaker.record_failure()
+    assert not breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    assert breaker.record_failure()  # Tripped
+    assert breaker.state == "open" and not breaker.allow()
+    assert breaker.retry_in() == 30
+
+
+def test_half_open_breaker_lets_one_probe_through_per_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.state == "half_open"
+    assert breaker.allow()        # The probe
+    assert not breaker.allow()    # Everyone else waits for its outcome
+    assert breaker.state == "open"
+
+    # Failed probe: closed again only after another cooldown
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 30
+    assert breaker.allow()
+
+
+def test_successful_probe_closes_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+    assert breaker.retry_in() == 0.0
+
+
+def test_camera_health_fast_fails_while_down_and_recovers(clock):
+    health = CameraHealth("camera 1", backoff=Backoff(jitter=0.0), breaker=CircuitBreaker(2, cooldown=10))
+    health.check()
+    assert health.record_failure("could not open stream") == 1.0
+    assert health.record_failure("could not open stream") == 2.0
+    with pytest.raises(CircuitOpenError):
+        health.check()
+    assert health.snapshot()["circuit"] == "open"
+
+    clock.now += 10
+    health.check()  # Probe allowed
+    assert health.record_frame()  # Back online
+    snapshot = health.snapshot()
+    assert snapshot["online"] and snapshot["circuit"] == "closed"
+    assert snapshot["reconnects"] == 2 and snapshot["consecutive_failures"] == 0
+    assert health.backoff.attempt == 0
+
+
+def test_uptime_counts_only_connected_time(clock):
+    health = CameraHealth("camera 1")
+    health.record_frame()
+    clock.now += 10
+    health.record_failure("frame lost")
+    clock.now += 10
+    snapshot = health.snapshot()
+    assert snapshot["uptime_s"] == 10.0
+    assert snapshot["uptime_ratio"] == 0.5
+
+
+def test_reset_forgets_failures(clock):
+    health = CameraHealth("camera 1", breaker=CircuitBreaker(1, cooldown=60))
+    health.record_failure("could not open stream")
+    with pytest.raises(CircuitOpenError):
+        health.check()
+    health.reset()
+    health.check()
+
+
+def test_flaky_source_parses_its_url():
+    source = FlakyVideoSource.from_url("flaky://?fail_rate=0.5&outage_every=60&outage_seconds=20&fps=30&seed=1")
+    assert source.fail_rate == 0.5 and source.outage_every == 60 and source.outage_seconds == 20
+    assert source.frame_interval == pytest.approx(1 / 30)
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    # Hub readers build their own Backoff/CircuitBreaker, retry within milliseconds here
+    monkeypatch.setattr(Backoff.__init__, "__defaults__", (0.01, 0.02, 2.0, 0.5))
+    monkeypatch.setattr(CircuitBreaker.__init__, "__defaults__", (3, 0.05))
+
+
+def test_hub_reconnects_a_flaky_camera(fast_retries):
+    # A reopened source replays its seed, seed 0 starts with a few good reads before each loss
+    hub = CaptureHub([{"id": 1, "url": "flaky://?fail_rate=0.3&fps=200&seed=0"}],
+                     source_factory=FlakyVideoSource.from_url, idle_timeout=5)
+    try:
+        with hub.subscribe(1) as subscription:
+            frames = sum(subscription.next_frame(timeout=1) is not None for _ in range(30))
+        assert frames == 30
+        health = hub.health(1)
+        assert health["reconnects"] > 0 and health["last_error"] == "frame lost"
+        assert health["online"]
+    finally:
+        hub.stop_all()
+
+
+def test_hub_fails_fast_on_a_camera_in_an_outage(fast_retries, monkeypatch):
+    monkeypatch.setattr(CircuitBreaker.__init__, "__defaults__", (3, 60))
+    url = "flaky://?outage_every=1000&outage_seconds=1000&fps=200"
+    hub = CaptureHub([{"id": 1, "url": url}], source_factory=FlakyVideoSource.from_url, idle_timeout=5)
+    try:
+        with hub.subscribe(1):
+            deadline = time.monotonic() + 3
+            while hub.available(1) and time.monotonic() < deadline:
+                time.sleep(0.01)
+        assert not hub.available(1)
+        assert hub.health(1)["circuit"] == "open"
+        started = time.monotonic()
+        with pytest.raises(CircuitOpenError):
+            hub.grab(url)
+        with pytest.raises(CircuitOpenError):
+            hub.subscribe(1)
+        assert time.monotonic() - started < 0.5
+    finally:
+        hub.stop_all()
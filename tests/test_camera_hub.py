@@ -0,0 +1,203 @@
+import asyncio
+import time
+
+import cv2
+import numpy as np
+
+from camera_hub import CaptureHub, FlakyVideoSource, FrameBroadcaster, LoopingVideoSource
+
+
+class CountingSource:
+    """Opens FlakyVideoSource streams and remembers every one it opened."""
+
+    def __init__(self, fps=100):
+        self.fps = fps
+        self.opened = []
+
+    def __call__(self, url):
+        source = FlakyVideoSource(fps=self.fps)
+        self.opened.append((url, source))
+        return source
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_viewers_share_one_connection():
+    source = CountingSource()
+    hub = CaptureHub([{"id": 1, "url": "cam-a"}], source_factory=source, idle_timeout=5)
+    try:
+        with hub.subscribe(1) as first, hub.subscribe(1) as second:
+            assert first.next_frame(timeout=2) is not None
+            assert second.next_frame(timeout=2) is not None
+            assert hub.reader(1).subscribers == 2
+        assert len(source.opened) == 1
+    finally:
+        hub.stop_all()
+
+
+def test_cameras_on_the_same_stream_share_a_reader():
+    source = CountingSource()
+    hub = CaptureHub([{"id": 1, "url": "cam-a"}, {"id": 2, "url": "cam-a"}, {"id": 3, "url": "cam-b"}],
+                     source_factory=source, idle_timeout=5)
+    try:
+        assert hub.reader(1) is hub.reader(2)
+        assert hub.reader(1) is not hub.reader(3)
+    finally:
+        hub.stop_all()
+
+
+def test_reader_opens_lazily_and_closes_after_the_idle_timeout():
+    source = CountingSource()
+    hub = CaptureHub([{"id": 1, "url": "cam-a"}], source_factory=source, idle_timeout=0.2)
+    try:
+        reader = hub.reader(1)
+        assert not reader.running and source.opened == []
+
+        with hub.subscribe(1) as subscription:
+            assert subscription.next_frame(timeout=2) is not None
+        # Still open right after the last viewer left...
+        assert reader.running
+        # ...and closed once the idle timeout has passed
+        assert wait_until(lambda: not reader.running)
+        assert not source.opened[0][1].isOpened()
+        assert hub.health(1)["idle"]
+
+        # The next viewer reopens it
+        with hub.subscribe(1) as subscription:
+            assert subscription.next_frame(timeout=2) is not None
+        assert len(source.opened) == 2
+    finally:
+        hub.stop_all()
+
+
+def test_a_returning_viewer_keeps_the_connection():
+    source = CountingSource()
+    hub = CaptureHub([{"id": 1, "url": "cam-a"}], source_factory=source, idle_timeout=0.3)
+    try:
+        with hub.subscribe(1) as subscription:
+            subscription.next_frame(timeout=2)
+        time.sleep(0.1)
+        with hub.subscribe(1) as subscription:
+            time.sleep(0.4)
+            assert subscription.next_frame(timeout=2) is not None
+        assert len(source.opened) == 1
+    finally:
+        hub.stop_all()
+
+
+def test_grab_returns_a_private_copy():
+    hub = CaptureHub([{"id": 1, "url": "cam-a"}], source_factory=CountingSource(), idle_timeout=5)
+    try:
+        frame = hub.grab("cam-a", timeout=2)
+        assert frame is not None and frame.shape == (480, 640, 3)
+        with hub.subscribe(1) as subscription:
+            shared = subscription.next_frame(timeout=2)
+            assert not np.shares_memory(frame, shared)
+    finally:
+        hub.stop_all()
+
+
+def test_removed_streams_are_stopped():
+    hub = CaptureHub([{"id": 1, "url": "cam-a"}], source_factory=CountingSource(), idle_timeout=5)
+    try:
+        with hub.subscribe(1) as subscription:
+            subscription.next_frame(timeout=2)
+            reader = hub.reader(1)
+            hub.update([{"id": 2, "url": "cam-b"}])
+            assert hub.source(1) is None
+            assert wait_until(lambda: not reader.running)
+    finally:
+        hub.stop_all()
+
+
+def test_looping_file_source_replays_forever(tmp_path):
+    path = str(tmp_path / "loop.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 100, (32, 24))
+    for value in range(3):
+        writer.write(np.full((24, 32, 3), value * 60, dtype=np.uint8))
+    writer.release()
+
+    source = LoopingVideoSource(path, fps=1000)
+    try:
+        assert source.isOpened()
+        # Twice the file's length: the end rewinds instead of failing
+        for _ in range(6):
+            ok, frame = source.read()
+            assert ok and frame.shape == (24, 32, 3)
+    finally:
+        source.release()
+
+
+class Counter(FrameBroadcaster):
+    """Publishes 1, 2, 3, ... as fast as it can, or up to `limit`."""
+
+    def __init__(self, limit=None):
+        super().__init__(idle_timeout=0)
+        self.limit = limit
+        self.published = 0
+
+    def _produce(self, generation):
+        while self._keep_running(generation):
+            if self.limit is None or self.published < self.limit:
+                self.published += 1
+                self._publish(self.published)
+            time.sleep(0.001)
+
+
+def test_async_viewers_get_new_values_without_threads():
+    counter = Counter()
+
+    async def watch():
+        async with counter.subscribe_async() as first, counter.subscribe_async() as second:
+            values = [await first.next_frame(timeout=2) for _ in range(5)]
+            assert await second.next_frame(timeout=2) is not None
+            assert counter.subscribers == 2 and len(counter.async_queues) == 1
+            return values
+
+    try:
+        values = asyncio.run(watch())
+        assert None not in values and values == sorted(values)
+        # Closing the last subscription stops the producer
+        assert wait_until(lambda: not counter.running)
+        assert counter.async_queues == {}
+    finally:
+        counter.stop()
+
+
+def test_slow_async_viewer_only_keeps_the_latest_value():
+    counter = Counter(limit=50)
+
+    async def lag():
+        async with counter.subscribe_async() as subscription:
+            # Not reading while the producer runs; it must never wait for us
+            while counter.published < 50:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            assert subscription.queue.qsize() == 1
+            return await subscription.next_frame(timeout=1), subscription.dropped
+
+    try:
+        latest, dropped = asyncio.run(lag())
+        assert latest == 50 and dropped == 49
+    finally:
+        counter.stop()
+
+
+def test_async_viewer_times_out_without_values():
+    counter = Counter(limit=0)
+
+    async def wait():
+        async with counter.subscribe_async() as subscription:
+            return await subscription.next_frame(timeout=0.1)
+
+    try:
+        assert asyncio.run(wait()) is None
+    finally:
+        counter.stop()
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from camera_registry import DEFAULT_CAMERAS, CameraRegistry, camera_config, rotate_frame, rotated_shape, seed_cameras
+from models import Camera
+
+
+@pytest.fixture
+def db(sessions):
+    db = sessions()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def registry(sessions):
+    return CameraRegistry(sessions)
+
+
+def test_config_defaults():
+    config = camera_config({"id": 6, "url": " http://cam/video/ "})
+    assert config["name"] == "camera6" and config["source"] == "http://cam/video"
+    assert config["zone"] == 2 and config["rotation"] == 90 and config["enabled"]
+    assert camera_config({"id": 1, "url": "x", "rotation": 450, "enabled": False})["rotation"] == 90
+    assert not camera_config({"id": 1, "url": "x", "enabled": False})["enabled"]
+
+
+def test_bad_roi_is_ignored_not_fatal():
+    assert camera_config({"id": 1, "url": "x", "roi": "[[0, 0], [1"})["roi"] is None
+    assert camera_config({"id": 1, "url": "x", "roi": "[[0, 0], [1, 0], [1, 1]]"})["roi"] == [[[0, 0], [1, 0], [1, 1]]]
+
+
+def test_defaults_until_the_first_load_then_the_table(db, registry):
+    assert registry.ids() == [cam["id"] for cam in DEFAULT_CAMERAS]
+    db.add_all([Camera(id=1, name="Gate", url="rtsp://a", location_id=3),
+                Camera(id=2, name="Canal", url="rtsp://a/", enabled=False),
+                Camera(id=7, name="Market", url="rtsp://b")])
+    db.commit()
+    registry.reload()
+    assert registry.ids() == [1, 7] and registry.ids(enabled_only=False) == [1, 2, 7]
+    assert registry.get(1)["name"] == "Gate" and registry.zone(1) == 3 and registry.zone(99) == 0
+    assert 2 in registry and 3 not in registry
+    # Disabled cameras aren't captured
+    assert registry.sources() == {"rtsp://a": [1], "rtsp://b": [7]}
+
+
+def test_reload_reports_changes_to_listeners(db, registry):
+    seen = []
+    registry.on_change(lambda reg, changed: seen.append(changed))
+    registry.on_change(lambda reg, changed: 1 / 0)  # A broken listener doesn't stop the others
+    db.add_all([Camera(id=1, url="rtsp://a"), Camera(id=2, url="rtsp://b")])
+    db.commit()
+    assert registry.reload() == list(range(1, 13))  # Defaults replaced by the table
+    version = registry.version
+
+    assert registry.reload() == [] and registry.version == version
+    db.query(Camera).filter(Camera.id == 2).update({"url": "rtsp://c"})
+    db.add(Camera(id=3, url="rtsp://c"))
+    db.commit()
+    assert registry.reload() == [2, 3]
+    assert registry.sources() == {"rtsp://a": [1], "rtsp://c": [2, 3]}
+    assert seen == [list(range(1, 13)), [2, 3]] and registry.version == version + 1
+
+
+def test_seed_only_fills_an_empty_table(db):
+    assert seed_cameras(db) == len(DEFAULT_CAMERAS)
+    assert seed_cameras(db) == 0
+    assert db.query(Camera).count() == len(DEFAULT_CAMERAS)
+
+
+def test_frames_are_rotated_and_resized_per_camera(db, registry):
+    db.add_all([Camera(id=1, url="a", rotation=90, width=120, height=160), Camera(id=2, url="b", rotation=0)])
+    db.commit()
+    registry.reload()
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    assert registry.prepare_frame(1, frame).shape == (160, 120, 3)
+    assert registry.prepare_frame(2, frame) is frame
+    assert registry.prepare_frame(9, frame) is frame
+
+    out = np.empty(rotated_shape(frame.shape, 270), dtype=np.uint8)
+    assert rotate_frame(frame, 270, out=out) is out and out.shape == (640, 480, 3)
@@ -0,0 +1,63 @@
+import asyncio
+
+from sqlalchemy import Column, Integer, String, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import declarative_base
+
+import database
+
+Base = declarative_base()
+
+
+class Note(Base):
+    __tablename__ = "notes"
+    id = Column(Integer, primary_key=True)
+    text = Column(String)
+
+
+def test_pool_options_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "4")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "0")
+    options = database.pool_options("postgresql+psycopg2://u:p@db/litterlens_db")
+    assert options["pool_size"] == 3 and options["max_overflow"] == 4
+    assert options["pool_pre_ping"] is False
+    assert options["pool_recycle"] == 1800
+
+
+def test_sqlite_gets_no_pool_sizing():
+    assert database.pool_options("sqlite:///litterlens.db") == {}
+
+
+def test_async_url_swaps_in_the_async_driver(monkeypatch):
+    monkeypatch.delenv("ASYNC_DATABASE_URL", raising=False)
+    assert database.async_url("postgresql+psycopg2://u:p@db:5432/x") == "postgresql+asyncpg://u:p@db:5432/x"
+    assert database.async_url("postgresql://u:p@db/x") == "postgresql+asyncpg://u:p@db/x"
+    assert database.async_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+    monkeypatch.setenv("ASYNC_DATABASE_URL", "postgresql+asyncpg://other/x")
+    assert database.async_url("postgresql://u:p@db/x") == "postgresql+asyncpg://other/x"
+
+
+def test_async_session_roundtrip(tmp_path):
+    url = database.async_url(f"sqlite:///{tmp_path / 'test.db'}")
+
+    async def roundtrip():
+        engine = create_async_engine(url, **database.pool_options(url))
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            db.add(Note(text="bin 3 overflowing"))
+            await db.commit()
+        async with sessions() as db:
+            texts = (await db.execute(select(Note.text))).scalars().all()
+        await engine.dispose()
+        return texts
+
+    assert asyncio.run(roundtrip()) == ["bin 3 overflowing"]
+
+
+def test_module_engines_share_the_configured_database():
+    assert database.engine.url.render_as_string(hide_password=False) == database.DATABASE_URL
+    assert (database.async_engine.url.render_as_string(hide_password=False)
+            == database.async_url(database.DATABASE_URL))
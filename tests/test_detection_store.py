@@ -0,0 +1,66 @@
+import datetime
+
+import pytest
+from sqlalchemy import event
+
+from detection_store import (build_rows, bulk_insert, detections_from_result, point_wkt, severity_for_count,
+                             write_batch)
+from models import DetectionEvent, DetectionRollup
+from roi_inference import MergedBox, MergedResult
+
+NOW = datetime.datetime(2026, 1, 28, 16, 30)
+
+
+@pytest.fixture
+def db(sessions):
+    db = sessions()
+    yield db
+    db.close()
+
+
+def test_severity_follows_the_item_count():
+    assert [severity_for_count(n) for n in (0, 1, 5, 6, 10, 11)] == ["None", "Low", "Low", "Medium", "Medium", "High"]
+
+
+def test_low_confidence_boxes_are_dropped():
+    frame_shape = (100, 100, 3)
+    boxes = [MergedBox(0, 0.9, (0, 0, 10, 10), frame_shape), MergedBox(1, 0.2, (0, 0, 10, 10), frame_shape)]
+    result = MergedResult(boxes, {0: "Plastic", 1: "Can"}, None)
+    assert detections_from_result(result) == [("Plastic", 0.9)]
+    assert detections_from_result(result, min_confidence=0.1) == [("Plastic", 0.9), ("Can", 0.2)]
+
+
+def test_rows_share_the_image_severity():
+    rows = build_rows([("Plastic", 0.9)] * 6, "scheduler", camera_id=2, snapshot="cam2.jpg", timestamp=NOW)
+    assert len(rows) == 6 and {row["severity"] for row in rows} == {"Medium"}
+    assert rows[0] == {"source": "scheduler", "camera_id": 2, "waste_type": "Plastic", "confidence": 0.9,
+                       "severity": "Medium", "timestamp": NOW, "snapshot": "cam2.jpg", "location": None}
+    # Tracked items in view decide the severity when given
+    assert build_rows([("Can", 0.5)], "monitor", item_count=12)[0]["severity"] == "High"
+    assert point_wkt(14.5, 121.0) == "SRID=4326;POINT(121.0 14.5)"
+
+
+def test_bulk_insert_is_one_statement(db, sqlite_engine):
+    statements = []
+    event.listen(sqlite_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, params, context, executemany: statements.append(statement))
+    rows = build_rows([("Plastic", 0.9), ("Can", 0.8), ("Bottle", 0.7)], "upload",
+                      location=point_wkt(14.5, 121.0), timestamp=NOW)
+    statements.clear()
+    assert bulk_insert(db, rows) == 3
+    assert len([s for s in statements if s.startswith("INSERT")]) == 1
+    assert sorted(name for (name,) in db.query(DetectionEvent.waste_type)) == ["Bottle", "Can", "Plastic"]
+    assert bulk_insert(db, []) == 0
+
+
+def test_write_batch_adds_events_and_rollups_in_one_transaction(db):
+    rows = build_rows([("Plastic", 0.9), ("Plastic", 0.8)], "scheduler", camera_id=5, timestamp=NOW)
+    write_batch(db, rows, lambda camera_id: 2)
+    db.rollback()
+    assert db.query(DetectionEvent).count() == 0 and db.query(DetectionRollup).count() == 0
+
+    write_batch(db, rows, lambda camera_id: 2)
+    db.commit()
+    assert db.query(DetectionEvent).count() == 2
+    rollups = {(r.granularity, r.bucket_start, r.zone, r.count) for r in db.query(DetectionRollup)}
+    assert rollups == {("hour", datetime.datetime(2026, 1, 28, 16), 2, 2), ("day", datetime.datetime(2026, 1, 28), 2, 2)}
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import event_bus
+from event_bus import EventBus, format_event
+
+
+def parse(message):
+    kind, data = message.strip().split("\n")
+    return kind[len("event: "):], json.loads(data[len("data: "):])
+
+
+async def connected(bus, count=1):
+    while bus.stats["connected"] < count:
+        await asyncio.sleep(0.001)
+
+
+def test_events_are_formatted_for_event_source():
+    assert format_event("risk", {"key": 1, "count": 3}) == 'event: risk\ndata: {"key": 1, "count": 3}\n\n'
+
+
+def test_initial_state_then_published_updates():
+    bus = EventBus()
+
+    async def client():
+        stream = bus.stream([("risk_snapshot", {"1": {"count": 0}})])
+        try:
+            first = await stream.__anext__()
+            bus.publish("camera", 1, {"online": False})
+            second = await asyncio.wait_for(stream.__anext__(), 2)
+            return parse(first), parse(second)
+        finally:
+            await stream.aclose()
+
+    first, second = asyncio.run(client())
+    assert first == ("risk_snapshot", {"1": {"count": 0}})
+    assert second == ("camera", {"key": 1, "online": False})
+    assert bus.stats["connected"] == 0
+
+
+def test_updates_for_one_key_are_coalesced():
+    bus = EventBus()
+
+    async def client():
+        stream = bus.stream()
+        task = asyncio.ensure_future(stream.__anext__())
+        await connected(bus)
+        # A burst of updates before the client gets to read
+        for n in range(5):
+            bus.publish("risk", 1, {"count": n, "status": "Low Risk"})
+            bus.publish("risk", 2, {"count": 7})
+        bus.publish("risk", 1, {"status": "Medium Risk"})
+        messages = [await asyncio.wait_for(task, 2)]
+        messages.append(await asyncio.wait_for(stream.__anext__(), 2))
+        await stream.aclose()
+        return [parse(m) for m in messages]
+
+    assert asyncio.run(client()) == [
+        ("risk", {"key": 1, "count": 4, "status": "Medium Risk"}),
+        ("risk", {"key": 2, "count": 7}),
+    ]
+
+
+def test_empty_updates_are_not_sent():
+    bus = EventBus()
+    bus.publish("risk", 1, {})
+    assert bus.stats["published"] == 0
+
+
+def test_idle_streams_send_keepalives(monkeypatch):
+    monkeypatch.setattr(event_bus, "KEEPALIVE_SECONDS", 0.05)
+    bus = EventBus()
+
+    async def client():
+        stream = bus.stream()
+        try:
+            return await asyncio.wait_for(stream.__anext__(), 2)
+        finally:
+            await stream.aclose()
+
+    assert asyncio.run(client()) == ": keepalive\n\n"
+
+
+def test_clients_that_fall_too_far_behind_are_dropped(monkeypatch):
+    monkeypatch.setattr(event_bus, "MAX_PENDING", 3)
+    bus = EventBus()
+
+    async def client():
+        stream = bus.stream()
+        task = asyncio.ensure_future(stream.__anext__())
+        await connected(bus)
+        for key in range(5):
+            bus.publish("snapshot", key, {"n": key})
+        messages = [await asyncio.wait_for(task, 2)]
+        async for message in stream:
+            messages.append(message)
+        return messages
+
+    # What was pending goes out, then the stream ends; the browser reconnects
+    # and gets a fresh snapshot
+    assert len(asyncio.run(client())) == 5
+    assert bus.stats["connected"] == 0
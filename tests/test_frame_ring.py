@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from camera_hub import CaptureHub, FlakyVideoSource
+from frame_ring import FrameBuffers, FrameRing
+
+SHAPE = (4, 6, 3)
+
+
+def frame(value, shape=SHAPE):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing.create(SHAPE, slots=4)
+    yield ring
+    ring.close()
+
+
+def test_put_and_get_return_the_same_pixels(ring):
+    assert ring.latest() == (0, None)
+    seq = ring.put(frame(7))
+    assert seq == 1 and ring.head == 1
+    latest_seq, view = ring.latest()
+    assert latest_seq == 1
+    assert view.shape == SHAPE and (view == 7).all()
+
+
+def test_wraparound_invalidates_the_oldest_frame(ring):
+    for value in range(1, 5):
+        ring.put(frame(value))
+    assert ring.valid(1)
+    ring.put(frame(5))  # Fifth frame reuses the first slot
+    assert ring.get(1) is None
+    assert not ring.valid(1)
+    assert (ring.get(5) == 5).all()
+    assert all(ring.valid(seq) for seq in range(2, 6))
+
+
+def test_view_is_invalid_while_its_slot_is_being_rewritten(ring):
+    for value in range(1, 5):
+        ring.put(frame(value))
+    view = ring.get(1)
+    slot = ring.writable(SHAPE)
+    # Invalidated before the writer touches a pixel
+    assert not ring.valid(1)
+    slot[:] = 9
+    seq = ring.commit()
+    assert seq == 5 and (view == 9).all()
+
+
+def test_commit_copies_a_frame_decoded_elsewhere(ring):
+    ring.writable(SHAPE)
+    seq = ring.commit(frame(3))
+    assert (ring.get(seq) == 3).all()
+
+    # Smaller frame (e.g. resolution change): the slot takes the new shape
+    ring.writable(SHAPE)
+    seq = ring.commit(frame(4, (2, 3, 3)))
+    assert ring.get(seq).shape == (2, 3, 3)
+    assert (ring.get(seq) == 4).all()
+
+
+def test_frames_that_do_not_fit_are_rejected(ring):
+    with pytest.raises(ValueError):
+        ring.writable((8, 8, 3))
+
+
+def test_attach_shares_the_pixels(ring):
+    ring.put(frame(11))
+    other = FrameRing.attach(ring.name)
+    try:
+        assert other.head == 1
+        assert (other.get(1) == 11).all()
+        ring.put(frame(12))
+        assert (other.latest()[1] == 12).all()
+    finally:
+        other.close()
+
+
+def test_closed_ring_reports_nothing_valid():
+    ring = FrameRing.create(SHAPE, slots=2)
+    ring.put(frame(1))
+    ring.close()
+    assert not ring.valid(1)
+    assert ring.head == 0
+    assert ring.get(1) is None
+    assert ring.latest() == (0, None)
+    assert ring.read_into(frame(0)) is None
+
+
+def test_frame_buffers_are_reused_until_the_shape_changes():
+    buffers = FrameBuffers()
+    first = buffers.get("resized", (4, 4, 3))
+    assert buffers.get("resized", (4, 4, 3)) is first
+    assert buffers.get("resized", (2, 2, 3)) is not first
+    assert buffers.allocations == 2
+
+
+def test_hub_frames_report_when_their_slot_is_reused():
+    hub = CaptureHub([{"id": 1, "url": "flaky://?fps=200"}], source_factory=FlakyVideoSource.from_url,
+                     idle_timeout=0)
+    try:
+        reader = hub.reader(1)
+        reader.ring_slots = 3
+        with hub.subscribe(1) as subscription:
+            assert subscription.next_frame(timeout=2) is not None
+            assert subscription.intact()
+            first = subscription.last_seq
+            # Three newer frames later the slot holds something else
+            while subscription.last_seq < first + 3:
+                assert subscription.next_frame(timeout=2) is not None
+            assert not reader.frame_intact(first)
+            assert subscription.intact()
+    finally:
+        hub.stop_all()
@@ -0,0 +1,147 @@
+import datetime
+import os
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+import thumbnails
+from models import SnapshotClass
+from snapshot_catalog import decode_cursor, query_history, reconcile, record_snapshots, waste_classes
+
+START = datetime.datetime(2026, 1, 28, 16, 0, 0)
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    # Snapshot paths are relative to the working directory (detected_snapshots/...)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(thumbnails, "THUMB_DIR", os.path.join("detected_snapshots", ".thumbs"))
+    os.makedirs("detected_snapshots")
+    return tmp_path / "detected_snapshots"
+
+
+def write_snapshot(directory, camera_id, taken_at, waste_detected="No Waste Detected"):
+    path = directory / f"cam{camera_id}_{taken_at:%Y-%m-%d_%H-%M-%S}.jpg"
+    cv2.imwrite(str(path), np.full((120, 160, 3), 90, dtype=np.uint8))
+    return {"img_path": str(path), "camera_id": camera_id, "taken_at": taken_at, "waste_detected": waste_detected}
+
+
+@pytest.fixture
+def catalog(sessions, snapshot_dir):
+    db = sessions()
+    classes = ["Plastic, Bottle", "No Waste Detected", "bottle", "Can", "Bottle Cap"]
+    entries = [write_snapshot(snapshot_dir, 1 + i % 2, START + datetime.timedelta(minutes=i), classes[i % 5])
+               for i in range(10)]
+    record_snapshots(db, entries)
+    yield db
+    db.close()
+
+
+def test_waste_classes_are_whole_lower_case_names():
+    assert waste_classes("Plastic, Bottle") == {"plastic", "bottle"}
+    assert waste_classes("Bottle Cap, bottle") == {"bottle cap", "bottle"}
+    assert waste_classes("No Waste Detected") == set()
+    assert waste_classes("Unknown") == set() and waste_classes(None) == set()
+
+
+def test_pages_follow_the_cursor_newest_first(catalog):
+    seen, cursor = [], None
+    while True:
+        page = query_history(catalog, cursor=cursor, limit=4)
+        seen += [item["timestamp"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 10 and len(set(seen)) == 10
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_filters_combine_with_the_cursor(catalog):
+    page = query_history(catalog, camera_id=1, limit=2)
+    assert [item["cam_id"] for item in page["items"]] == ["1", "1"]
+    rest = query_history(catalog, camera_id=1, cursor=page["next_cursor"], limit=10)
+    assert len(rest["items"]) == 3 and rest["next_cursor"] is None
+
+    since, until = START + datetime.timedelta(minutes=2), START + datetime.timedelta(minutes=4)
+    assert len(query_history(catalog, since=since, until=until)["items"]) == 3
+
+
+def test_class_filter_matches_whole_class_names(catalog):
+    def found(waste_class):
+        return sorted(item["waste_detected"] for item in query_history(catalog, waste_class=waste_class)["items"])
+
+    assert found("bottle") == ["Plastic, Bottle", "Plastic, Bottle", "bottle", "bottle"]
+    assert found("BOTTLE CAP") == ["Bottle Cap", "Bottle Cap"]
+    # Not substrings of other names, and no LIKE wildcards
+    assert found("No") == [] and found("bot") == []
+    assert found("%") == [] and found("_ottle") == []
+
+
+def test_class_index_follows_rewrites_and_deletions(catalog, snapshot_dir):
+    entry = write_snapshot(snapshot_dir, 1, START, "Can")
+    record_snapshots(catalog, [entry])  # Same file (upsert), new classes
+    assert query_history(catalog, waste_class="plastic")["items"][-1]["timestamp"] != "2026-01-28 16:00:00"
+
+    os.remove(entry["img_path"])
+    assert reconcile(catalog)["removed"] == 1
+    snapshot_ids = {snapshot_id for (snapshot_id,) in catalog.query(SnapshotClass.snapshot_id)}
+    assert len(snapshot_ids) == 7  # Nine snapshots left, two of them without waste
+
+
+def test_reconcile_indexes_classes_of_older_rows(catalog):
+    catalog.query(SnapshotClass).delete()
+    catalog.commit()
+    assert query_history(catalog, waste_class="can")["items"] == []
+    reconcile(catalog)
+    assert len(query_history(catalog, waste_class="can")["items"]) == 2
+
+
+def test_bad_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_thumbnail_is_cached_until_the_source_changes(catalog, snapshot_dir):
+    name = sorted(os.listdir(snapshot_dir))[0]
+    path = thumbnails.get_thumbnail(name, 160)
+    assert cv2.imread(path).shape[1] == 160
+    etag = thumbnails.thumbnail_etag(name, 160)
+    assert thumbnails.get_thumbnail(name, 160) == path
+    assert thumbnails.thumbnail_etag(name, 320) != etag
+
+    source = snapshot_dir / name
+    cv2.imwrite(str(source), np.zeros((100, 100, 3), dtype=np.uint8))
+    os.utime(source, (os.path.getmtime(path) + 10, os.path.getmtime(path) + 10))
+    assert thumbnails.thumbnail_etag(name, 160) != etag
+    with pytest.raises(FileNotFoundError):
+        thumbnails.get_thumbnail("cam9_2026-01-01_00-00-00.jpg")
+    with pytest.raises(ValueError):
+        thumbnails.get_thumbnail(name, 123)
+
+
+def test_concurrent_requests_for_one_thumbnail_all_succeed(catalog, snapshot_dir):
+    name = sorted(os.listdir(snapshot_dir))[0]
+    errors, paths = [], []
+    start = threading.Barrier(8)
+
+    def request():
+        start.wait()
+        try:
+            paths.append(thumbnails.get_thumbnail(name, 640))
+        except Exception as e:
+            errors.append(e)
+
+    os.makedirs(thumbnails.THUMB_DIR, exist_ok=True)
+    for _ in range(5):
+        for f in os.listdir(thumbnails.THUMB_DIR):
+            os.remove(os.path.join(thumbnails.THUMB_DIR, f))
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert errors == [] and len(set(paths)) == 1
+    # No temp files left behind
+    assert os.listdir(thumbnails.THUMB_DIR) == [os.path.basename(paths[0])]
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("ultralytics")
+
+from inference import InferenceEngine  # noqa: E402
+
+
+class FakeModel:
+    """Returns each image's first pixel as its "result" and records the batch sizes."""
+
+    names = {0: "bottle"}
+
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.batches = []
+
+    def __call__(self, images, verbose=False):
+        self.batches.append(len(images))
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return [int(image.flat[0]) for image in images]
+
+
+def image(value):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+def test_each_caller_gets_its_own_result():
+    engine = InferenceEngine(model=FakeModel()).start()
+    assert engine.predict(image(3), timeout=2) == 3
+    assert engine.predict_many([image(v) for v in (1, 2, 3)], timeout=2) == [1, 2, 3]
+    assert asyncio.run(engine.predict_async(image(9))) == 9
+    assert engine.names == {0: "bottle"}
+    assert engine.stats["images"] == 5
+
+
+def test_waiting_requests_share_a_forward_pass():
+    model = FakeModel(delay=0.05)
+    engine = InferenceEngine(model=model, max_batch=4, max_wait_ms=20).start()
+    results = [None] * 10
+
+    def call(i):
+        results[i] = engine.predict(image(i), timeout=5)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == list(range(10))
+    assert max(model.batches) <= 4 and len(model.batches) < 10
+    assert engine.stats["batches"] == len(model.batches)
+
+
+def test_model_errors_fail_the_whole_batch_and_the_engine_recovers():
+    model = FakeModel(error=RuntimeError("bad input"))
+    engine = InferenceEngine(model=model).start()
+    with pytest.raises(RuntimeError, match="bad input"):
+        engine.predict(image(1), timeout=2)
+    model.error = None
+    assert engine.predict(image(2), timeout=2) == 2
+
+
+def test_cancelled_requests_are_skipped():
+    model = FakeModel(delay=0.1)
+    engine = InferenceEngine(model=model, max_batch=1).start()
+    first = engine.submit(image(1))
+    time.sleep(0.02)  # The worker is busy with the first image
+    second = engine.submit(image(2))
+    assert second.cancel()
+    third = engine.submit(image(3))
+    assert first.result(2) == 1 and third.result(2) == 3
+    assert engine.stats["images"] == 2
+
+
+def test_load_errors_reach_every_caller(monkeypatch):
+    import inference
+
+    def fail(path):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(inference, "load_model", fail)
+    engine = InferenceEngine(model_path="missing.pt")
+    with pytest.raises(RuntimeError, match="Could not load model"):
+        engine.start()
+    with pytest.raises(RuntimeError, match="Could not load model"):
+        engine.predict(image(1), timeout=2)
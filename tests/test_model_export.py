@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+pytest.importorskip("ultralytics")
+
+import model_export  # noqa: E402
+
+
+class FakeYOLO:
+    """Writes a placeholder export next to the weights, like ultralytics does."""
+
+    exports = []
+
+    def __init__(self, path, task=None):
+        self.path = path
+
+    def export(self, format, **options):
+        FakeYOLO.exports.append((self.path, format, options))
+        artifact = os.path.join(os.path.dirname(self.path), f"exported.{format}")
+        with open(artifact, "w") as f:
+            f.write(format)
+        return artifact
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_export, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(model_export, "YOLO", FakeYOLO)
+    FakeYOLO.exports = []
+    weights = tmp_path / "best.pt"
+    weights.write_bytes(b"weights v1")
+    return weights
+
+
+def test_exports_are_cached_per_weights_and_options(cache, monkeypatch):
+    artifact = model_export.export_model(str(cache), "onnx")
+    assert artifact.endswith(os.path.join("onnx-dynamicTrue-imgsz640", "model.onnx"))
+    assert os.path.exists(artifact)
+    # Second call: straight from the cache
+    assert model_export.export_model(str(cache), "onnx") == artifact
+    assert len(FakeYOLO.exports) == 1
+    assert FakeYOLO.exports[0][1:] == ("onnx", {"imgsz": 640, "dynamic": True})
+
+    # Other export options or other weights get their own folder
+    monkeypatch.setattr(model_export, "IMGSZ", 320)
+    assert "imgsz320" in model_export.export_model(str(cache), "onnx")
+    cache.write_bytes(b"weights v2")
+    monkeypatch.setattr(model_export, "IMGSZ", 640)
+    retrained = model_export.export_model(str(cache), "onnx")
+    assert retrained != artifact and len(FakeYOLO.exports) == 3
+
+
+def test_auto_runtime_takes_the_first_backend_that_loads(cache, monkeypatch):
+    tried = []
+
+    def load_backend(weights, backend):
+        tried.append(backend)
+        if backend == "openvino":
+            raise RuntimeError("export failed")
+        return lambda image, verbose=False: []
+
+    monkeypatch.setattr(model_export, "backend_available", lambda backend: backend != "onnx")
+    monkeypatch.setattr(model_export, "load_backend", load_backend)
+    model_export.load_runtime(str(cache))
+    assert tried == ["openvino", "torchscript"]
+
+    with pytest.raises(RuntimeError, match="No usable YOLO runtime"):
+        model_export.load_runtime(str(cache), runtime="onnx")
+
+
+def test_warm_up_runs_dummy_frames():
+    calls = []
+    model_export.warm_up(lambda image, verbose=False: calls.append(image.shape), runs=2, imgsz=64)
+    assert calls == [(64, 64, 3), (64, 64, 3)]
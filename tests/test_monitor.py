@@ -0,0 +1,152 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import monitor
+from camera_health import CircuitOpenError
+from monitor import ContinuousMonitor, CpuBudget
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class FakeSubscription:
+    def __init__(self, hub, cam_id):
+        self.hub, self.cam_id = hub, cam_id
+        self.closed = False
+
+    def next_frame(self, timeout=5.0):
+        return np.full((8, 8, 3), self.cam_id, dtype=np.uint8)
+
+    def intact(self):
+        return True
+
+    def close(self):
+        self.closed = True
+
+
+class FakeHub:
+    def __init__(self, down=(), unknown=()):
+        self.down, self.unknown = set(down), set(unknown)
+        self.subscriptions = []
+
+    def subscribe(self, cam_id):
+        if cam_id in self.unknown:
+            raise KeyError(cam_id)
+        if cam_id in self.down:
+            raise CircuitOpenError(cam_id)
+        subscription = FakeSubscription(self, cam_id)
+        self.subscriptions.append(subscription)
+        return subscription
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_budget_is_paid_back_over_time(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(monitor.time, "monotonic", clock)
+    budget = CpuBudget(cpu_budget=0.5, burst_seconds=4)
+    assert budget.tokens == 2.0 and budget.available()
+    budget.spend(3.0)
+    assert not budget.available()
+    clock.now += 1.0  # Half a CPU-second back
+    assert not budget.available()
+    clock.now += 2.0
+    assert budget.available()
+    clock.now += 100
+    budget.available()
+    assert budget.tokens == 2.0  # Never more than the burst
+
+
+def start_monitor(hub, camera_ids, detect=None, **options):
+    results = []
+    detect = detect or (lambda cam_id, frame: ("result", cam_id))
+    mon = ContinuousMonitor(hub, camera_ids, detect, lambda cam_id, result: results.append((cam_id, result)),
+                            **options)
+    mon.start()
+    return mon, results
+
+
+def test_cameras_are_sampled_on_their_interval():
+    mon, results = start_monitor(FakeHub(), [1, 2], default_interval=0.05, cpu_budget=10)
+    try:
+        assert wait_until(lambda: {1, 2} <= {cam_id for cam_id, _ in results})
+        mon.configure(2, enabled=False)
+        time.sleep(0.1)
+        before = mon.status()["cameras"][2]["inferred"]
+        time.sleep(0.2)
+        status = mon.status()["cameras"]
+        assert status[2]["inferred"] == before and not status[2]["enabled"]
+        assert status[1]["inferred"] >= 3
+    finally:
+        mon.stop()
+    # Subscriptions are closed on stop
+    assert all(subscription.closed for subscription in mon.hub.subscriptions)
+
+
+def test_an_empty_budget_skips_samples_instead_of_queueing():
+    def slow_detect(cam_id, frame):
+        time.sleep(0.05)
+        return "result"
+
+    # 5% of a core can't pay for 50 ms every 20 ms
+    mon, results = start_monitor(FakeHub(), [1], detect=slow_detect, default_interval=0.02, cpu_budget=0.05)
+    try:
+        assert wait_until(lambda: mon.status()["cameras"][1]["skipped_budget"] >= 3)
+    finally:
+        mon.stop()
+    # The 0.25 s burst pays for about five samples, then only the refill does
+    assert mon.status()["cameras"][1]["inferred"] <= 8
+
+
+def test_busy_cameras_are_not_sampled_twice():
+    release = threading.Event()
+
+    def stuck_detect(cam_id, frame):
+        release.wait(2)
+        return "result"
+
+    mon, _ = start_monitor(FakeHub(), [1], detect=stuck_detect, default_interval=0.02, cpu_budget=10)
+    try:
+        assert wait_until(lambda: mon.status()["cameras"][1]["skipped_busy"] >= 2)
+        assert mon.status()["cameras"][1]["inferred"] == 0
+    finally:
+        release.set()
+        mon.stop()
+
+
+def test_unavailable_cameras_are_counted_not_waited_on():
+    mon, results = start_monitor(FakeHub(down={1}, unknown={2}), [1, 2, 3], default_interval=0.05, cpu_budget=10)
+    try:
+        assert wait_until(lambda: any(cam_id == 3 for cam_id, _ in results))
+        assert wait_until(lambda: mon.status()["cameras"][1]["circuit_open"] >= 1)
+        assert wait_until(lambda: mon.status()["cameras"][2]["no_frame"] >= 1)
+    finally:
+        mon.stop()
+    assert {cam_id for cam_id, _ in results} == {3}
+
+
+def test_registry_changes_reach_the_schedule():
+    mon, results = start_monitor(FakeHub(), [1], default_interval=0.05, cpu_budget=10)
+    try:
+        mon.sync_cameras([2])
+        assert wait_until(lambda: any(cam_id == 2 for cam_id, _ in results))
+        assert set(mon.status()["cameras"]) == {2}
+        with pytest.raises(KeyError):
+            mon.configure(1, interval=1)
+        with pytest.raises(ValueError):
+            mon.configure(2, interval=0)
+    finally:
+        mon.stop()
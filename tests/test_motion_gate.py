@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from motion_gate import DetectionGate, change_score, scene_signature
+
+
+class Result:
+    def __init__(self, frame):
+        self.orig_img = frame
+        self.boxes = ["box"]
+
+
+def scene(value=80, shape=(240, 320, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_small_changes_reuse_the_last_result():
+    gate = DetectionGate(threshold=0.02)
+    first = scene()
+    assert gate.check(1, first) is None  # Nothing to compare with yet
+    result = Result(first)
+    gate.remember(1, first, result)
+
+    frame = scene()
+    frame[0:4, 0:4] = 255  # A few pixels of noise
+    reused = gate.check(1, frame)
+    assert reused is not result and reused.boxes is result.boxes
+    # Re-attached to the new frame, the stored result is left alone
+    assert reused.orig_img is frame and result.orig_img is first
+    assert gate.stats()[1]["skipped"] == 1 and gate.stats()[1]["inferred"] == 1
+
+
+def test_a_changed_scene_goes_to_yolo():
+    gate = DetectionGate()
+    gate.remember(1, scene(), Result(scene()))
+    frame = scene()
+    frame[:, :160] = 200  # Half the view changed
+    assert gate.check(1, frame) is None
+    assert gate.stats()[1]["last_score"] > 0.4
+
+
+def test_cameras_are_gated_separately():
+    gate = DetectionGate()
+    gate.remember(1, scene(), Result(scene()))
+    assert gate.check(2, scene()) is None
+    # A resolution change can't be compared, so it runs YOLO
+    assert gate.check(1, scene(shape=(120, 160, 3))) is not None
+    assert scene_signature(scene(shape=(120, 160, 3))).shape == scene_signature(scene()).shape
+
+
+def test_old_references_expire():
+    gate = DetectionGate(max_age=60)
+    gate.remember(1, scene(), Result(scene()))
+    assert gate.check(1, scene()) is not None
+    gate.set_sensitivity(1, max_age=0)
+    assert gate.check(1, scene()) is None
+
+
+def test_sensitivity_is_per_camera():
+    gate = DetectionGate(threshold=0.5)
+    gate.set_sensitivity(2, threshold=0.0)
+    changed = scene()
+    changed[:40] = 200
+    for cam_id in (1, 2):
+        gate.remember(cam_id, scene(), Result(scene()))
+    assert gate.check(1, changed) is not None
+    assert gate.check(2, changed) is None
+    assert gate.sensitivity(2)["threshold"] == 0.0 and gate.sensitivity(1)["threshold"] == 0.5
+    with pytest.raises(ValueError):
+        gate.set_sensitivity(1, blur=3)
+
+
+def test_change_score_counts_pixels_over_the_delta():
+    a = np.zeros((10, 10), dtype=np.uint8)
+    b = a.copy()
+    b[:5] = 30
+    b[5:] = 10
+    assert change_score(b, a, pixel_delta=25) == 0.5
+    assert change_score(b, a, pixel_delta=5) == 1.0
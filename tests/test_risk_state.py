@@ -0,0 +1,60 @@
+import threading
+
+from risk_state import RiskStateStore, calculate_risk_level
+
+
+def test_risk_levels_follow_the_item_count():
+    assert calculate_risk_level(0) == ("Low Risk", "green")
+    assert calculate_risk_level(4) == ("Low Risk", "green")
+    assert calculate_risk_level(5) == ("Medium Risk", "orange")
+    assert calculate_risk_level(10) == ("High Risk", "red")
+
+
+def test_cameras_without_detections_have_no_data():
+    store = RiskStateStore()
+    assert store.get(1)["status"] == "No Data"
+    store.update(1, ["bottle"])
+    states = store.all([1, 2])
+    assert states[1]["status"] == "Low Risk" and states[2]["status"] == "No Data"
+
+
+def test_update_returns_only_what_changed():
+    store = RiskStateStore()
+    changes = store.update(1, ["bottle", "can", "bottle"])
+    assert changes["count"] == 3 and changes["classes"] == ["bottle", "can"] and changes["status"] == "Low Risk"
+    version = store.version
+
+    # Same detection again: nothing to push, version unchanged
+    assert store.update(1, ["can", "bottle", "bottle"]) == {}
+    assert store.version == version
+
+    changes = store.update(1, ["bottle"] * 6)
+    assert set(changes) == {"status", "color", "count", "classes", "updated_at"}
+    assert changes["status"] == "Medium Risk"
+    # Tracked items: the count of unique items can differ from the class list
+    assert store.update(1, ["bottle"], count=12)["status"] == "High Risk"
+    assert store.version == version + 2
+
+
+def test_readers_get_copies():
+    store = RiskStateStore()
+    store.update(1, ["bottle"])
+    state = store.get(1)
+    state["count"] = 99
+    assert store.get(1)["count"] == 1
+
+
+def test_concurrent_updates_are_all_counted():
+    store = RiskStateStore()
+
+    def update(cam_id):
+        for count in range(1, 101):
+            store.update(cam_id, [], count=count)
+
+    threads = [threading.Thread(target=update, args=(cam_id,)) for cam_id in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.version == 400
+    assert all(state["count"] == 100 for state in store.all(range(4)).values())
@@ -0,0 +1,102 @@
+import numpy as np
+
+from roi_inference import RoiDetector, merge_boxes, parse_roi, plan_regions
+
+
+class FakeBox:
+    def __init__(self, cls, conf, box):
+        self.cls, self.conf, self.xyxy = [cls], [conf], [list(box)]
+
+
+class FakeResult:
+    names = {0: "bottle", 1: "can"}
+
+    def __init__(self, boxes=()):
+        self.boxes = list(boxes)
+
+
+def test_parse_roi_accepts_one_or_many_polygons():
+    square = [[0, 0], [0.5, 0], [0.5, 0.5], [0, 0.5]]
+    assert parse_roi('[[0, 0], [0.5, 0], [0.5, 0.5], [0, 0.5]]') == [square]
+    assert parse_roi([square, [[0, 0], [1, 1]]]) == [square]
+    assert parse_roi("") is None and parse_roi("[]") is None
+
+
+def test_whole_frame_without_roi():
+    rects, polygons = plan_regions((480, 640, 3))
+    assert rects == [(0, 0, 640, 480)] and polygons is None
+
+
+def test_roi_crops_to_polygon_bounds_inside_the_frame():
+    rects, polygons = plan_regions((100, 200, 3), [[[0.5, 0.5], [1.5, 0.5], [1.5, 1.0], [0.5, 1.0]]])
+    assert rects == [(100, 50, 200, 100)]
+    assert len(polygons) == 1
+
+
+def test_tiles_cover_the_region_with_overlap():
+    rects, _ = plan_regions((500, 1000, 3), tile_size=400, overlap=0.25)
+    assert {r[2] - r[0] for r in rects} == {400} and {r[3] - r[1] for r in rects} == {400}
+    xs = sorted({(r[0], r[2]) for r in rects})
+    assert xs == [(0, 400), (300, 700), (600, 1000)]
+    assert sorted({(r[1], r[3]) for r in rects}) == [(0, 400), (100, 500)]
+
+
+def test_tiles_edge_to_edge_without_overlap():
+    rects, _ = plan_regions((400, 800, 3), tile_size=400, overlap=0)
+    assert rects == [(0, 0, 400, 400), (400, 0, 800, 400)]
+
+
+def test_unusable_roi_falls_back_to_the_whole_frame():
+    line = [[0.1, 0.1], [0.5, 0.5], [0.9, 0.9]]          # Zero area
+    outside = [[1.2, 1.2], [1.5, 1.2], [1.5, 1.5]]       # Off-frame
+    rects, polygons = plan_regions((100, 200, 3), [line, outside])
+    assert rects == [(0, 0, 200, 100)] and polygons is None
+
+    rects, polygons = plan_regions((400, 800, 3), [line], tile_size=400, overlap=0)
+    assert len(rects) == 2 and polygons is None
+
+
+def test_unusable_roi_still_detects(capsys):
+    seen = []
+
+    def detect_batch(crops):
+        seen.extend(crop.shape for crop in crops)
+        return [FakeResult([FakeBox(0, 0.9, (10, 10, 30, 30))]) for _ in crops]
+
+    config = {"roi": [[[0.1, 0.1], [0.5, 0.5], [0.9, 0.9]]], "tile_size": None, "tile_overlap": None}
+    detector = RoiDetector(detect_batch, lambda cam_id: config)
+    frame = np.zeros((100, 200, 3), dtype=np.uint8)
+    for _ in range(3):
+        result = detector.detect(1, frame)
+    assert seen == [(100, 200, 3)] * 3
+    assert len(result.boxes) == 1
+    # Reported once, not on every frame
+    assert capsys.readouterr().out.count("no usable area") == 1
+
+
+def test_roi_masks_and_shifts_boxes_back_to_the_frame():
+    def detect_batch(crops):
+        # One box inside the triangle, one in the masked-out corner of the bounding box
+        return [FakeResult([FakeBox(0, 0.9, (0, 40, 10, 50)), FakeBox(1, 0.8, (85, 5, 95, 15))]) for _ in crops]
+
+    # Triangle: its bounding box is the right half, its top-right corner is outside
+    config = {"roi": [[[0.5, 0], [0.5, 1], [1, 1]]], "tile_size": None, "tile_overlap": None}
+    detector = RoiDetector(detect_batch, lambda cam_id: config)
+    result = detector.detect(1, np.zeros((100, 200, 3), dtype=np.uint8))
+    assert [box.xyxy[0] for box in result.boxes] == [[100.0, 40.0, 110.0, 50.0]]
+    assert detector.metrics()[1]["outside_roi"] == 1
+    assert detector.metrics()[1]["pixel_ratio"] == 0.5
+
+
+def test_merge_folds_duplicates_and_tile_halves():
+    boxes = [
+        (0, 0.9, (0, 0, 100, 100)),
+        (0, 0.8, (5, 5, 100, 100)),      # Same item from an overlapping tile
+        (0, 0.7, (80, 10, 140, 90)),     # Overlaps little: a separate item
+        (0, 0.6, (90, 20, 130, 80)),     # Inside the previous one: folded into it
+        (1, 0.9, (0, 0, 100, 100)),      # Other class is kept
+    ]
+    merged = merge_boxes(boxes)
+    assert len(merged) == 3
+    assert (0, 0.7, (80, 10, 140, 90)) in merged
+    assert (1, 0.9, (0, 0, 100, 100)) in merged
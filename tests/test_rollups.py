@@ -0,0 +1,96 @@
+import datetime
+
+import pytest
+
+from detection_store import build_rows, bulk_insert
+from models import Camera, DetectionRollup
+from rollups import backfill, bucket_start, camera_zones, query_totals, query_trend, update_rollups
+
+DAY = datetime.datetime(2026, 1, 28)
+
+
+@pytest.fixture
+def db(sessions):
+    db = sessions()
+    yield db
+    db.close()
+
+
+def zones(camera_id):
+    return {1: 1, 2: 1, 5: 2}.get(camera_id, 0)
+
+
+def detections(hour, camera_id, *names, minute=10):
+    timestamp = DAY + datetime.timedelta(hours=hour, minutes=minute)
+    return build_rows([(name, 0.9) for name in names], "scheduler", camera_id=camera_id, timestamp=timestamp)
+
+
+def rollups(db, granularity):
+    return sorted((r.bucket_start.hour if granularity == "hour" else r.bucket_start.day, r.camera_id, r.zone,
+                   r.waste_type, r.severity, r.count)
+                  for r in db.query(DetectionRollup).filter(DetectionRollup.granularity == granularity))
+
+
+def test_buckets_start_on_the_hour_and_day():
+    t = datetime.datetime(2026, 1, 28, 16, 45, 12, 5)
+    assert bucket_start(t, "hour") == datetime.datetime(2026, 1, 28, 16)
+    assert bucket_start(t, "day") == datetime.datetime(2026, 1, 28)
+
+
+def test_updates_add_onto_existing_buckets(db):
+    update_rollups(db, detections(9, 1, "Plastic", "Can"), zones)
+    update_rollups(db, detections(9, 1, "Plastic", minute=50), zones)
+    update_rollups(db, detections(10, 5, "Plastic"), zones)
+    assert rollups(db, "hour") == [
+        (9, 1, 1, "Can", "Low", 1), (9, 1, 1, "Plastic", "Low", 2), (10, 5, 2, "Plastic", "Low", 1)]
+    assert rollups(db, "day") == [
+        (28, 1, 1, "Can", "Low", 1), (28, 1, 1, "Plastic", "Low", 2), (28, 5, 2, "Plastic", "Low", 1)]
+
+
+def test_uploads_roll_up_under_camera_zero(db):
+    rows = build_rows([("Bottle", 0.9)], "upload", timestamp=DAY)
+    update_rollups(db, rows, zones)
+    assert rollups(db, "day") == [(28, 0, 0, "Bottle", "Low", 1)]
+
+
+def test_backfill_rebuilds_the_rollups_from_raw_events(db):
+    rows = detections(9, 1, "Plastic", "Can") + detections(10, 2, "Plastic") + detections(33, 5, "Can")
+    bulk_insert(db, rows)
+    update_rollups(db, rows, zones)
+    incremental = (rollups(db, "hour"), rollups(db, "day"))
+
+    # Lost or stale rollups come back exactly as the incremental updates built them
+    db.query(DetectionRollup).update({"count": 99})
+    db.commit()
+    backfill(db, zones)
+    assert (rollups(db, "hour"), rollups(db, "day")) == incremental
+
+    # A partial rebuild only touches the days from `since` onwards
+    db.query(DetectionRollup).filter(DetectionRollup.camera_id == 1).update({"count": 7})
+    db.commit()
+    backfill(db, zones, since=DAY + datetime.timedelta(days=1))
+    assert (28, 1, "Plastic", 7) in {(r[0], r[1], r[3], r[5]) for r in rollups(db, "day")}
+    assert (29, 5, 2, "Can", "Low", 1) in rollups(db, "day")
+
+
+def test_trend_and_totals_read_the_rollups(db):
+    update_rollups(db, detections(9, 1, "Plastic", "Can") + detections(10, 5, *["Plastic"] * 6), zones)
+    assert sorted(query_trend(db, "hour", zone=1), key=lambda point: point["waste_type"]) == [
+        {"bucket": "2026-01-28T09:00:00", "waste_type": "Can", "count": 1},
+        {"bucket": "2026-01-28T09:00:00", "waste_type": "Plastic", "count": 1},
+    ]
+    assert query_trend(db, "day", camera_id=5) == [{"bucket": "2026-01-28T00:00:00", "waste_type": "Plastic",
+                                                    "count": 6}]
+    assert query_totals(db) == {"Low": 2, "Medium": 6}
+    assert query_totals(db, zone=2) == {"Medium": 6}
+    assert query_trend(db, "hour", since=DAY + datetime.timedelta(hours=10)) == [
+        {"bucket": "2026-01-28T10:00:00", "waste_type": "Plastic", "count": 6}]
+
+
+def test_command_line_zones_come_from_the_cameras_table(db):
+    db.add_all([Camera(id=1, name="Gate", location_id=3), Camera(id=6, name="Canal")])
+    db.commit()
+    zone_for = camera_zones(db)
+    assert zone_for(1) == 3
+    assert zone_for(6) == 2  # No location: four cameras per zone
+    assert zone_for(0) == 0 and zone_for(42) == 0
@@ -0,0 +1,84 @@
+import datetime
+import json
+import os
+
+import pytest
+
+from models import Snapshot
+from snapshot_catalog import parse_snapshot_filename, query_history, reconcile, record_snapshots
+
+
+@pytest.fixture
+def db(sessions):
+    db = sessions()
+    yield db
+    db.close()
+
+
+def touch(path, text=b"jpeg"):
+    path.write_bytes(text)
+    return path
+
+
+def test_filenames_give_camera_and_time():
+    assert parse_snapshot_filename("cam3_2026-01-28_16-00-00.jpg") == (3, datetime.datetime(2026, 1, 28, 16))
+    assert parse_snapshot_filename("detected_cam12_20260128_160500.jpg") == (12, datetime.datetime(2026, 1, 28, 16, 5))
+    assert parse_snapshot_filename("cam1_2026-13-40_16-00-00.jpg") == (None, None)
+    assert parse_snapshot_filename("upload.jpg") == (None, None)
+
+
+def test_reconcile_indexes_files_written_outside_the_app(db, tmp_path):
+    touch(tmp_path / "cam1_2026-01-28_16-00-00.jpg")
+    (tmp_path / "cam1_2026-01-28_16-00-00.json").write_text(
+        json.dumps({"v": 1, "size": [640, 480], "boxes": [["Plastic", 0.9, 0, 0, 1, 1]]}))
+    touch(tmp_path / "detected_cam2_20260128_170000.jpg")
+    (tmp_path / "detected_cam2_20260128_170000.txt").write_text("Bottle, Can")
+    touch(tmp_path / "photo.JPG")
+    touch(tmp_path / "notes.txt")
+
+    assert reconcile(db, str(tmp_path)) == {"added": 3, "removed": 0}
+    rows = {row.filename: row for row in db.query(Snapshot)}
+    assert set(rows) == {"cam1_2026-01-28_16-00-00.jpg", "detected_cam2_20260128_170000.jpg", "photo.JPG"}
+    assert rows["cam1_2026-01-28_16-00-00.jpg"].waste_detected == "Plastic"
+    assert json.loads(rows["cam1_2026-01-28_16-00-00.jpg"].boxes)["boxes"][0][0] == "Plastic"
+    assert rows["detected_cam2_20260128_170000.jpg"].camera_id == 2
+    assert rows["detected_cam2_20260128_170000.jpg"].waste_detected == "Bottle, Can"
+    # No name pattern and no sidecar: file time, unknown contents
+    assert rows["photo.JPG"].camera_id is None and rows["photo.JPG"].waste_detected == "Unknown"
+
+    # Running it again changes nothing
+    assert reconcile(db, str(tmp_path)) == {"added": 0, "removed": 0}
+
+
+def test_reconcile_drops_deleted_files_but_not_archived_ones(db, tmp_path):
+    kept = touch(tmp_path / "cam1_2026-01-28_16-00-00.jpg")
+    gone = touch(tmp_path / "cam1_2026-01-28_17-00-00.jpg")
+    reconcile(db, str(tmp_path))
+    db.add(Snapshot(filename="cam1_2026-01-01_08-00-00.jpg", camera_id=1, taken_at=datetime.datetime(2026, 1, 1, 8),
+                    tier="archived", archive="2026-01-01.zip", file_mtime=0))
+    db.commit()
+
+    os.remove(gone)
+    assert reconcile(db, str(tmp_path)) == {"added": 0, "removed": 1}
+    assert sorted(filename for (filename,) in db.query(Snapshot.filename)) == [
+        "cam1_2026-01-01_08-00-00.jpg", kept.name]
+
+
+def test_the_scan_overrides_what_reconcile_found(db, tmp_path):
+    path = touch(tmp_path / "cam1_2026-01-28_16-00-00.jpg")
+    reconcile(db, str(tmp_path))
+    boxes = {"v": 1, "size": [640, 480], "boxes": [["Can", 0.8, 0, 0, 1, 1]]}
+    record_snapshots(db, [{"img_path": str(path), "camera_id": 1, "taken_at": datetime.datetime(2026, 1, 28, 16),
+                           "waste_detected": "Can", "boxes": boxes}])
+    [row] = db.query(Snapshot).all()
+    assert row.waste_detected == "Can" and json.loads(row.boxes) == boxes
+
+
+def test_history_items_come_from_the_catalog(db, tmp_path):
+    path = touch(tmp_path / "cam2_2026-01-28_16-00-00.jpg")
+    record_snapshots(db, [{"img_path": str(path), "camera_id": 2, "taken_at": datetime.datetime(2026, 1, 28, 16),
+                           "waste_detected": "Plastic"}])
+    [item] = query_history(db)["items"]
+    assert item["cam_id"] == "2" and item["timestamp"] == "2026-01-28 16:00:00"
+    assert item["waste_detected"] == "Plastic"
+    assert item["image_url"].endswith(path.name)
@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+
+import numpy as np
+
+from roi_inference import MergedBox, MergedResult
+from snapshot_pipeline import grab_frames, infer_batches, run_snapshot_pipeline
+
+SHAPE = (48, 64, 3)
+
+
+def result_for(frame, found=True):
+    boxes = [MergedBox(0, 0.9, (8, 8, 32, 24), frame.shape)] if found else []
+    return MergedResult(boxes, {0: "Plastic"}, frame)
+
+
+class Cameras:
+    """grab_fn stand-in: each URL returns its frame after `delays[url]` seconds."""
+
+    def __init__(self, delays=None, failing=()):
+        self.delays = delays or {}
+        self.failing = set(failing)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, url):
+        with self.lock:
+            self.calls.append(url)
+        time.sleep(self.delays.get(url, 0))
+        if url in self.failing:
+            raise OSError("connection refused")
+        return None if url == "blank" else np.full(SHAPE, len(url), dtype=np.uint8)
+
+
+def test_cameras_are_grabbed_at_the_same_time():
+    cameras = [{"id": i, "url": f"cam{i}"} for i in range(1, 5)]
+    grab = Cameras({f"cam{i}": 0.2 for i in range(1, 5)})
+    start = time.perf_counter()
+    frames, report = grab_frames(cameras, grab, timeout=2)
+    assert time.perf_counter() - start < 0.6
+    assert sorted(frames) == [1, 2, 3, 4]
+    assert all(report[i]["grab"] >= 0.2 for i in frames)
+
+
+def test_a_stuck_camera_only_times_itself_out():
+    cameras = [{"id": 1, "url": "slow"}, {"id": 2, "url": "fast"}, {"id": 3, "url": "down"}, {"id": 4, "url": "blank"}]
+    grab = Cameras({"slow": 2}, failing={"down"})
+    start = time.perf_counter()
+    frames, report = grab_frames(cameras, grab, timeout=0.3)
+    assert time.perf_counter() - start < 1
+    assert list(frames) == [2]
+    assert report[1]["status"] == "timeout"
+    assert report[3]["status"] == "error: connection refused"
+    assert report[4]["status"] == "no frame"
+
+
+def test_cameras_on_one_stream_are_grabbed_once():
+    cameras = [{"id": 1, "url": "cam-a"}, {"id": 2, "url": "cam-a"}]
+    grab = Cameras()
+    frames, _ = grab_frames(cameras, grab, timeout=1)
+    assert grab.calls == ["cam-a"]
+    # Each camera gets its own array, so per-camera rotation can't affect the other
+    assert (frames[1] == frames[2]).all() and frames[1] is not frames[2]
+
+
+def test_inference_runs_in_batches_and_skips_failed_ones():
+    frames = {cam_id: np.zeros(SHAPE, dtype=np.uint8) for cam_id in range(1, 6)}
+    batches = []
+
+    def detect_batch(cam_ids, batch):
+        batches.append(list(cam_ids))
+        if 5 in cam_ids:
+            raise RuntimeError("model crashed")
+        return [result_for(frame) for frame in batch]
+
+    results, timings = infer_batches(frames, detect_batch, batch_size=2)
+    assert batches == [[1, 2], [3, 4], [5]]
+    assert sorted(results) == [1, 2, 3, 4] and sorted(timings) == [1, 2, 3, 4]
+
+
+def test_pipeline_writes_raw_frames_with_box_records(tmp_path):
+    cameras = [{"id": 1, "url": "cam-a"}, {"id": 2, "url": "cam-bb"}, {"id": 3, "url": "down"}]
+    saved = []
+
+    def detect_batch(cam_ids, frames):
+        return [result_for(frame, found=cam_id == 1) for cam_id, frame in zip(cam_ids, frames)]
+
+    report = run_snapshot_pipeline(cameras, detect_batch, Cameras(failing={"down"}), output_dir=str(tmp_path),
+                                   on_saved=saved.extend)
+    assert set(report["stages"]) == {"grab", "infer", "write", "total"}
+    assert report["cameras"][1]["status"] == "ok" and report["cameras"][1]["found"] == "Plastic"
+    assert report["cameras"][2]["found"] == "No Waste Detected"
+    assert report["cameras"][3]["status"].startswith("error")
+
+    assert sorted(entry["camera_id"] for entry in saved) == [1, 2]
+    entry = next(entry for entry in saved if entry["camera_id"] == 1)
+    assert entry["classes"] == ["Plastic"] and entry["detections"] == [("Plastic", 0.9)]
+    # Raw frame on disk, boxes in the JSON record next to it
+    with open(entry["img_path"][:-4] + ".json") as f:
+        record = json.load(f)
+    assert record == {"v": 1, "size": [64, 48], "boxes": [["Plastic", 0.9, 0.125, 0.1667, 0.5, 0.5]]}
+
+
+def test_gated_cameras_skip_inference(tmp_path):
+    class Gate:
+        def __init__(self):
+            self.remembered = []
+
+        def check(self, cam_id, frame):
+            return result_for(frame) if cam_id == 1 else None
+
+        def remember(self, cam_id, frame, result):
+            self.remembered.append(cam_id)
+
+    inferred, gate = [], Gate()
+
+    def detect_batch(cam_ids, frames):
+        inferred.extend(cam_ids)
+        return [result_for(frame) for frame in frames]
+
+    cameras = [{"id": 1, "url": "cam-a"}, {"id": 2, "url": "cam-b"}]
+    report = run_snapshot_pipeline(cameras, detect_batch, Cameras(), output_dir=str(tmp_path), gate=gate)
+    assert inferred == [2] and gate.remembered == [2]
+    assert report["cameras"][1]["gated"] and report["cameras"][1]["status"] == "ok"
@@ -0,0 +1,84 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import snapshot_render
+from roi_inference import MergedBox, MergedResult
+from snapshot_render import (RenderCache, detection_record, draw_boxes, parse_record, render_snapshot,
+                             waste_summary)
+
+FILENAME = "cam1_2026-01-28_16-00-00.jpg"
+RECORD = {"v": 1, "size": [640, 480], "boxes": [["Plastic", 0.9, 0.25, 0.25, 0.75, 0.75],
+                                               ["Can", 0.3, 0.0, 0.0, 0.1, 0.1]]}
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(snapshot_render, "render_cache", RenderCache())
+    os.makedirs("detected_snapshots")
+    cv2.imwrite(os.path.join("detected_snapshots", FILENAME), np.full((480, 640, 3), 40, dtype=np.uint8))
+    return FILENAME
+
+
+def decode(data):
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_records_hold_normalized_boxes():
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    result = MergedResult([MergedBox(0, 0.87654, (160, 120, 480, 360), frame.shape)], {0: "Plastic"}, frame)
+    record = detection_record(result, frame)
+    assert record == {"v": 1, "size": [640, 480], "boxes": [["Plastic", 0.877, 0.25, 0.25, 0.75, 0.75]]}
+    assert waste_summary(record) == "Plastic"
+    assert waste_summary(RECORD, min_conf=0.5) == "Plastic"
+    assert waste_summary({"boxes": []}) == "No Waste Detected"
+    assert parse_record('{"v": 1, "boxes": []}') == {"v": 1, "boxes": []}
+    assert parse_record("") is None and parse_record("not json") is None
+
+
+def test_boxes_are_drawn_at_any_size():
+    for width in (320, 1280):
+        image = np.zeros((width * 3 // 4, width, 3), dtype=np.uint8)
+        draw_boxes(image, RECORD, min_conf=0.5)
+        # The Plastic box edge is at a quarter of the width, whatever the size
+        assert image[width * 3 // 8, width // 4].any()
+        # The low-confidence Can box is filtered out
+        assert not image[width * 3 // 4 // 20, width // 20].any()
+
+
+def test_rendering_is_cached_per_size_and_threshold(snapshot):
+    data, etag = render_snapshot(snapshot, RECORD, width=320, min_conf=0.5)
+    assert decode(data).shape == (240, 320, 3)
+    assert render_snapshot(snapshot, RECORD, width=320, min_conf=0.5) == (data, etag)
+    assert snapshot_render.render_cache.metrics()["hits"] == 1
+
+    other, other_etag = render_snapshot(snapshot, RECORD, width=320, min_conf=0.1)
+    assert other_etag != etag
+    raw, raw_etag = render_snapshot(snapshot, RECORD, annotated=False)
+    assert decode(raw).shape == (480, 640, 3) and raw_etag not in (etag, other_etag)
+    # Unannotated image has no box pixels
+    assert decode(raw)[240, 160].max() < 60 and decode(data)[120, 80].max() > 60
+
+
+def test_bad_requests_are_rejected(snapshot):
+    with pytest.raises(ValueError):
+        render_snapshot(snapshot, RECORD, width=10)
+    with pytest.raises(ValueError):
+        render_snapshot(snapshot, RECORD, min_conf=2)
+    with pytest.raises(FileNotFoundError):
+        render_snapshot("cam1_2026-01-01_00-00-00.jpg", RECORD)
+
+
+def test_cache_is_bounded_by_bytes():
+    cache = RenderCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"  # "a" is now the most recently used
+    cache.put("c", b"1234")
+    assert cache.get("b") is None and cache.get("a") is not None
+    cache.put("huge", b"x" * 11)
+    assert cache.get("huge") is None
+    assert cache.metrics()["bytes"] == 8 and cache.metrics()["evictions"] == 1
@@ -0,0 +1,107 @@
+import datetime
+import json
+import os
+import zipfile
+
+import cv2
+import numpy as np
+import pytest
+
+import snapshot_storage
+from models import Snapshot, SnapshotClass
+from snapshot_catalog import record_snapshots
+from snapshot_storage import compact, load_image, read_snapshot, snapshot_stat, storage_stats
+
+NOW = datetime.datetime(2026, 2, 20, 12, 0)
+
+
+@pytest.fixture
+def db(sessions, tmp_path, monkeypatch):
+    # SNAPSHOT_DIR and ARCHIVE_DIR are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(snapshot_storage.SNAPSHOT_DIR)
+    db = sessions()
+    yield db
+    db.close()
+
+
+def add_snapshot(db, camera_id, days_ago, width=640, waste="Plastic"):
+    taken_at = NOW - datetime.timedelta(days=days_ago)
+    path = os.path.join(snapshot_storage.SNAPSHOT_DIR, f"cam{camera_id}_{taken_at:%Y-%m-%d_%H-%M-%S}.jpg")
+    cv2.imwrite(path, np.full((width * 3 // 4, width, 3), 120, dtype=np.uint8))
+    boxes = {"v": 1, "size": [width, width * 3 // 4], "boxes": [[waste, 0.9, 0.1, 0.1, 0.5, 0.5]]}
+    with open(path[:-4] + ".json", "w") as f:
+        json.dump(boxes, f)
+    record_snapshots(db, [{"img_path": path, "camera_id": camera_id, "taken_at": taken_at,
+                           "waste_detected": waste, "boxes": boxes}])
+    return os.path.basename(path)
+
+
+def row(db, filename):
+    return db.query(Snapshot).filter(Snapshot.filename == filename).one_or_none()
+
+
+def test_snapshots_move_through_the_tiers(db):
+    hot = add_snapshot(db, 1, 1)
+    warm = add_snapshot(db, 1, 4, width=1920)
+    old = [add_snapshot(db, 1, 10), add_snapshot(db, 2, 10)]
+
+    report = compact(db, now=NOW)
+    assert report == {"expired": 0, "reencoded": 3, "archived": 2, "archives_written": 1}
+
+    assert row(db, hot).tier == "hot" and os.path.exists(snapshot_storage.loose_path(hot)[:-4] + ".json")
+    assert row(db, warm).tier == "warm"
+    assert load_image(warm).shape[1] == snapshot_storage.WARM_WIDTH
+    assert not os.path.exists(snapshot_storage.loose_path(warm)[:-4] + ".json")
+
+    # Both cameras' snapshots of that day share one archive, with their boxes in its index
+    day = f"{NOW - datetime.timedelta(days=10):%Y-%m-%d}.zip"
+    with zipfile.ZipFile(os.path.join(snapshot_storage.ARCHIVE_DIR, day)) as archive:
+        assert sorted(archive.namelist()) == sorted(old + ["index.json"])
+        index = json.loads(archive.read("index.json"))
+    assert index[0]["boxes"]["boxes"][0][0] == "Plastic"
+    for filename in old:
+        assert row(db, filename).archive == day and row(db, filename).tier == "archived"
+        assert not os.path.exists(snapshot_storage.loose_path(filename))
+        # Reads find the snapshot inside the archive
+        assert read_snapshot(filename)[:2] == b"\xff\xd8"
+        assert snapshot_stat(filename)[1] == len(read_snapshot(filename))
+
+    # Nothing left to do on a second pass
+    assert compact(db, now=NOW) == {"expired": 0, "reencoded": 0, "archived": 0, "archives_written": 0}
+    stats = storage_stats()
+    assert stats["archives"] == 1 and stats["loose_files"] == 3  # Two JPEGs and the hot sidecar
+
+
+def test_retention_is_per_camera_and_reaches_into_archives(db):
+    kept = add_snapshot(db, 1, 20)
+    expired_loose = add_snapshot(db, 2, 6)
+    expired_archived = add_snapshot(db, 2, 20)
+    compact(db, now=NOW, retention_for=lambda camera_id: 30)
+    assert row(db, expired_archived).archive is not None
+
+    report = compact(db, now=NOW, retention_for=lambda camera_id: 5 if camera_id == 2 else None)
+    assert report["expired"] == 2
+    assert row(db, expired_loose) is None and row(db, expired_archived) is None
+    assert not os.path.exists(snapshot_storage.loose_path(expired_loose))
+    with pytest.raises(FileNotFoundError):
+        read_snapshot(expired_archived)
+    # Camera 1 shared that day's archive, which is rewritten without the expired snapshot
+    assert read_snapshot(kept)[:2] == b"\xff\xd8"
+    # The history class index follows
+    assert db.query(SnapshotClass).count() == 1
+
+
+def test_dry_run_only_counts(db):
+    filenames = [add_snapshot(db, 1, 4), add_snapshot(db, 1, 10), add_snapshot(db, 2, 200)]
+    report = compact(db, now=NOW, dry_run=True)
+    assert report["expired"] == 1 and report["archived"] == 2
+    assert all(row(db, filename).tier == "hot" and row(db, filename).archive is None for filename in filenames)
+    assert all(os.path.exists(snapshot_storage.loose_path(filename)) for filename in filenames)
+
+
+def test_missing_snapshots_raise(db):
+    with pytest.raises(FileNotFoundError):
+        snapshot_stat("cam1_2026-01-01_00-00-00.jpg")
+    with pytest.raises(FileNotFoundError):
+        read_snapshot("../../etc/passwd")
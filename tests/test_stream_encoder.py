@@ -0,0 +1,96 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import stream_encoder
+from camera_hub import CaptureHub, FlakyVideoSource
+from frame_ring import FrameBuffers
+from stream_encoder import CHUNK_HEADER, StreamEncoder, encode_chunk
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def decode(chunk):
+    assert chunk.startswith(CHUNK_HEADER) and chunk.endswith(b"\r\n")
+    return cv2.imdecode(np.frombuffer(chunk[len(CHUNK_HEADER):-2], dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+@pytest.fixture
+def hub():
+    hub = CaptureHub([{"id": 1, "url": "cam-a"}], source_factory=lambda url: FlakyVideoSource(fps=100),
+                     idle_timeout=5)
+    yield hub
+    hub.stop_all()
+
+
+@pytest.fixture
+def encoder(hub):
+    encoder = StreamEncoder(hub, rotation_for=lambda cam_id: 0)
+    yield encoder
+    encoder.stop_all()
+
+
+def test_chunk_is_a_rotated_resized_jpeg():
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    image = decode(encode_chunk(frame, size=(320, 240), rotation=90))
+    assert image.shape == (240, 320, 3)
+    # The clock is drawn in red
+    assert image[:, :, 2].max() > 100
+
+
+def test_reused_buffers_give_the_same_image_without_new_arrays():
+    frame = np.random.default_rng(1).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    buffers = FrameBuffers()
+    for _ in range(3):
+        reused = encode_chunk(frame, rotation=90, buffers=buffers)
+    assert buffers.allocations == 2
+    # Only the clock text may differ, and both end up the same size
+    assert decode(reused).shape == decode(encode_chunk(frame, rotation=90)).shape
+    # The hub frame itself is never written to
+    assert not np.shares_memory(buffers.buffers["resized"], frame)
+
+
+def test_viewers_of_a_variant_share_one_encode(hub, encoder, monkeypatch):
+    calls = []
+    original = stream_encoder.encode_chunk
+
+    def counting(*args, **kwargs):
+        calls.append(kwargs["size"])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(stream_encoder, "encode_chunk", counting)
+    with encoder.subscribe(1) as first, encoder.subscribe(1) as second, encoder.subscribe(1, "thumb") as thumb:
+        chunk = first.next_frame(timeout=3)
+        assert chunk is not None
+        # Same bytes object for every viewer of the variant
+        assert wait_until(lambda: second.next_frame(timeout=1) is encoder.feed(1).frame)
+        assert decode(thumb.next_frame(timeout=3)).shape == (240, 320, 3)
+        assert decode(chunk).shape == (480, 640, 3)
+    frames = hub.reader(1).seq
+    # At most one encode per camera frame and variant, whatever the number of viewers
+    assert calls.count((640, 480)) <= frames and calls.count((320, 240)) <= frames
+
+
+def test_encoding_stops_with_the_last_viewer(encoder):
+    with encoder.subscribe(1) as subscription:
+        assert subscription.next_frame(timeout=3) is not None
+        feed = encoder.feed(1)
+        assert feed.running
+    assert wait_until(lambda: not feed.running)
+    assert feed.frame is None
+
+
+def test_unknown_streams_are_rejected(encoder):
+    assert encoder.feed(1) is encoder.feed(1, "full")
+    assert encoder.feed(1, "thumb") is not encoder.feed(1)
+    with pytest.raises(KeyError):
+        encoder.feed(1, "huge")
+    with pytest.raises(KeyError):
+        encoder.feed(9)
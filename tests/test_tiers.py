@@ -0,0 +1,333 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import tiers
+from broker import LocalBroker
+from camera_health import CircuitOpenError
+from frame_ring import FrameRing
+from tiers import RingHub, SharedEventBus, SharedRiskStates, SharedTracks, run_capture_worker
+
+SHAPE = (8, 8, 3)
+CAMERAS = [{"id": 1, "url": "rtsp://cam1"}]
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class RingWriter:
+    """Stands in for a capture worker: writes numbered frames into a ring."""
+
+    def __init__(self, broker, cam_id=1, slots=4):
+        self.ring = FrameRing.create(SHAPE, slots)
+        self.count = 0
+        self.stop = threading.Event()
+        broker.table("rings")[cam_id] = self.ring.name
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stop.is_set():
+            self.count += 1
+            self.ring.put(np.full(SHAPE, self.count % 256, dtype=np.uint8))
+            time.sleep(0.002)
+
+    def close(self):
+        self.stop.set()
+        self.thread.join()
+        self.ring.close()
+
+
+@pytest.fixture
+def broker():
+    return LocalBroker()
+
+
+@pytest.fixture
+def hub(broker):
+    hub = RingHub(broker, CAMERAS, idle_timeout=0.2)
+    yield hub
+    hub.stop_all()
+
+
+def test_ring_hub_follows_the_capture_ring(broker, hub):
+    writer = RingWriter(broker)
+    try:
+        with hub.subscribe(1) as subscription:
+            seqs = []
+            for _ in range(5):
+                frame = subscription.next_frame(timeout=2)
+                assert frame is not None and frame.shape == SHAPE
+                seqs.append(subscription.last_seq)
+            # Every call returns a newer frame
+            assert seqs == sorted(set(seqs))
+            # Views are ring slots; they are overwritten once the ring wraps around
+            assert wait_until(lambda: not subscription.intact())
+    finally:
+        writer.close()
+
+
+def test_grab_returns_an_intact_copy(broker, hub):
+    writer = RingWriter(broker)
+    try:
+        frame = hub.grab("rtsp://cam1", timeout=2)
+        assert frame is not None and frame.shape == SHAPE
+        # The copy doesn't change when the slot it came from is reused
+        before = frame.copy()
+        time.sleep(0.05)
+        assert (frame == before).all()
+        assert len(set(frame.ravel().tolist())) == 1
+    finally:
+        writer.close()
+    with pytest.raises(KeyError):
+        hub.grab("rtsp://unknown")
+
+
+def test_frames_written_before_the_reader_attached_are_skipped(broker, hub):
+    ring = FrameRing.create(SHAPE, 4)
+    try:
+        ring.put(np.zeros(SHAPE, dtype=np.uint8))
+        broker.table("rings")[1] = ring.name
+        with hub.subscribe(1) as subscription:
+            # Left over from before the camera idled: not handed out
+            assert subscription.next_frame(timeout=0.3) is None
+            ring.put(np.full(SHAPE, 9, dtype=np.uint8))
+            frame = subscription.next_frame(timeout=2)
+            assert frame is not None and (frame == 9).all()
+    finally:
+        ring.close()
+
+
+def test_reading_a_camera_keeps_it_in_demand(broker, hub):
+    demand = broker.table("demand")
+    assert 1 not in demand
+    with hub.subscribe(1):
+        assert wait_until(lambda: 1 in demand)
+        assert time.time() - demand[1] < 2
+    # Readers stop after idle_timeout, and the entry goes stale
+    reader = hub.reader(1)
+    assert wait_until(lambda: not reader.running)
+
+
+def test_open_circuit_fails_fast(broker, hub):
+    broker.table("camera_health")[1] = {"circuit": "open", "last_error": "could not open stream"}
+    assert not hub.available(1)
+    with pytest.raises(CircuitOpenError):
+        hub.subscribe(1)
+    with pytest.raises(CircuitOpenError):
+        hub.grab("rtsp://cam1")
+
+
+def test_reset_goes_to_the_worker_that_owns_the_camera(broker, hub):
+    broker.table("camera_health")[1] = {"circuit": "open", "worker": 2}
+    hub.reset_health(1)
+    assert broker.queue("capture-2").get_nowait() == {"reset": 1}
+
+
+def test_capture_worker_connects_cameras_only_on_demand(broker, monkeypatch):
+    monkeypatch.setattr(tiers, "PUBLISH_SECONDS", 0.05)
+    monkeypatch.setattr(tiers, "DEMAND_TIMEOUT", 0.3)
+    url = "flaky://?fps=100"
+    broker.table("cameras")["list"] = [{"id": 1, "url": url}]
+    rings, health = broker.table("rings"), broker.table("camera_health")
+
+    stop = threading.Event()
+    worker = threading.Thread(target=run_capture_worker, args=(broker, 0, 1, stop), daemon=True)
+    worker.start()
+    hub = RingHub(broker, broker.table("cameras")["list"], idle_timeout=0.1)
+    try:
+        # Nobody is watching: no connection, no ring
+        assert wait_until(lambda: 1 in health)
+        time.sleep(0.2)
+        assert rings.get(1) is None and health[1]["idle"]
+
+        frame = hub.grab(url, timeout=3)
+        assert frame is not None and frame.shape == (480, 640, 3)
+        assert rings.get(1) is not None and health[1]["online"]
+
+        # Demand lapses once the hub's reader idles out, then the camera is closed
+        assert wait_until(lambda: rings.get(1) is None)
+        assert wait_until(lambda: health[1]["idle"] and not health[1]["online"])
+    finally:
+        hub.stop_all()
+        stop.set()
+        worker.join(5)
+    assert not worker.is_alive()
+
+
+def test_risk_states_are_shared_through_the_broker(broker):
+    scheduler, web = SharedRiskStates(broker), SharedRiskStates(broker)
+    changes = scheduler.update(1, ["bottle", "can", "bottle"])
+    assert changes["count"] == 3
+    assert web.get(1)["count"] == 3 and web.get(1)["classes"] == ["bottle", "can"]
+    states = web.all([1, 2])
+    assert states[1]["status"] == "Low Risk" and states[2]["status"] == "No Data"
+
+
+def test_tracks_are_shared_through_the_broker(broker):
+    class Tracker:
+        def items(self, cam_id):
+            return [{"id": 1, "class": "bottle"}]
+
+        def stats(self):
+            return {1: {"live_items": 1}, 2: {"live_items": 0}}
+
+    scheduler, web = SharedTracks(broker), SharedTracks(broker)
+    scheduler.publish(Tracker(), 1)
+    assert web.items(1) == [{"id": 1, "class": "bottle"}]
+    assert web.stats() == {1: {"live_items": 1}}
+    assert web.items(2) == []
+    scheduler.forget(1)
+    assert web.items(1) == [] and web.stats() == {}
+
+
+def test_events_reach_dashboards_in_other_processes(broker):
+    web = SharedEventBus(broker).follow()
+    scheduler = SharedEventBus(broker)
+    assert wait_until(lambda: len(broker.table("event_queues")) == 1)
+
+    async def receive():
+        stream = web.stream([("risk_snapshot", {})])
+        try:
+            assert (await stream.__anext__()).startswith("event: risk_snapshot")
+            scheduler.publish("risk", 1, {"count": 3})
+            return await asyncio.wait_for(stream.__anext__(), 3)
+        finally:
+            await stream.aclose()
+
+    try:
+        assert asyncio.run(receive()) == 'event: risk\ndata: {"key": 1, "count": 3}\n\n'
+    finally:
+        web.close()
+    assert broker.table("event_queues") == {}
+
+
+def test_web_processes_that_stop_checking_in_are_dropped(broker):
+    broker.table("event_queues")["events-gone"] = time.time() - 2 * tiers.EVENT_SUBSCRIBER_TIMEOUT
+    SharedEventBus(broker).publish("camera", 1, {"online": True})
+    assert broker.table("event_queues") == {}
+    assert broker.queue("events-gone").empty()
+
+
+# --- INFERENCE TIER ---
+class FakeBox:
+    def __init__(self, cls, conf, box):
+        self.cls, self.conf, self.xyxy = [cls], [conf], [list(box)]
+
+
+class FakeResult:
+    names = {0: "bottle"}
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class FakeModel:
+    """One box per image: class 0, confidence = the image's first pixel / 100, covering the image."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.batches = []
+
+    def __call__(self, frames, verbose=False):
+        self.batches.append(len(frames))
+        if self.error is not None:
+            raise self.error
+        return [FakeResult([FakeBox(0, frame.flat[0] / 100, (0, 0, frame.shape[1], frame.shape[0]))])
+                for frame in frames]
+
+
+@pytest.fixture
+def inference(broker):
+    """Starts an inference worker on `model` in a thread; yields a function that returns the client."""
+    stop = threading.Event()
+    threads, clients = [], []
+
+    def start(model, slots=4, run_worker=True):
+        client = tiers.InferenceClient(broker, slots=slots)
+        clients.append(client)
+        if run_worker:
+            start_worker(model)
+        return client
+
+    def start_worker(model):
+        thread = threading.Thread(target=tiers.run_inference_worker, args=(broker, stop, model), daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    start.worker = start_worker
+    yield start
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=2)
+    for client in clients:
+        client.close()
+
+
+def image(value, shape=SHAPE):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_inference_client_gets_the_boxes_of_its_frame(broker, inference):
+    client = inference(FakeModel())
+    result = client.predict(image(42), timeout=3)
+    assert result.names == {0: "bottle"}
+    [box] = result.boxes
+    assert box.cls == [0] and box.conf == [0.42]
+    assert box.xyxy == [[0.0, 0.0, 8.0, 8.0]] and box.xyxyn == [[0.0, 0.0, 1.0, 1.0]]
+    results = client.predict_many([image(v) for v in (1, 2, 3)], timeout=3)
+    assert [r.boxes[0].conf[0] for r in results] == [0.01, 0.02, 0.03]
+    assert wait_until(lambda: client.stats["images"] == 4)
+
+
+def test_requests_overwritten_in_the_ring_are_sent_again(broker, inference):
+    model = FakeModel()
+    # Six requests in a two-slot ring before any worker runs: the first four get overwritten
+    client = inference(model, slots=2, run_worker=False)
+    futures = [client.submit(image(v)) for v in range(1, 7)]
+    inference.worker(model)
+    assert [f.result(timeout=3).boxes[0].conf[0] for f in futures] == [0.01, 0.02, 0.03, 0.04, 0.05, 0.06]
+    assert wait_until(lambda: client.worker_stats and list(client.worker_stats.values())[0]["overwritten"] >= 4)
+
+
+def test_overwritten_requests_fail_after_the_retries(broker, inference, monkeypatch):
+    monkeypatch.setattr(tiers, "REQUEST_RETRIES", 0)
+    model = FakeModel()
+    client = inference(model, slots=2, run_worker=False)
+    futures = [client.submit(image(v)) for v in range(1, 4)]
+    inference.worker(model)
+    with pytest.raises(RuntimeError, match="overwritten"):
+        futures[0].result(timeout=3)
+    assert [f.result(timeout=3).boxes[0].conf[0] for f in futures[1:]] == [0.02, 0.03]
+
+
+def test_larger_frames_get_a_new_request_ring(broker, inference):
+    client = inference(FakeModel())
+    assert client.predict(image(5), timeout=3).boxes[0].xyxy == [[0.0, 0.0, 8.0, 8.0]]
+    first_ring = client.ring.name
+    # Higher resolution: the old ring is kept until close(), the new one fits the frame
+    result = client.predict(image(6, (16, 24, 3)), timeout=3)
+    assert result.boxes[0].xyxy == [[0.0, 0.0, 24.0, 16.0]]
+    assert client.ring.name != first_ring and [r.name for r in client.old_rings] == [first_ring]
+    # Smaller frames still fit the larger ring
+    assert client.predict(image(7), timeout=3).boxes[0].conf == [0.07]
+    assert len(client.old_rings) == 1
+
+
+def test_model_errors_reach_the_caller(broker, inference):
+    client = inference(FakeModel(error=RuntimeError("CUDA out of memory")))
+    with pytest.raises(RuntimeError, match="CUDA out of memory"):
+        client.predict(image(1), timeout=3)
+
+    async def predict():
+        return await client.predict_async(image(2))
+
+    with pytest.raises(RuntimeError, match="CUDA out of memory"):
+        asyncio.run(asyncio.wait_for(predict(), 3))
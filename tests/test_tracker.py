@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+
+import tracker
+from monitor import ContinuousMonitor
+from tracker import CameraTracker, MultiCameraTracker, iou
+
+BOX = (100.0, 80.0, 140.0, 120.0)
+
+
+class Box:
+    def __init__(self, cls, conf, xyxy):
+        self.cls, self.conf, self.xyxy = [cls], [conf], [xyxy]
+
+
+class Result:
+    names = {0: "bottle", 1: "can"}
+
+    def __init__(self, boxes=()):
+        self.boxes = list(boxes)
+
+
+def scene(box=BOX, seed=0):
+    """Textured background with one item, so template matching has something to lock on to."""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 60, (240, 320, 3), dtype=np.uint8)
+    x1, y1, x2, y2 = (int(v) for v in box)
+    item = np.random.default_rng(99).integers(120, 255, (y2 - y1, x2 - x1, 3), dtype=np.uint8)
+    frame[y1:y2, x1:x2] = item
+    return frame
+
+
+def shifted(box, dx):
+    return (box[0] + dx, box[1], box[2] + dx, box[3])
+
+
+def test_iou():
+    assert iou(BOX, BOX) == pytest.approx(1.0)
+    assert iou(BOX, shifted(BOX, 1000)) == 0.0
+    assert iou((0, 0, 10, 10), (5, 0, 15, 10)) == pytest.approx(1 / 3)
+
+
+def test_an_item_is_confirmed_by_its_second_detection():
+    camera = CameraTracker(iter(range(1, 100)))
+    frame = scene()
+    assert camera.update(frame, [("bottle", 0.8, BOX)], now=1.0) == []
+    assert camera.items() == []
+    confirmed = camera.update(frame, [("bottle", 0.9, shifted(BOX, 2))], now=2.0)
+    assert [track.id for track in confirmed] == [1]
+    assert [track.id for track in camera.items()] == [1]
+    # Seen again: the same item, not a new one
+    assert camera.update(frame, [("bottle", 0.9, shifted(BOX, 3))], now=3.0) == []
+    assert len(camera.tracks) == 1 and camera.stats["items_confirmed"] == 1
+
+
+def test_other_classes_start_their_own_tracks():
+    camera = CameraTracker(iter(range(1, 100)))
+    camera.update(scene(), [("bottle", 0.8, BOX)], now=1.0)
+    camera.update(scene(), [("can", 0.8, BOX)], now=2.0)
+    assert sorted(track.name for track in camera.tracks) == ["bottle", "can"]
+
+
+def test_following_moves_a_track_without_confirming_it():
+    camera = CameraTracker(iter(range(1, 100)))
+    camera.update(scene(), [("bottle", 0.8, BOX)], now=1.0)
+    track = camera.tracks[0]
+    for step in range(1, 5):
+        camera.follow(scene(shifted(BOX, 4 * step)), now=1.0 + step)
+        assert track.misses == 0
+    assert track.hits == 1 and not track.confirmed
+    assert track.box[0] > BOX[0] + 8  # It followed the item to the right
+    assert camera.items() == []
+
+    # The next detection pass confirms it, and reports it
+    confirmed = camera.update(scene(shifted(BOX, 20)), [("bottle", 0.9, shifted(BOX, 20))], now=6.0)
+    assert confirmed == [track]
+
+
+def test_tracks_that_lose_their_item_are_dropped():
+    camera = CameraTracker(iter(range(1, 100)))
+    camera.update(scene(), [("bottle", 0.8, BOX)], now=1.0)
+    empty = np.random.default_rng(5).integers(0, 60, (240, 320, 3), dtype=np.uint8)
+    for step in range(tracker.MAX_MISSES + 1):
+        camera.follow(empty, now=2.0 + step)
+    assert camera.tracks == []
+
+
+def test_needs_detection_every_n_samples():
+    cameras = MultiCameraTracker(detect_every=3)
+    assert cameras.needs_detection(1)
+    cameras.update(1, scene(), [("bottle", 0.8, BOX)])
+    assert not cameras.needs_detection(1)
+    # Every 3rd sample: detect, follow, follow, detect
+    cameras.follow(1, scene())
+    assert not cameras.needs_detection(1)
+    cameras.follow(1, scene())
+    assert cameras.needs_detection(1)
+
+
+class Subscription:
+    def __init__(self, frame):
+        self.frame = frame
+
+    def next_frame(self, timeout=None):
+        return self.frame
+
+    def intact(self):
+        return True
+
+
+def test_a_static_item_is_reported_once_by_the_monitor():
+    # 12 samples with YOLO every 5th: the item must come out of a detection pass exactly once
+    cameras = MultiCameraTracker(detect_every=5)
+    reported, detections = [], []
+
+    def detect(cam_id, frame):
+        detections.append(cam_id)
+        return Result([Box(0, 0.9, BOX)])
+
+    monitor = ContinuousMonitor(None, [1], detect, lambda cam_id, result, new_items: reported.extend(new_items),
+                                tracker=cameras)
+    subscription = Subscription(scene())
+    for _ in range(12):
+        monitor._sample(1, subscription)
+
+    assert len(detections) == 3
+    assert monitor.counters[1]["tracked"] == 9 and monitor.counters[1]["errors"] == 0
+    assert [item["class"] for item in reported] == ["bottle"]
+    assert [item["id"] for item in cameras.items(1)] == [reported[0]["id"]]
+
+
+def test_item_ids_are_unique_across_cameras_and_forget_drops_a_camera():
+    cameras = MultiCameraTracker()
+    for _ in range(2):
+        first = cameras.update(1, scene(), [("bottle", 0.9, BOX)])
+        second = cameras.update(2, scene(), [("bottle", 0.9, BOX)])
+    assert first[0]["id"] != second[0]["id"]
+    assert set(cameras.stats()) == {1, 2}
+    cameras.forget(1)
+    assert cameras.items(1) == [] and set(cameras.stats()) == {2}
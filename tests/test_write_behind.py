@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from write_behind import WriteBehindQueue
+
+
+class FakeSession:
+    def __init__(self, store):
+        self.store = store
+        self.pending = []
+
+    def commit(self):
+        self.store.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+def recorder(written, gate=None):
+    """A session factory plus write_fn that keep committed rows in `written`."""
+    def write(db, rows):
+        if gate is not None:
+            gate.wait()
+        db.pending.extend(rows)
+    return (lambda: FakeSession(written)), write
+
+
+def test_close_flushes_everything_queued():
+    written = []
+    session_factory, write = recorder(written)
+    # Long flush interval: without close() nothing would be written for a minute
+    wb = WriteBehindQueue(session_factory, write, batch_rows=50, flush_interval=60)
+    wb.put(list(range(120)))
+    wb.close(timeout=5)
+
+    assert sorted(written) == list(range(120))
+    assert not wb.thread.is_alive()
+    stats = wb.metrics()
+    assert stats["enqueued"] == 120 and stats["written"] == 120 and stats["dropped"] == 0
+
+
+def test_rows_are_written_in_batches():
+    written = []
+    session_factory, write = recorder(written)
+    wb = WriteBehindQueue(session_factory, write, batch_rows=10, flush_interval=0.01)
+    wb.put(list(range(35)))
+    deadline = time.monotonic() + 2
+    while len(written) < 35 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    wb.close()
+    assert written == list(range(35))
+    assert wb.metrics()["batches"] >= 4
+
+
+def test_put_drops_rows_when_the_queue_is_full():
+    gate = threading.Event()
+    written = []
+    session_factory, write = recorder(written, gate)
+    wb = WriteBehindQueue(session_factory, write, max_queued=5, batch_rows=1, flush_interval=0.01)
+    try:
+        accepted = wb.put(list(range(20)), timeout=0.01)
+        assert accepted < 20
+        assert wb.metrics()["dropped"] == 20 - accepted
+    finally:
+        gate.set()
+        wb.close(timeout=5)
+    assert sorted(written) == list(range(accepted))
+
+
+def test_put_after_close_is_an_error():
+    session_factory, write = recorder([])
+    wb = WriteBehindQueue(session_factory, write)
+    wb.close()
+    with pytest.raises(RuntimeError):
+        wb.put([1])
+
+
+def test_close_does_not_hang_when_the_queue_is_full_and_the_writer_is_stuck():
+    gate = threading.Event()
+    session_factory, write = recorder([], gate)
+    wb = WriteBehindQueue(session_factory, write, max_queued=3, batch_rows=1, flush_interval=0.01)
+    wb.put(list(range(10)), timeout=0.01)
+    assert wb.queue.full()
+
+    started = time.monotonic()
+    wb.close(timeout=0.2)
+    assert time.monotonic() - started < 1
+    assert wb.thread.is_alive()
+
+    # Once the database comes back the writer drains the queue and exits
+    gate.set()
+    wb.thread.join(5)
+    assert not wb.thread.is_alive()
+    assert wb.metrics()["queued"] == 0
+
+
+def test_failed_batches_are_retried_then_counted(monkeypatch):
+    monkeypatch.setattr("write_behind.time.sleep", lambda seconds: None)
+    attempts = []
+
+    def write(db, rows):
+        attempts.append(rows)
+        raise RuntimeError("database is down")
+
+    wb = WriteBehindQueue(lambda: FakeSession([]), write, flush_interval=0.01)
+    wb.put([1, 2])
+    wb.close(timeout=5)
+    assert len(attempts) == 3
+    assert wb.metrics()["failed"] == 2 and wb.metrics()["written"] == 0
@@ -0,0 +1,85 @@
+"""
+Server-side thumbnails for the snapshot gallery.
+
+Thumbnails are cached on disk in detected_snapshots/.thumbs/ and rebuilt
+whenever the source image is newer than its cached thumbnail. Sources are
+read through snapshot_storage, so archived snapshots get thumbnails too.
+Thumbnails nobody asked for in THUMB_MAX_AGE_DAYS are pruned by the
+nightly compaction.
+"""
+import os
+import tempfile
+import time
+
+import cv2
+
+from snapshot_render import draw_boxes
+from snapshot_storage import SNAPSHOT_DIR, load_image, snapshot_stat
+
+THUMB_DIR = os.path.join(SNAPSHOT_DIR, ".thumbs")
+THUMB_WIDTHS = (160, 320, 640)
+DEFAULT_WIDTH = 320
+THUMB_QUALITY = 70
+THUMB_MAX_AGE_DAYS = int(os.getenv("THUMB_MAX_AGE_DAYS", "7"))
+
+
+def thumbnail_etag(filename, width=DEFAULT_WIDTH):
+    """Changes whenever the source image changes, without touching the thumbnail."""
+    mtime, size = snapshot_stat(filename)
+    return f'"{int(mtime)}-{size}-{width}"'
+
+
+def get_thumbnail(filename, width=DEFAULT_WIDTH, record=None):
+    """
+    Returns the path of a JPEG thumbnail `width` pixels wide, creating or
+    refreshing it if needed, with the boxes of `record` (the snapshot's box
+    record) drawn in. Raises FileNotFoundError for unknown snapshots.
+    """
+    if width not in THUMB_WIDTHS:
+        raise ValueError(f"width must be one of {THUMB_WIDTHS}")
+
+    src_mtime, _ = snapshot_stat(filename)
+
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    thumb_path = os.path.join(THUMB_DIR, f"{stem}_{width}.jpg")
+    if os.path.exists(thumb_path) and os.path.getmtime(thumb_path) >= src_mtime:
+        # Touch the access time so pruning keeps thumbnails that are in use
+        os.utime(thumb_path, (time.time(), os.path.getmtime(thumb_path)))
+        return thumb_path
+
+    image = load_image(filename)
+    height = max(1, round(image.shape[0] * width / image.shape[1]))
+    thumb = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    draw_boxes(thumb, record)
+
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    ok, buffer = cv2.imencode(".jpg", thumb, [int(cv2.IMWRITE_JPEG_QUALITY), THUMB_QUALITY])
+    if not ok:
+        raise ValueError(f"Could not encode thumbnail for {filename}")
+    # Write to a temp file of our own first, so a half-written thumbnail is never served
+    # and concurrent requests for the same thumbnail don't move each other's file away
+    fd, tmp_path = tempfile.mkstemp(dir=THUMB_DIR, prefix=f"{stem}_{width}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(buffer.tobytes())
+        os.replace(tmp_path, thumb_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return thumb_path
+
+
+def prune_thumbnails(max_age_days=THUMB_MAX_AGE_DAYS):
+    """Deletes cached thumbnails not served for `max_age_days`. Returns how many."""
+    if not os.path.isdir(THUMB_DIR):
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    with os.scandir(THUMB_DIR) as it:
+        for entry in it:
+            if entry.is_file() and entry.stat().st_atime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+    if removed:
+        print(f"🧹 Pruned {removed} unused thumbnails")
+    return removed
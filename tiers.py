@@ -0,0 +1,625 @@
+"""
+Worker tiers of the multi-process mode, and the adapters the web and
+scheduler processes use to reach them (see supervisor.py).
+
+  capture    run_capture_worker connects the cameras assigned to it while
+             some process reads them (a CaptureHub as in single-process
+             mode) and publishes each camera's frame ring name and health
+             to the broker
+  inference  run_inference_worker owns one model and answers detection jobs
+             from the broker's "inference" queue in micro-batches
+
+  RingHub         CaptureHub look-alike that reads frames from the capture
+                  tier's shared-memory rings
+  InferenceClient InferenceEngine look-alike that sends frames to the
+                  inference tier through this process's own request ring
+
+  SharedRiskStates, SharedTracks and SharedEventBus carry the dashboard
+  state (risk per camera, tracked items, SSE events) from the scheduler
+  and capture processes, which produce it, to the web processes.
+
+Only ring names and sequence numbers cross the broker; pixels stay in
+shared memory.
+"""
+import asyncio
+import itertools
+import os
+import queue
+import signal
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+from broker import connect
+from camera_health import CircuitOpenError
+from camera_hub import IDLE_TIMEOUT, CaptureHub, FrameBroadcaster, open_source
+from event_bus import EventBus
+from frame_ring import FrameRing
+from risk_state import RiskStateStore
+from roi_inference import MergedBox, MergedResult
+
+PUBLISH_SECONDS = 1.0
+# Ring readers refresh their camera's entry in the broker's "demand" table every
+# PUBLISH_SECONDS; the capture tier releases a camera nobody refreshed for this long
+DEMAND_TIMEOUT = 3 * PUBLISH_SECONDS
+# How often ring readers look for a new frame
+RING_POLL_SECONDS = 0.005
+# Slots of a process's request ring; a job whose slot was reused before the
+# worker got to it is sent again
+REQUEST_SLOTS = int(os.getenv("INFERENCE_REQUEST_SLOTS", "32"))
+REQUEST_RETRIES = 3
+MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "8"))
+# A web process that hasn't checked in for this long is gone, its event queue is dropped
+EVENT_SUBSCRIBER_TIMEOUT = 30.0
+
+
+def _stop_on_sigterm(stop):
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+
+
+# --- CAPTURE TIER ---
+def _worker_for(camera, count):
+    # By stream, so cameras sharing a stream share one reader
+    return zlib.crc32((camera.get("source") or camera["url"]).encode()) % count
+
+
+def run_capture_worker(broker, index=0, count=1, stop=None, source_factory=open_source):
+    """
+    Connects this worker's share of the cameras (from the broker's "cameras"
+    table) while they are in demand and publishes their ring names and
+    health once a second.
+    """
+    stop = stop or threading.Event()
+    cameras_table = broker.table("cameras")
+    demand = broker.table("demand")
+    rings = broker.table("rings")
+    health = broker.table("camera_health")
+    commands = broker.queue(f"capture-{index}")
+
+    # Camera up/down events go straight to the dashboards in the web processes
+    events = SharedEventBus(broker)
+    # No idle timeout of its own: the ring readers already waited IDLE_TIMEOUT before their demand lapsed
+    hub = CaptureHub([], source_factory=source_factory, idle_timeout=0,
+                     on_status=lambda cam_id, online: events.publish("camera", cam_id, {"online": online}))
+    subscriptions = {}  # cam_id -> (source, Subscription)
+    cameras = None
+    print(f"📷 Capture worker {index + 1}/{count} started")
+    try:
+        while not stop.is_set():
+            mine = [cam for cam in cameras_table.get("list", []) if _worker_for(cam, count) == index]
+            if mine != cameras:
+                cameras = mine
+                hub.update(cameras)
+                for cam_id, (source, subscription) in list(subscriptions.items()):
+                    if hub.source(cam_id) != source:
+                        subscription.close()
+                        del subscriptions[cam_id]
+                        rings.pop(cam_id, None)
+                        health.pop(cam_id, None)
+
+            now, wanted_at = time.time(), demand.copy()
+            for cam in cameras:
+                cam_id = cam["id"]
+                wanted = now - wanted_at.get(cam_id, 0.0) < DEMAND_TIMEOUT
+                if wanted and cam_id not in subscriptions:
+                    try:
+                        # Holding a subscription keeps the reader (and its ring) running
+                        subscriptions[cam_id] = (hub.source(cam_id), hub.subscribe(cam_id))
+                    except CircuitOpenError:
+                        pass
+                elif not wanted and cam_id in subscriptions:
+                    # Nobody reads this camera any more, let its reader close
+                    subscriptions.pop(cam_id)[1].close()
+                reader = hub.reader(cam_id)
+                # A closed reader keeps its ring, but nothing new is written to it
+                ring = reader.ring if reader.running else None
+                rings[cam_id] = ring.name if ring is not None else None
+                health[cam_id] = {**hub.health(cam_id), "worker": index}
+
+            while True:
+                try:
+                    command = commands.get_nowait()
+                except queue.Empty:
+                    break
+                if command.get("reset") in hub.urls:
+                    hub.reset_health(command["reset"])
+
+            stop.wait(PUBLISH_SECONDS)
+    finally:
+        for _, subscription in subscriptions.values():
+            subscription.close()
+        hub.stop_all()
+        for cam in cameras or []:
+            rings.pop(cam["id"], None)
+
+
+class RingReader(FrameBroadcaster):
+    """
+    Follows one camera's ring (written by the capture tier) and publishes
+    each new frame as a view; subscribers check `subscription.intact()`
+    after use, as with CameraReader. While it runs it keeps the camera in
+    demand, so the capture tier keeps it connected.
+    """
+
+    ring_backed = True
+
+    def __init__(self, hub, cam_id, idle_timeout=IDLE_TIMEOUT):
+        super().__init__(idle_timeout)
+        self.hub = hub
+        self.cam_id = cam_id
+        self.thread_name = f"ring-cam{cam_id}"
+
+    def _produce(self, generation):
+        ring, name, last_seq = None, None, 0
+        next_lookup = 0.0
+        try:
+            while self._keep_running(generation):
+                if time.monotonic() >= next_lookup:
+                    self.hub.demand[self.cam_id] = time.time()
+                    # The ring name only changes when the capture tier (re)opens the camera,
+                    # or reconnects at another resolution
+                    wanted = self.hub.ring_name(self.cam_id)
+                    if wanted != name:
+                        if ring is not None:
+                            ring.close()
+                        ring, name, last_seq = None, wanted, 0
+                        if wanted:
+                            try:
+                                ring = FrameRing.attach(wanted)
+                                # Frames already in the ring may be from before the camera was idle
+                                last_seq = ring.head
+                            except FileNotFoundError:
+                                name = None
+                    # Until the capture tier has the camera open, look again soon
+                    next_lookup = time.monotonic() + (PUBLISH_SECONDS if ring is not None else 0.1)
+
+                if ring is not None:
+                    seq = ring.head
+                    if seq != last_seq and self._publish_ring_frame(ring, seq):
+                        last_seq = seq
+                        continue
+                time.sleep(RING_POLL_SECONDS)
+        finally:
+            if ring is not None:
+                ring.close()
+
+
+class RingHub:
+    """
+    CaptureHub interface for processes without camera connections: frames
+    come from the capture tier's rings, health from the broker.
+    """
+
+    def __init__(self, broker, cameras, idle_timeout=IDLE_TIMEOUT, on_status=None):
+        self.broker = broker
+        self.rings = broker.table("rings")
+        self.demand = broker.table("demand")
+        self.health_table = broker.table("camera_health")
+        self.idle_timeout = idle_timeout
+        # Camera up/down events are published by the capture tier's own hub
+        self.on_status = on_status
+        self.lock = threading.Lock()
+        self.urls = {}
+        self.readers = {}
+        self.update(cameras)
+
+    def update(self, cameras):
+        with self.lock:
+            self.urls = {cam["id"]: cam.get("source") or cam["url"] for cam in cameras}
+            stale = [cam_id for cam_id in self.readers if cam_id not in self.urls]
+            readers = [self.readers.pop(cam_id) for cam_id in stale]
+        for reader in readers:
+            reader.stop()
+
+    def source(self, cam_id):
+        return self.urls.get(cam_id)
+
+    def ring_name(self, cam_id):
+        return self.rings.get(cam_id)
+
+    def reader(self, cam_id):
+        with self.lock:
+            if cam_id not in self.urls:
+                raise KeyError(cam_id)
+            if cam_id not in self.readers:
+                self.readers[cam_id] = RingReader(self, cam_id, self.idle_timeout)
+            return self.readers[cam_id]
+
+    def _check(self, cam_id):
+        health = self.health_table.get(cam_id) or {}
+        if health.get("circuit") == "open":
+            raise CircuitOpenError(f"camera {cam_id} is down ({health.get('last_error')})")
+
+    def subscribe(self, cam_id):
+        reader = self.reader(cam_id)
+        self._check(cam_id)
+        return reader.subscribe()
+
+    def available(self, cam_id):
+        return (self.health_table.get(cam_id) or {}).get("circuit") != "open"
+
+    def health(self, cam_id):
+        if cam_id not in self.urls:
+            raise KeyError(cam_id)
+        return self.health_table.get(cam_id) or {"online": False, "circuit": "closed", "idle": True}
+
+    def reset_health(self, cam_id):
+        # Only the capture worker that owns the camera can reset it
+        worker = (self.health_table.get(cam_id) or {}).get("worker")
+        if worker is not None:
+            self.broker.queue(f"capture-{worker}").put({"reset": cam_id})
+
+    def grab(self, url, timeout=5.0):
+        """Copy of the newest frame of a stream, or None (see CaptureHub.grab)."""
+        with self.lock:
+            cam_id = next((c for c, u in self.urls.items() if u == url), None)
+        if cam_id is None:
+            raise KeyError(url)
+        self._check(cam_id)
+        deadline = time.monotonic() + timeout
+        with self.subscribe(cam_id) as subscription:
+            while time.monotonic() < deadline:
+                frame = subscription.next_frame(timeout=max(0.0, deadline - time.monotonic()))
+                if frame is None:
+                    break
+                frame = frame.copy()
+                # Skip a frame the capture tier overwrote while it was copied
+                if subscription.intact():
+                    return frame
+        return None
+
+    def stop_all(self):
+        with self.lock:
+            readers = list(self.readers.values())
+        for reader in readers:
+            reader.stop()
+
+
+# --- INFERENCE TIER ---
+def _boxes(result):
+    return [(int(box.cls[0]), float(box.conf[0]), tuple(float(v) for v in box.xyxy[0])) for box in result.boxes]
+
+
+def run_inference_worker(broker, stop=None, model=None, max_batch=MAX_BATCH):
+    """
+    Answers detection jobs ({"id", "reply", "ring", "seq"}) with the boxes
+    found in that ring slot, several jobs per forward pass.
+    """
+    stop = stop or threading.Event()
+    if model is None:
+        from inference import load_model
+        model = load_model()
+    jobs = broker.queue("inference")
+    worker_stats = broker.table("inference_workers")
+    rings, replies = {}, {}
+    stats = {"images": 0, "batches": 0, "busy_seconds": 0.0, "overwritten": 0}
+    print(f"🧠 Inference worker {os.getpid()} ready")
+
+    def reply(job, message):
+        if job["reply"] not in replies:
+            replies[job["reply"]] = broker.queue(job["reply"])
+        replies[job["reply"]].put({"id": job["id"], **message})
+
+    def ring_for(name):
+        if name not in rings:
+            if len(rings) > 64:
+                for ring in rings.values():
+                    ring.close()
+                rings.clear()
+            rings[name] = FrameRing.attach(name)
+        return rings[name]
+
+    while not stop.is_set():
+        try:
+            batch = [jobs.get(timeout=0.5)]
+        except queue.Empty:
+            continue
+        while len(batch) < max_batch:
+            try:
+                batch.append(jobs.get_nowait())
+            except queue.Empty:
+                break
+
+        ready = []
+        for job in batch:
+            try:
+                ring = ring_for(job["ring"])
+            except FileNotFoundError:
+                reply(job, {"error": "request ring is gone"})
+                continue
+            frame = ring.get(job["seq"])
+            if frame is None:
+                stats["overwritten"] += 1
+                reply(job, {"overwritten": True})
+                continue
+            ready.append((job, ring, frame))
+        if not ready:
+            continue
+
+        start = time.perf_counter()
+        try:
+            results = model([frame for _, _, frame in ready], verbose=False)
+        except Exception as e:
+            for job, _, _ in ready:
+                reply(job, {"error": str(e)})
+            continue
+        stats["images"] += len(ready)
+        stats["batches"] += 1
+        stats["busy_seconds"] += time.perf_counter() - start
+
+        for (job, ring, _), result in zip(ready, results):
+            if not ring.valid(job["seq"]):
+                # The slot was rewritten while the model read it
+                stats["overwritten"] += 1
+                reply(job, {"overwritten": True})
+            else:
+                reply(job, {"boxes": _boxes(result), "names": result.names})
+        worker_stats[os.getpid()] = dict(stats)
+
+
+class InferenceClient:
+    """
+    InferenceEngine interface for processes without a model. Frames are
+    copied into this process's request ring, the job goes to the inference
+    tier, and the boxes come back as a YOLO-like MergedResult.
+    """
+
+    def __init__(self, broker, slots=REQUEST_SLOTS):
+        self.broker = broker
+        self.slots = slots
+        self.jobs = broker.queue("inference")
+        # qsize() of the shared job queue, for /api/inference_stats
+        self.requests = self.jobs
+        self.worker_stats = broker.table("inference_workers")
+        self.reply_name = f"replies-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.replies = broker.queue(self.reply_name)
+
+        self.lock = threading.Lock()
+        self.ring = None
+        self.old_rings = []
+        self.pending = {}  # request id -> (future, frame, attempts)
+        self.ids = itertools.count(1)
+        self.thread = None
+
+    @property
+    def stats(self):
+        """Totals of every inference worker."""
+        totals = {"images": 0, "batches": 0, "busy_seconds": 0.0}
+        for stats in list(self.worker_stats.values()):
+            for key in totals:
+                totals[key] += stats.get(key, 0)
+        return totals
+
+    def warm_start(self):
+        self._ensure_listener()
+
+    def start(self):
+        self._ensure_listener()
+        return self
+
+    def _ensure_listener(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._listen, name="inference-replies", daemon=True)
+                self.thread.start()
+
+    def _send(self, request_id, frame):
+        with self.lock:
+            if self.ring is None or not self.ring.fits(frame.shape):
+                # Earlier rings may still hold queued jobs, they are closed with the client
+                if self.ring is not None:
+                    self.old_rings.append(self.ring)
+                self.ring = FrameRing.create(frame.shape, self.slots)
+            seq = self.ring.put(frame)
+            name = self.ring.name
+        self.jobs.put({"id": request_id, "reply": self.reply_name, "ring": name, "seq": seq})
+
+    def submit(self, image):
+        """Queues one image (numpy BGR frame or PIL image). Returns a Future of its result."""
+        if not isinstance(image, np.ndarray):
+            image = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+        self._ensure_listener()
+        future = Future()
+        request_id = next(self.ids)
+        with self.lock:
+            self.pending[request_id] = (future, image, 0)
+        self._send(request_id, image)
+        return future
+
+    def predict(self, image, timeout=None):
+        return self.submit(image).result(timeout)
+
+    def predict_many(self, images, timeout=None):
+        futures = [self.submit(image) for image in images]
+        return [future.result(timeout) for future in futures]
+
+    async def predict_async(self, image):
+        return await asyncio.wrap_future(self.submit(image))
+
+    def _listen(self):
+        while True:
+            reply = self.replies.get()
+            with self.lock:
+                entry = self.pending.pop(reply["id"], None)
+            if entry is None:
+                continue
+            future, frame, attempts = entry
+            if reply.get("overwritten") and attempts < REQUEST_RETRIES:
+                with self.lock:
+                    self.pending[reply["id"]] = (future, frame, attempts + 1)
+                self._send(reply["id"], frame)
+            elif reply.get("overwritten") or reply.get("error"):
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(RuntimeError(reply.get("error") or "request slot was overwritten"))
+            elif future.set_running_or_notify_cancel():
+                boxes = [MergedBox(cls, conf, box, frame.shape) for cls, conf, box in reply["boxes"]]
+                future.set_result(MergedResult(boxes, reply["names"], frame))
+
+    def close(self):
+        with self.lock:
+            rings = self.old_rings + ([self.ring] if self.ring is not None else [])
+            self.ring, self.old_rings = None, []
+        for ring in rings:
+            ring.close()
+
+
+# --- DASHBOARD STATE (scheduler and capture -> web) ---
+class SharedRiskStates(RiskStateStore):
+    """
+    RiskStateStore mirrored into the broker's "risk" table: the scheduler
+    process updates it, every process reads the table.
+    """
+
+    def __init__(self, broker):
+        super().__init__()
+        self.table = broker.table("risk")
+
+    def update(self, cam_id, classes, count=None):
+        changes = super().update(cam_id, classes, count)
+        with self.lock:
+            state = dict(self.states[cam_id])
+        self.table[cam_id] = state
+        return changes
+
+    def get(self, cam_id):
+        # Cameras without detections get 'No Data' from the local (empty) store
+        return dict(self.table.get(cam_id) or super().get(cam_id))
+
+    def all(self, cam_ids):
+        states, local = self.table.copy(), super().all(cam_ids)
+        return {cam_id: dict(states.get(cam_id) or local[cam_id]) for cam_id in cam_ids}
+
+
+class SharedTracks:
+    """
+    MultiCameraTracker read interface (items, stats) over the broker's
+    "tracks" table, which the scheduler process fills after each
+    monitoring sample.
+    """
+
+    def __init__(self, broker):
+        self.table = broker.table("tracks")
+
+    def publish(self, tracker, cam_id):
+        self.table[cam_id] = {"items": tracker.items(cam_id), "stats": tracker.stats().get(cam_id)}
+
+    def forget(self, cam_id):
+        self.table.pop(cam_id, None)
+
+    def items(self, cam_id):
+        return (self.table.get(cam_id) or {}).get("items", [])
+
+    def stats(self):
+        return {cam_id: entry["stats"] for cam_id, entry in self.table.copy().items() if entry.get("stats")}
+
+
+class SharedEventBus(EventBus):
+    """
+    EventBus whose events also reach the dashboards connected to other
+    processes: publish() puts each event on the broker queue of every web
+    process, and a web process runs follow() to feed its queue to its own
+    clients.
+    """
+
+    def __init__(self, broker):
+        super().__init__()
+        self.broker = broker
+        # queue name -> time.time() of the web process's last check-in
+        self.subscribers = broker.table("event_queues")
+        self.queues = {}
+        self.stop = threading.Event()
+        self.thread = None
+
+    def publish(self, kind, key, data):
+        super().publish(kind, key, data)
+        if not data:
+            return
+        now = time.time()
+        for name, seen in list(self.subscribers.items()):
+            if now - seen > EVENT_SUBSCRIBER_TIMEOUT:
+                self.subscribers.pop(name, None)
+                with self.lock:
+                    self.queues.pop(name, None)
+                continue
+            with self.lock:
+                if name not in self.queues:
+                    self.queues[name] = self.broker.queue(name)
+                events = self.queues[name]
+            events.put((kind, key, data))
+
+    def follow(self):
+        """Starts passing events published by other processes to this process's clients."""
+        with self.lock:
+            if self.thread is None:
+                name = f"events-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+                self.thread = threading.Thread(target=self._follow, args=(name,), name="event-follower",
+                                               daemon=True)
+                self.thread.start()
+        return self
+
+    def _follow(self, name):
+        events = self.broker.queue(name)
+        next_checkin = 0.0
+        try:
+            while not self.stop.is_set():
+                if time.monotonic() >= next_checkin:
+                    next_checkin = time.monotonic() + EVENT_SUBSCRIBER_TIMEOUT / 3
+                    self.subscribers[name] = time.time()
+                try:
+                    kind, key, data = events.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                # Local clients only, the publisher already reached the other processes
+                EventBus.publish(self, kind, key, data)
+        finally:
+            self.subscribers.pop(name, None)
+
+    def close(self):
+        self.stop.set()
+        if self.thread is not None:
+            self.thread.join(2)
+
+
+# --- PROCESS ENTRY POINTS (started by supervisor.py) ---
+def capture_main(index, count, address):
+    stop = threading.Event()
+    _stop_on_sigterm(stop)
+    try:
+        run_capture_worker(connect(address), index, count, stop)
+    except KeyboardInterrupt:
+        pass
+
+
+def inference_main(address, threads):
+    # Before the model runtime is imported, so each worker stays on its share of the cores
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    stop = threading.Event()
+    _stop_on_sigterm(stop)
+    try:
+        run_inference_worker(connect(address), stop)
+    except KeyboardInterrupt:
+        pass
+
+
+def scheduler_main(address):
+    """Scheduled jobs and continuous monitoring: main.py without the web server."""
+    os.environ["LITTERLENS_ROLE"] = "scheduler"
+    os.environ["BROKER_ADDRESS"] = address
+    import main
+
+    stop = threading.Event()
+    _stop_on_sigterm(stop)
+    main.startup_event()
+    main.publish_cameras()
+    try:
+        while not stop.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        asyncio.run(main.shutdown_event())
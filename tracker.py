@@ -0,0 +1,312 @@
+"""
+Lightweight multi-object tracking per camera (CPU only).
+
+Boxes from consecutive samples of a camera are linked into tracks with
+stable item IDs, so one bottle seen in 30 frames is one item, not 30:
+
+  - each track carries a small constant-velocity Kalman filter over its
+    box centre and size
+  - on a full YOLO pass, detections are matched to the predicted track
+    boxes by IoU (greedy, same class); leftovers start new tracks
+  - in between YOLO passes, tracks follow their item with template
+    matching in a small search window around the predicted box, which is
+    far cheaper than a detection pass
+
+A track counts as a real item once YOLO has matched it TRACKER_MIN_HITS
+times (following it between passes keeps it alive but doesn't confirm
+it), and is dropped after TRACKER_MAX_MISSES samples without a match.
+"""
+import itertools
+import os
+import threading
+import time
+
+import cv2
+
+# Run a full YOLO pass every N samples of a camera, track in between
+DETECT_EVERY = int(os.getenv("TRACKER_DETECT_EVERY", "5"))
+IOU_THRESHOLD = float(os.getenv("TRACKER_IOU", "0.3"))
+MIN_HITS = int(os.getenv("TRACKER_MIN_HITS", "2"))
+MAX_MISSES = int(os.getenv("TRACKER_MAX_MISSES", "3"))
+# Template match score needed to follow an item without YOLO
+MATCH_THRESHOLD = 0.6
+# Templates are shrunk to at most this many pixels on the long side
+PATCH_SIZE = 48
+
+
+def iou(a, b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes."""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def detections_with_boxes(result):
+    """[(class_name, confidence, (x1, y1, x2, y2)), ...] in pixels of the input frame."""
+    return [
+        (result.names[int(box.cls[0])], float(box.conf[0]), tuple(float(v) for v in box.xyxy[0]))
+        for box in result.boxes
+    ]
+
+
+class _Kalman1D:
+    """Position + velocity filter for one box coordinate."""
+
+    def __init__(self, x, process_noise=4.0, measurement_noise=9.0):
+        self.x, self.v = x, 0.0
+        self.q, self.r = process_noise, measurement_noise
+        self.p00, self.p01, self.p10, self.p11 = measurement_noise, 0.0, 0.0, 100.0
+
+    def predict(self, dt):
+        self.x += self.v * dt
+        self.p00 += dt * (self.p01 + self.p10) + dt * dt * self.p11 + self.q
+        self.p01 += dt * self.p11
+        self.p10 += dt * self.p11
+        self.p11 += self.q
+        return self.x
+
+    def update(self, z):
+        s = self.p00 + self.r
+        k0, k1 = self.p00 / s, self.p10 / s
+        y = z - self.x
+        self.x += k0 * y
+        self.v += k1 * y
+        self.p00, self.p01, self.p10, self.p11 = (
+            (1 - k0) * self.p00, (1 - k0) * self.p01, self.p10 - k1 * self.p00, self.p11 - k1 * self.p01
+        )
+        return self.x
+
+
+class Track:
+    """One physical item followed across samples."""
+
+    def __init__(self, track_id, name, conf, box, now):
+        self.id = track_id
+        self.name = name
+        self.conf = conf
+        x1, y1, x2, y2 = box
+        self.filters = [_Kalman1D(v) for v in ((x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1)]
+        self.hits = 1
+        self.misses = 0
+        self.first_seen = self.last_seen = self.updated = now
+        self.patch = None
+        self.patch_scale = 1.0
+
+    @property
+    def box(self):
+        cx, cy, w, h = (f.x for f in self.filters)
+        w, h = max(1.0, w), max(1.0, h)
+        return (cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2)
+
+    @property
+    def confirmed(self):
+        return self.hits >= MIN_HITS
+
+    def predict(self, now):
+        dt = now - self.updated
+        self.updated = now
+        for f in self.filters:
+            f.predict(dt)
+        return self.box
+
+    def correct(self, box, now, conf=None, hit=True):
+        """New measurement of the box. Only YOLO matches (`hit`) count toward confirming the item."""
+        x1, y1, x2, y2 = box
+        for f, z in zip(self.filters, ((x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1)):
+            f.update(z)
+        if hit:
+            self.hits += 1
+        self.misses = 0
+        self.last_seen = now
+        if conf is not None:
+            self.conf = conf
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "class": self.name,
+            "conf": round(self.conf, 3),
+            "box": [round(v, 1) for v in self.box],
+            "hits": self.hits,
+            "misses": self.misses,
+            "confirmed": self.confirmed,
+            "age_s": round(self.last_seen - self.first_seen, 1),
+        }
+
+
+class CameraTracker:
+    """Tracks for one camera. Not thread-safe on its own, see MultiCameraTracker."""
+
+    def __init__(self, id_source):
+        self.id_source = id_source
+        self.tracks = []
+        self.samples_since_detection = None
+        self.stats = {"detections": 0, "follows": 0, "tracks_started": 0, "items_confirmed": 0}
+
+    def _crop_patch(self, gray, box):
+        x1, y1, x2, y2 = self._clip(box, gray.shape)
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return None, 1.0
+        scale = min(1.0, PATCH_SIZE / max(x2 - x1, y2 - y1))
+        patch = gray[y1:y2, x1:x2]
+        if scale < 1.0:
+            patch = cv2.resize(patch, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return patch, scale
+
+    @staticmethod
+    def _clip(box, shape):
+        height, width = shape[:2]
+        x1, y1, x2, y2 = (int(round(v)) for v in box)
+        return max(0, x1), max(0, y1), min(width, x2), min(height, y2)
+
+    def update(self, frame, detections, now=None):
+        """
+        Full detection pass: matches `detections` ([(name, conf, box), ...]) to
+        the tracks. Returns the tracks confirmed by this update (new items).
+        """
+        now = now or time.monotonic()
+        self.samples_since_detection = 0
+        self.stats["detections"] += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        predicted = [track.predict(now) for track in self.tracks]
+
+        # Greedy IoU matching, best pairs first, only within the same class
+        pairs = sorted(
+            ((iou(pred, det[2]), ti, di)
+             for ti, pred in enumerate(predicted)
+             for di, det in enumerate(detections)
+             if self.tracks[ti].name == det[0]),
+            reverse=True,
+        )
+        matched_tracks, matched_dets = set(), set()
+        newly_confirmed = []
+        for score, ti, di in pairs:
+            if score < IOU_THRESHOLD:
+                break
+            if ti in matched_tracks or di in matched_dets:
+                continue
+            matched_tracks.add(ti)
+            matched_dets.add(di)
+            track = self.tracks[ti]
+            was_confirmed = track.confirmed
+            name, conf, box = detections[di]
+            track.correct(box, now, conf)
+            track.patch, track.patch_scale = self._crop_patch(gray, box)
+            if track.confirmed and not was_confirmed:
+                newly_confirmed.append(track)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.misses += 1
+
+        for di, (name, conf, box) in enumerate(detections):
+            if di in matched_dets:
+                continue
+            track = Track(next(self.id_source), name, conf, box, now)
+            track.patch, track.patch_scale = self._crop_patch(gray, box)
+            self.tracks.append(track)
+            self.stats["tracks_started"] += 1
+            if track.confirmed:
+                newly_confirmed.append(track)
+
+        self._prune()
+        self.stats["items_confirmed"] += len(newly_confirmed)
+        return newly_confirmed
+
+    def follow(self, frame, now=None):
+        """
+        Cheap update without YOLO: template-matches every track near its
+        predicted box. Tracks move and stay alive, but only update() confirms
+        items, so every new item is reported by a detection pass.
+        """
+        now = now or time.monotonic()
+        self.samples_since_detection = (self.samples_since_detection or 0) + 1
+        self.stats["follows"] += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        for track in self.tracks:
+            box = track.predict(now)
+            if track.patch is None:
+                track.misses += 1
+                continue
+            # Search window: the predicted box grown by half its size on every side
+            x1, y1, x2, y2 = box
+            pad_x, pad_y = (x2 - x1) / 2, (y2 - y1) / 2
+            sx1, sy1, sx2, sy2 = self._clip((x1 - pad_x, y1 - pad_y, x2 + pad_x, y2 + pad_y), gray.shape)
+            search = gray[sy1:sy2, sx1:sx2]
+            if track.patch_scale < 1.0 and search.size:
+                search = cv2.resize(search, None, fx=track.patch_scale, fy=track.patch_scale,
+                                    interpolation=cv2.INTER_AREA)
+            ph, pw = track.patch.shape[:2]
+            if search.shape[0] < ph or search.shape[1] < pw:
+                track.misses += 1
+                continue
+
+            _, score, _, (mx, my) = cv2.minMaxLoc(cv2.matchTemplate(search, track.patch, cv2.TM_CCOEFF_NORMED))
+            if score < MATCH_THRESHOLD:
+                track.misses += 1
+                continue
+            left, top = sx1 + mx / track.patch_scale, sy1 + my / track.patch_scale
+            found = (left, top, left + pw / track.patch_scale, top + ph / track.patch_scale)
+            track.correct(found, now, hit=False)
+
+        self._prune()
+
+    def _prune(self):
+        self.tracks = [track for track in self.tracks if track.misses <= MAX_MISSES]
+
+    def needs_detection(self, detect_every=DETECT_EVERY):
+        # Detect when there is nothing to follow yet, or every N samples to catch new items
+        return (self.samples_since_detection is None or not self.tracks
+                or self.samples_since_detection + 1 >= detect_every)
+
+    def items(self):
+        """Confirmed items currently in view."""
+        return [track for track in self.tracks if track.confirmed]
+
+
+class MultiCameraTracker:
+    """One CameraTracker per camera, with item IDs unique across cameras."""
+
+    def __init__(self, detect_every=DETECT_EVERY):
+        self.detect_every = detect_every
+        self.lock = threading.Lock()
+        self.cameras = {}
+        self.ids = itertools.count(1)
+
+    def _camera(self, cam_id):
+        if cam_id not in self.cameras:
+            self.cameras[cam_id] = CameraTracker(self.ids)
+        return self.cameras[cam_id]
+
+    def needs_detection(self, cam_id):
+        with self.lock:
+            return self._camera(cam_id).needs_detection(self.detect_every)
+
+    def update(self, cam_id, frame, detections):
+        """Feeds a YOLO pass. Returns the newly confirmed items as dicts."""
+        with self.lock:
+            return [track.to_dict() for track in self._camera(cam_id).update(frame, detections)]
+
+    def follow(self, cam_id, frame):
+        with self.lock:
+            self._camera(cam_id).follow(frame)
+
+    def items(self, cam_id):
+        with self.lock:
+            tracker = self.cameras.get(cam_id)
+            return [track.to_dict() for track in tracker.items()] if tracker else []
+
+    def forget(self, cam_id):
+        """Drops a camera's tracks (e.g. after it was re-pointed at another stream)."""
+        with self.lock:
+            self.cameras.pop(cam_id, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                cam_id: {**tracker.stats, "live_items": len(tracker.items()), "tracks": len(tracker.tracks)}
+                for cam_id, tracker in self.cameras.items()
+            }
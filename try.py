@@ -153,8 +153,15 @@ from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from geoalchemy2 import Geometry
-from ultralytics import YOLO
 from PIL import Image
+from inference import get_engine
+import models
+from detection_store import detections_from_result, build_rows, write_batch, point_wkt, severity_for_count
+from write_behind import WriteBehindQueue
+import os
+from typing import List, Optional
+from bulk_ingest import IngestRun, get_job, job_directory, job_to_dict, store_upload, upload_path
+from fastapi.concurrency import run_in_threadpool
 
 # 2. Database Config
 # REPLACE 'password' with your real PostgreSQL password
@@ -176,6 +183,8 @@ class WasteRecord(Base):
     location = Column(Geometry(geometry_type='POINT', srid=4326))
 
 Base.metadata.create_all(bind=engine)
+# Shared tables (detection_events is written by both this app and the scheduler)
+models.Base.metadata.create_all(bind=engine)
 
 # 4. Dependency
 def get_db():
@@ -185,6 +194,13 @@ def get_db():
     finally:
         db.close()
 
+# Detections are queued and written in batches by a background thread,
+# so upload latency depends on inference, not on PostgreSQL.
+# Uploads have no camera, they roll up under camera 0 / zone 0.
+detection_writer = WriteBehindQueue(
+    SessionLocal, lambda db, rows: write_batch(db, rows, lambda camera_id: 0), name="upload-writer"
+)
+
 # 5. App & Model
 app = FastAPI()
 
@@ -197,14 +213,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load Model
-try:
-    print("Attempting to load warp_latest.pt...")
-    model = YOLO("best.pt")
-    print("✅ Custom model loaded!")
-except:
-    print("⚠️ Custom model not found. Loading standard yolov8n.pt...")
-    model = YOLO("yolov8n.pt")
+# Load Model (shared micro-batching engine, falls back to yolov8n.pt if best.pt is missing)
+inference_engine = get_engine()
+
+@app.on_event("shutdown")
+def flush_detections():
+    detection_writer.close()
+
+@app.get("/api/persistence_stats")
+def get_persistence_stats():
+    return detection_writer.metrics()
 
 # 6. UPDATED HOMEPAGE WITH DETECTION FORM & DISPLAY AREA
 @app.get("/", response_class=HTMLResponse)
@@ -300,57 +318,29 @@ def read_root():
 async def detect_waste(
     file: UploadFile = File(...), 
     latitude: float = Form(...), 
-    longitude: float = Form(...), 
-    db: Session = Depends(get_db)
+    longitude: float = Form(...)
 ):
     try:
         # 1. Process Image
         image_bytes = await file.read()
         image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
 
-        # 2. Run AI
-        results = model(image)
+        # 2. Run AI (batched together with other uploads, doesn't block the event loop)
+        results = [await inference_engine.predict_async(image)]
         
-        # 3. Collect Valid Detections (Don't save yet!)
+        # 3. Collect Valid Detections (confidence > 0.25)
         valid_objects = []
-        detected_names = []
-
         for result in results:
-            for box in result.boxes:
-                conf = float(box.conf[0])
-                if conf > 0.25:  # Confidence threshold
-                    class_id = int(box.cls[0])
-                    class_name = model.names[class_id]
-                    
-                    # Store tuple of (name, confidence) for later
-                    valid_objects.append((class_name, conf))
-                    detected_names.append(class_name)
+            valid_objects += detections_from_result(result)
+        detected_names = [name for name, _ in valid_objects]
 
         # 4. Determine Severity based on Count
         count = len(valid_objects)
-        
-        if count == 0:
-            severity = "None"
-        elif count <= 5:
-            severity = "Low"      # 1-5 items
-        elif count <= 10:
-            severity = "Medium"   # 6-10 items
-        else:
-            severity = "High"     # 10+ items
+        severity = severity_for_count(count)
 
-        # 5. Save to Database with Severity
-        point_wkt = f"POINT({longitude} {latitude})"
-        
-        for name, conf in valid_objects:
-            new_record = WasteRecord(
-                waste_type=name,
-                confidence=conf,
-                severity=severity,  # <--- Saving the calculated severity
-                location=point_wkt
-            )
-            db.add(new_record)
-
-        db.commit()
+        # 5. Queue for the database with Severity (written in the background)
+        rows = build_rows(valid_objects, "upload", location=point_wkt(latitude, longitude))
+        detection_writer.put(rows, timeout=0)
 
         # 6. Return Result
         return {
@@ -363,4 +353,99 @@ async def detect_waste(
 
     except Exception as e:
         print(f"ERROR: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# 8. Bulk Ingest (many photos or zip archives at once, processed in the background)
+ingest_runs = {}  # job name -> IngestRun started by this process
+
+
+def start_ingest(name, source, latitude=None, longitude=None):
+    run = IngestRun(SessionLocal, inference_engine.predict_many, name, source, latitude, longitude)
+    ingest_runs[name] = run.start()
+    return run
+
+
+@app.post("/detect/bulk", status_code=202)
+async def detect_bulk(
+    files: List[UploadFile] = File(...),
+    latitude: Optional[float] = Form(None),
+    longitude: Optional[float] = Form(None),
+    job: Optional[str] = Form(None)
+):
+    # Photos with GPS EXIF keep their own position, the form location is the fallback
+    name = job or f"upload-{datetime.datetime.now():%Y%m%d-%H%M%S}"
+    try:
+        directory = job_directory(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if name in ingest_runs and ingest_runs[name].running:
+        raise HTTPException(status_code=409, detail=f"Job {name} is already running")
+
+    # A job name that already exists gets the new files added and resumes; files
+    # it already has are never replaced (resume skips them by name)
+    targets = [(upload, path) for upload in files if (path := upload_path(directory, upload.filename))]
+    existing = [os.path.basename(path) for _, path in targets if os.path.exists(path)]
+    if existing:
+        raise HTTPException(status_code=409, detail=f"Job {name} already has {', '.join(existing[:10])}; "
+                                                    "upload changed files under a new name or job")
+
+    # Uploads are copied to disk in chunks on the threadpool, never held in memory
+    # whole and never blocking the event loop (MJPEG / SSE clients)
+    await run_in_threadpool(os.makedirs, directory, exist_ok=True)
+    stored, skipped = 0, []
+    for upload, path in targets:
+        if await run_in_threadpool(store_upload, upload.file, path):
+            stored += 1
+        else:
+            skipped.append(os.path.basename(path))
+
+    start_ingest(name, directory, latitude, longitude)
+    return {"status": "accepted", "job": name, "files": stored, "skipped": skipped,
+            "progress_url": f"/api/ingest/{name}"}
+
+
+@app.get("/api/ingest")
+def list_ingest_jobs(db: Session = Depends(get_db)):
+    jobs = db.query(models.IngestJob).order_by(models.IngestJob.created_at.desc()).limit(50).all()
+    return [ingest_runs[job.name].progress() if job.name in ingest_runs else job_to_dict(job) for job in jobs]
+
+
+@app.get("/api/ingest/{name}")
+def get_ingest_job(name: str, db: Session = Depends(get_db)):
+    # Live numbers (throughput, ETA) while it runs here, the stored totals otherwise
+    if name in ingest_runs:
+        return ingest_runs[name].progress()
+    job = get_job(db, name)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+
+@app.post("/api/ingest/{name}/resume", status_code=202)
+def resume_ingest_job(name: str, db: Session = Depends(get_db)):
+    job = get_job(db, name)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if name in ingest_runs and ingest_runs[name].running:
+        raise HTTPException(status_code=409, detail=f"Job {name} is already running")
+    if not os.path.exists(job.source):
+        raise HTTPException(status_code=410, detail="The job's files are gone")
+    start_ingest(name, job.source)
+    return {"status": "accepted", "job": name, "progress_url": f"/api/ingest/{name}"}
+
+
+@app.post("/api/ingest/{name}/stop")
+def stop_ingest_job(name: str):
+    run = ingest_runs.get(name)
+    if run is None or not run.running:
+        raise HTTPException(status_code=404, detail="Job is not running")
+    run.stop()
+    return {"status": "stopping", "job": name}
+
+
+@app.on_event("shutdown")
+def stop_ingest_jobs():
+    # Running jobs write what they have and can be resumed after the restart
+    for run in ingest_runs.values():
+        run.stop()
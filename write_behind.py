@@ -0,0 +1,149 @@
+"""
+Write-behind persistence queue.
+
+Request handlers and the scheduler hand detection rows to `put()` and move
+on; a background thread groups queued rows into batches and writes each
+batch in one transaction. The queue is bounded: when the database falls
+behind, `put()` waits briefly and then drops the rows (counted in the
+stats) instead of letting memory grow or stalling callers. `close()`
+flushes whatever is still queued, call it on shutdown.
+"""
+import os
+import queue
+import threading
+import time
+
+MAX_QUEUED = int(os.getenv("WRITE_BEHIND_MAX_QUEUED", "10000"))
+BATCH_ROWS = int(os.getenv("WRITE_BEHIND_BATCH_ROWS", "500"))
+FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", "1.0"))
+PUT_TIMEOUT = 0.05
+RETRIES = 3
+
+
+class WriteBehindQueue:
+    """
+    `write_fn(db, rows)` writes one batch without committing; the queue
+    opens a session from `session_factory`, calls it and commits.
+    """
+
+    def __init__(self, session_factory, write_fn, max_queued=MAX_QUEUED, batch_rows=BATCH_ROWS,
+                 flush_interval=FLUSH_INTERVAL, name="write-behind"):
+        self.session_factory = session_factory
+        self.write_fn = write_fn
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.name = name
+
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.closed = False
+        # Set by close(); seen by the writer even when the queue is too full for a wake-up
+        self.stopping = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stats = {
+            "high_watermark": 0, "enqueued": 0, "written": 0,
+            "dropped": 0, "failed": 0, "batches": 0, "last_batch_ms": None,
+        }
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self.thread.start()
+        return self
+
+    def put(self, rows, timeout=PUT_TIMEOUT):
+        """Queues rows for writing. Never blocks longer than `timeout` per row."""
+        if self.closed:
+            raise RuntimeError(f"{self.name} is closed")
+        self.start()
+        accepted = 0
+        for row in rows:
+            try:
+                self.queue.put(row, timeout=timeout)
+                accepted += 1
+            except queue.Full:
+                # Backpressure: the database can't keep up, shed load instead of stalling
+                with self.lock:
+                    self.stats["dropped"] += len(rows) - accepted
+                print(f"⚠️ {self.name}: queue full, dropped {len(rows) - accepted} rows")
+                break
+        with self.lock:
+            self.stats["enqueued"] += accepted
+            depth = self.queue.qsize()
+            self.stats["high_watermark"] = max(self.stats["high_watermark"], depth)
+        return accepted
+
+    def metrics(self):
+        with self.lock:
+            return {**self.stats, "queued": self.queue.qsize(), "capacity": self.queue.maxsize}
+
+    def close(self, timeout=10):
+        """Stops accepting rows and waits up to `timeout` seconds for everything queued to be written."""
+        self.closed = True
+        self.stopping.set()
+        if self.thread is not None:
+            try:
+                self.queue.put_nowait(None)  # Wake the writer
+            except queue.Full:
+                pass  # Writer is behind (e.g. database down); it sees `stopping` within a flush interval
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                print(f"⚠️ {self.name}: gave up waiting with {self.queue.qsize()} rows still queued")
+
+    # --- Writer thread ---
+    def _next_batch(self):
+        batch, stop = [], False
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                if batch and remaining <= 0:
+                    row = self.queue.get_nowait()
+                else:
+                    row = self.queue.get(timeout=max(remaining, 0.001))
+            except queue.Empty:
+                break
+            if row is None:
+                stop = True
+                break
+            batch.append(row)
+        return batch, stop or self.stopping.is_set()
+
+    def _write(self, batch):
+        for attempt in range(1, RETRIES + 1):
+            start = time.perf_counter()
+            db = self.session_factory()
+            try:
+                self.write_fn(db, batch)
+                db.commit()
+                with self.lock:
+                    self.stats["written"] += len(batch)
+                    self.stats["batches"] += 1
+                    self.stats["last_batch_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                return
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ {self.name}: batch of {len(batch)} failed (attempt {attempt}): {e}")
+                time.sleep(0.5 * attempt)
+            finally:
+                db.close()
+        with self.lock:
+            self.stats["failed"] += len(batch)
+
+    def _run(self):
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                self._write(batch)
+            if stop:
+                # Flush anything that was queued before close()
+                while True:
+                    remaining = []
+                    while not self.queue.empty() and len(remaining) < self.batch_rows:
+                        row = self.queue.get_nowait()
+                        if row is not None:
+                            remaining.append(row)
+                    if not remaining:
+                        return
+                    self._write(remaining)